@@ -0,0 +1,312 @@
+# CPU opponent.
+# Decisions come from a small minimax lookahead: each candidate input of the
+# CPU fighter is held for a few ticks against each candidate reply of the
+# opponent on a scratch Match, and the input with the best worst case wins.
+#
+# A state is first reduced to a discrete key (distance, who is airborne or
+# attacking, health lead) and the search starts from a canonical state rebuilt
+# from that key, so a decision depends on the key alone. Decisions are cached
+# per key and character pair, a per-frame time budget bounds how much searching
+# the live game does, and BatchMatch can look up decisions for every match at
+# once with one NumPy index into a fully built table.
+#
+#   python ai.py --matches 100000
+import argparse
+import math
+import time
+
+import numpy as np
+
+import batch_sim
+from characters import ACTION_IDLE, ACTION_JUMP, ATTACK_ROWS
+from simulation import (
+    FighterInput, Match, SCREEN_WIDTH, SCREEN_HEIGHT, FLOOR_OFFSET, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP,
+    INPUT_ATTACK_1, TICK_RATE
+)
+
+# State key: distance buckets either side, four flags and health lead buckets either side
+DX_BUCKET = 50
+DX_BUCKETS = 10
+HEALTH_BUCKET = 25
+HEALTH_BUCKETS = 4
+HEALTH_LEVELS = 2 * HEALTH_BUCKETS + 1
+KEY_COUNT = (2 * DX_BUCKETS + 1) * 16 * HEALTH_LEVELS
+
+# Candidate inputs of the CPU fighter (first wins ties) and of the opponent
+AI_INPUTS = [0, INPUT_LEFT, INPUT_RIGHT, INPUT_ATTACK_1, INPUT_JUMP, INPUT_LEFT | INPUT_JUMP, INPUT_RIGHT | INPUT_JUMP]
+REPLY_INPUTS = [0, INPUT_ATTACK_1, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP]
+LOOKAHEAD_TICKS = 8
+DISTANCE_WEIGHT = 0.02  # health points per pixel away from the preferred distance
+AIR_HEIGHT = 120  # how high a canonical airborne fighter is
+
+
+# Function for the discrete key of a state, seen from fighter
+def encode_key(dx, jump, opponent_jump, attacking, opponent_attacking, health_lead):
+    dx_bucket = min(max(dx // DX_BUCKET, -DX_BUCKETS), DX_BUCKETS) + DX_BUCKETS
+    lead_bucket = min(max(health_lead // HEALTH_BUCKET, -HEALTH_BUCKETS), HEALTH_BUCKETS) + HEALTH_BUCKETS
+    flags = jump | opponent_jump << 1 | attacking << 2 | opponent_attacking << 3
+    return (dx_bucket * 16 + flags) * HEALTH_LEVELS + lead_bucket
+
+
+# Function for a representative state of a key, the inverse of encode_key
+def decode_key(key):
+    rest, lead_bucket = divmod(key, HEALTH_LEVELS)
+    dx_bucket, flags = divmod(rest, 16)
+    dx = (dx_bucket - DX_BUCKETS) * DX_BUCKET + DX_BUCKET // 2
+    health_lead = (lead_bucket - HEALTH_BUCKETS) * HEALTH_BUCKET
+    return dx, flags & 1, flags >> 1 & 1, flags >> 2 & 1, flags >> 3 & 1, health_lead
+
+
+def state_key(fighter, opponent):
+    return encode_key(opponent.rect.centerx - fighter.rect.centerx, int(fighter.jump), int(opponent.jump),
+                      int(fighter.attacking), int(opponent.attacking), fighter.health - opponent.health)
+
+
+# Function for the keys of column p against column q of every match in a BatchMatch
+def batch_keys(batch, p, q):
+    centerx = batch.x + batch.size // 2
+    dx = (centerx[:, q] - centerx[:, p]).astype(np.int64)
+    lead = (batch.health[:, p] - batch.health[:, q]).astype(np.int64)
+    dx_bucket = np.clip(dx // DX_BUCKET, -DX_BUCKETS, DX_BUCKETS) + DX_BUCKETS
+    lead_bucket = np.clip(lead // HEALTH_BUCKET, -HEALTH_BUCKETS, HEALTH_BUCKETS) + HEALTH_BUCKETS
+    flags = (batch.jump[:, p] | batch.jump[:, q].astype(np.int64) << 1 | batch.attacking[:, p].astype(np.int64) << 2
+             | batch.attacking[:, q].astype(np.int64) << 3)
+    return (dx_bucket * 16 + flags) * HEALTH_LEVELS + lead_bucket
+
+
+# Distance between centers to aim for, given how far our attack and the
+# opponent's reach: out of their reach but in our own if we outrange them,
+# otherwise well inside our own reach
+def preferred_distance(reach, threat):
+    if reach > threat:
+        return (reach + threat) / 2
+    return reach * 0.6
+
+
+# Put a scratch match (CPU fighter is fighter_1) into the canonical state of a key
+def set_canonical(match, key):
+    dx, jump, opponent_jump, attacking, opponent_attacking, health_lead = decode_key(key)
+    fighter, opponent = match.fighter_1, match.fighter_2
+    center = SCREEN_WIDTH // 2
+    fighter.health = max(min(100, 100 + health_lead), 10)
+    opponent.health = max(min(100, 100 - health_lead), 10)
+    for f, centerx, in_air, is_attacking in ((fighter, center - dx // 2, jump, attacking),
+                                             (opponent, center + dx - dx // 2, opponent_jump, opponent_attacking)):
+        floor = SCREEN_HEIGHT - FLOOR_OFFSET - f.size
+        f.rect.x = centerx - f.size // 2
+        f.rect.y = floor - AIR_HEIGHT if in_air else floor
+        f.vel_y = 0
+        f.jump = bool(in_air)
+        f.running = False
+        f.attacking = bool(is_attacking)
+        f.attack_type = 1 if is_attacking else 0
+        f.alive = True
+        f.action = ATTACK_ROWS[1] if is_attacking else ACTION_JUMP if in_air else ACTION_IDLE
+        f.frame_index = 0
+        f.image_frame = (f.action, 0)
+        f.update_time = 0
+    fighter.flip = dx < 0
+    opponent.flip = dx > 0
+    match.tick = 0
+    match.round_over = False
+
+
+# Cached minimax policy. budget_ms limits search time between calls of
+# new_frame (None for no limit); once it is spent, uncached states get a
+# cheap heuristic instead.
+class CachedPolicy:
+    def __init__(self, budget_ms=2.0):
+        self.budget_ms = budget_ms
+        self.tables = {}  # (character, opponent character) -> decision per key, -1 until searched
+        self.reaches = {}  # (character, opponent character) -> reach of the first attack
+        self.matches = {}  # scratch match per character pair
+        self.spent = 0.0
+        self.hits = 0
+        self.searches = 0
+        self.fallbacks = 0
+
+    def table(self, character, opponent_character):
+        pair = (character, opponent_character)
+        table = self.tables.get(pair)
+        if table is None:
+            table = np.full(KEY_COUNT, -1, dtype=np.int8)
+            self.tables[pair] = table
+            self.matches[pair] = Match(character, None, opponent_character, None)
+        return table
+
+    # Farthest distance between centers at which character's first attack
+    # lands on the standing opponent whichever way it faces, probed with the
+    # rules' hit test from the far end of the screen inwards
+    def reach(self, character, opponent_character):
+        pair = (character, opponent_character)
+        reach = self.reaches.get(pair)
+        if reach is None:
+            match = Match(character, None, opponent_character, None)
+            fighter, opponent = match.fighter_1, match.fighter_2
+            fighter.attack_type = 1
+            fighter.rect.x = (SCREEN_WIDTH - fighter.size) // 2
+            reaches = []
+            for flip, direction in ((False, 1), (True, -1)):
+                fighter.flip = flip
+                opponent.flip = not flip
+                reaches.append(0)
+                for distance in range(SCREEN_WIDTH - 1, -1, -1):
+                    opponent.rect.x = fighter.rect.centerx + direction * distance - opponent.size // 2
+                    if fighter.hits(fighter.attack_rect(), opponent):
+                        reaches[-1] = distance
+                        break
+            reach = self.reaches[pair] = min(reaches)
+        return reach
+
+    def preferred_distance(self, character, opponent_character):
+        return preferred_distance(self.reach(character, opponent_character), self.reach(opponent_character, character))
+
+    # Probe the reaches and set up the table of a character pair ahead of
+    # the first decision, so it does not come out of a frame's budget
+    def prepare(self, character, opponent_character):
+        self.table(character, opponent_character)
+        self.preferred_distance(character, opponent_character)
+
+    def search(self, character, opponent_character, key):
+        match = self.matches[(character, opponent_character)]
+        set_canonical(match, key)
+        start = match.snapshot()
+        fighter, opponent = match.fighter_1, match.fighter_2
+        health, opponent_health = fighter.health, opponent.health
+        defend = 1.0 + max(decode_key(key)[5], 0) / 50  # protect a lead
+        preferred = self.preferred_distance(character, opponent_character)
+        best_bits = 0
+        best_value = -math.inf
+        for bits in AI_INPUTS:
+            inp = FighterInput.from_bits(bits)
+            worst = math.inf
+            for reply in REPLY_INPUTS:
+                reply_inp = FighterInput.from_bits(reply)
+                match.restore(start)
+                for _ in range(LOOKAHEAD_TICKS):
+                    match.step(inp, reply_inp)
+                distance = abs(opponent.rect.centerx - fighter.rect.centerx)
+                value = ((opponent_health - opponent.health) - defend * (health - fighter.health)
+                         - DISTANCE_WEIGHT * abs(distance - preferred))
+                worst = min(worst, value)
+                if worst <= best_value:
+                    break  # this input can't beat the best one found
+            if worst > best_value:
+                best_value = worst
+                best_bits = bits
+        return best_bits
+
+    # Walk into range and attack; used when the search budget is spent
+    def heuristic(self, fighter, opponent):
+        dx = opponent.rect.centerx - fighter.rect.centerx
+        if abs(dx) > self.preferred_distance(fighter.character, opponent.character):
+            return INPUT_RIGHT if dx > 0 else INPUT_LEFT
+        return 0 if fighter.attacking else INPUT_ATTACK_1
+
+    def decide(self, fighter, opponent):
+        table = self.table(fighter.character, opponent.character)
+        key = state_key(fighter, opponent)
+        bits = int(table[key])
+        if bits >= 0:
+            self.hits += 1
+            return bits
+        if self.budget_ms is not None and self.spent >= self.budget_ms:
+            self.fallbacks += 1
+            return self.heuristic(fighter, opponent)
+        start = time.perf_counter()
+        bits = self.search(fighter.character, opponent.character, key)
+        table[key] = bits
+        self.searches += 1
+        self.spent += (time.perf_counter() - start) * 1000
+        return bits
+
+    def new_frame(self):
+        self.spent = 0.0
+
+    # Search every key of a character pair up front, returns the full table
+    def build(self, character, opponent_character):
+        table = self.table(character, opponent_character)
+        for key in np.flatnonzero(table < 0).tolist():
+            table[key] = self.search(character, opponent_character, key)
+            self.searches += 1
+        return table
+
+    # Match.run policy: policy(match, fighter, opponent) -> FighterInput
+    def __call__(self, match, fighter, opponent):
+        return FighterInput.from_bits(self.decide(fighter, opponent))
+
+    # BatchMatch policy: the CPU plays column p, other_policy (or nobody) the other one
+    def batch_policy(self, batch, p=0, other_policy=None):
+        q = 1 - p
+        table = self.build(batch.characters[p], batch.characters[q])
+
+        def policy(batch):
+            bits = other_policy(batch) if other_policy is not None else np.zeros((batch.n, 2), dtype=np.uint8)
+            bits[:, p] = table[batch_keys(batch, p, q)]
+            return bits
+        return policy
+
+
+# Input source for Fighter (see controls.py) driven by a CachedPolicy
+class AIController:
+    def __init__(self, policy=None):
+        self.policy = CachedPolicy() if policy is None else policy
+        self.fighters = {}
+
+    # Tell the controller which fighters are in the round (call it at round start)
+    def track(self, *fighters):
+        self.fighters = {fighter.player: fighter for fighter in fighters}
+        for fighter in fighters:
+            for opponent in fighters:
+                if opponent is not fighter:
+                    self.policy.prepare(fighter.character, opponent.character)
+
+    def read(self, player, now=None):
+        fighter = self.fighters.get(player)
+        opponents = [f for p, f in self.fighters.items() if p != player]
+        if fighter is None or not opponents:
+            return 0
+        return self.decide(fighter, opponents[0])
+
+    # Input bits for fighter against a given opponent (the arena picks the nearest one)
+    def decide(self, fighter, opponent):
+        return self.policy.decide(fighter, opponent)
+
+    def end_tick(self):
+        pass
+
+    # The search budget is per frame, however many ticks the frame steps
+    def new_frame(self):
+        self.policy.new_frame()
+
+
+# Policy factory in the style of tournament.POLICIES
+def ai_policy(rng):
+    return CachedPolicy(budget_ms=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the CPU policy against random inputs in bulk.")
+    parser.add_argument("--matches", type=int, default=100000)
+    parser.add_argument("--ticks", type=int, default=60 * TICK_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    policy = CachedPolicy(budget_ms=None)
+    batch = batch_sim.BatchMatch(args.matches)
+    start = time.perf_counter()
+    run_policy = policy.batch_policy(batch, 0, batch_sim.random_policy(np.random.default_rng(args.seed)))
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    winners = batch.run(run_policy, args.ticks)
+    seconds = time.perf_counter() - start
+    states = args.matches * batch.tick  # one table lookup per match per tick
+    print(f"matches: {args.matches}")
+    print(f"table_build_seconds: {build_seconds:.2f} ({policy.searches} searches)")
+    print(f"cpu_win_rate: {(winners == 1).mean():.4f}")
+    print(f"random_win_rate: {(winners == 2).mean():.4f}")
+    print(f"states_per_second: {states / seconds:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
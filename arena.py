@@ -0,0 +1,245 @@
+# Free-for-all arena.
+# Any number of fighters and projectiles on one field, stepped with the same
+# rules and tick as simulation.Match. Hit detection goes through a uniform
+# grid broadphase, so an attack or projectile is only tested against the
+# fighters in the cells it overlaps, and every fighter faces its nearest
+# living opponent found by a sort along x instead of checking every pair.
+import argparse
+import bisect
+import random
+import time
+
+import numpy as np
+
+from characters import BUILTIN_CHARACTERS
+from effects import ProjectilePool
+from simulation import (
+    FighterState, FighterInput, Rect, SCREEN_WIDTH, SCREEN_HEIGHT, TICK_MS, TICK_RATE, PLAYER_1_START
+)
+
+GRID_CELL_SIZE = 256
+
+
+# Uniform grid of square cells. Each item is kept in every cell its rect
+# overlaps, so a query only looks at items near the queried rect.
+class SpatialGrid:
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> items
+        self.item_cells = {}  # item -> cells it is in
+
+    def cells_of(self, rect):
+        size = self.cell_size
+        columns = range(rect.x // size, (rect.x + rect.width - 1) // size + 1)
+        rows = range(rect.y // size, (rect.y + rect.height - 1) // size + 1)
+        return [(column, row) for column in columns for row in rows]
+
+    def insert(self, item, rect):
+        cells = self.cells_of(rect)
+        self.item_cells[item] = cells
+        for cell in cells:
+            items = self.cells.get(cell)
+            if items is None:
+                self.cells[cell] = [item]
+            else:
+                items.append(item)
+
+    def remove(self, item):
+        for cell in self.item_cells.pop(item, ()):
+            items = self.cells[cell]
+            items.remove(item)
+            if not items:
+                del self.cells[cell]
+
+    # Re-file an item after its rect moved; cheap when it stays in the same cells
+    def move(self, item, rect):
+        if self.cells_of(rect) != self.item_cells.get(item):
+            self.remove(item)
+            self.insert(item, rect)
+
+    # Every item in the cells the rect overlaps, each once, in a stable order
+    def query(self, rect):
+        found = []
+        for cell in self.cells_of(rect):
+            for item in self.cells.get(cell, ()):
+                if item not in found:
+                    found.append(item)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+
+
+# Fighter that resolves its attacks against everyone in the arena
+class ArenaFighter(FighterState):
+    __slots__ = ("arena",)
+
+    def __init__(self, arena, player, x, y, flip, character, now=0):
+        super().__init__(player, x, y, flip, character, None, now)
+        self.arena = arena
+
+    # Box the fighter is filed under in the grid: its hurtbox and the frame
+    # drawn around it, since attacks land on the drawn shape
+    def bounds(self):
+        rect = self.rect
+        frame_x = rect.x - self.offset[0]
+        frame_y = rect.y - self.offset[1]
+        frame_size = self.character.size * self.character.scale
+        left = min(rect.x, frame_x)
+        top = min(rect.y, frame_y)
+        return Rect(left, top, max(rect.right, frame_x + frame_size) - left, max(rect.bottom, frame_y + frame_size) - top)
+
+    def attack(self, target):
+        if not self.attacking:
+            self.attacking = True
+            self.on_attack()
+            if self.attack_type == 2 and self.character.projectile is not None:
+                self.arena.fire(self)
+            else:
+                attacking_rect = self.attack_rect()
+                self.strike(attacking_rect, self.arena.grid.query(attacking_rect))
+
+
+# fighter_class makes the fighters (an ArenaFighter subclass, e.g. one with sound)
+class Arena:
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, cell_size=GRID_CELL_SIZE, max_projectiles=512,
+                 fighter_class=ArenaFighter):
+        self.width = width
+        self.fighter_class = fighter_class
+        self.height = height
+        self.tick = 0
+        self.round_over = False
+        self.fighters = []
+        self.projectiles = ProjectilePool(max_projectiles)
+        self.projectile_rect = Rect(0, 0, 0, 0)  # reused for every hit test
+        self.grid = SpatialGrid(cell_size)
+
+    # Simulation time of the current tick in milliseconds
+    @property
+    def now(self):
+        return self.tick * TICK_MS
+
+    def add_fighter(self, character, x, y=PLAYER_1_START[1], flip=False):
+        fighter = self.fighter_class(self, len(self.fighters) + 1, x, y, flip, character, self.now)
+        self.fighters.append(fighter)
+        self.grid.insert(fighter, fighter.bounds())
+        return fighter
+
+    def fire(self, fighter):
+        projectile = fighter.character.projectile
+        direction = -1 if fighter.flip else 1
+        x = fighter.rect.centerx - (projectile.width if fighter.flip else 0)
+        y = fighter.rect.y + (fighter.rect.height - projectile.height) // 2
+        self.projectiles.spawn(x, y, projectile.width, projectile.height, direction * projectile.speed,
+                               projectile.damage, fighter.player, self.now + projectile.lifetime_ms)
+
+    # Nearest living opponent along x for every fighter. Once nobody else is
+    # alive the nearest fallen one is used, like Match keeps its target.
+    def find_targets(self):
+        living = sorted((f for f in self.fighters if f.alive), key=lambda f: (f.rect.centerx, f.player))
+        xs = [f.rect.centerx for f in living]
+        targets = []
+        for fighter in self.fighters:
+            x = fighter.rect.centerx
+            i = bisect.bisect_left(xs, x)
+            nearby = [f for f in living[max(i - 1, 0):i + 2] if f is not fighter]
+            if not nearby:
+                nearby = [f for f in self.fighters if f is not fighter]
+            targets.append(min(nearby, key=lambda f: (abs(f.rect.centerx - x), f.player), default=None))
+        return targets
+
+    # Move every projectile, then test the ones still flying against the
+    # grid; a bolt lands on the frame a fighter shows, like an attack does
+    def move_projectiles(self, now):
+        projectiles = self.projectiles
+        projectiles.update(now, self.width)
+        rect = self.projectile_rect
+        spent = []
+        for slot in projectiles.live_slots().tolist():
+            rect.x = int(projectiles.x[slot])
+            rect.y = int(projectiles.y[slot])
+            rect.width = int(projectiles.width[slot])
+            rect.height = int(projectiles.height[slot])
+            owner = projectiles.owner[slot]
+            hit = None
+            for fighter in self.grid.query(rect):
+                if (fighter.player != owner and fighter.health > 0 and (hit is None or fighter.player < hit.player)
+                        and fighter.hit_by(rect)):
+                    hit = fighter
+            if hit is not None:
+                hit.take_damage(int(projectiles.damage[slot]))
+                spent.append(slot)
+        if spent:
+            projectiles.release(np.array(spent, dtype=np.int32))
+
+    # Advance one tick. inputs holds a FighterInput for every fighter, in order.
+    def step(self, inputs):
+        now = self.now
+        for fighter in self.fighters:
+            fighter.update(now)
+        if not self.round_over:
+            for fighter, inp, target in zip(self.fighters, inputs, self.find_targets()):
+                fighter.move(inp, target or fighter, self.round_over, self.width, self.height)
+                self.grid.move(fighter, fighter.bounds())
+            self.move_projectiles(now)
+        if len(self.fighters) > 1 and sum(f.alive for f in self.fighters) <= 1:
+            self.round_over = True
+        self.tick += 1
+        return self.round_over
+
+    # Player number of the last fighter standing, 0 while the round runs or if nobody is left
+    def winner(self):
+        living = [f.player for f in self.fighters if f.alive]
+        return living[0] if self.round_over and len(living) == 1 else 0
+
+    # Play until one fighter is left or max_ticks pass.
+    # policy(arena, fighter) returns the fighter's FighterInput.
+    def run(self, policy, max_ticks=60 * TICK_RATE):
+        while not self.round_over and self.tick < max_ticks:
+            self.step([policy(self, fighter) for fighter in self.fighters])
+        return self.winner()
+
+
+# Function for an arena with count fighters spread evenly, cycling through
+# characters. Fighters wider than their share of the field are kept on it.
+def create_free_for_all(count, characters=None, width=None, fighter_class=ArenaFighter):
+    if count < 2:
+        raise ValueError(f"A free-for-all needs at least 2 fighters, not {count}")
+    characters = list((characters or BUILTIN_CHARACTERS).values())
+    arena = Arena(width or max(SCREEN_WIDTH, count * 200), fighter_class=fighter_class)
+    spacing = arena.width // count
+    for i in range(count):
+        character = characters[i % len(characters)]
+        x = i * spacing + (spacing - character.size) // 2
+        arena.add_fighter(character, min(max(x, 0), arena.width - character.size), flip=i % 2 == 1)
+    return arena
+
+
+# Policy pressing each button independently with the given chance every tick
+def random_policy(rng, press_chance=0.2):
+    def policy(arena, fighter):
+        return FighterInput(*(rng.random() < press_chance for _ in range(5)))
+    return policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a free-for-all arena with random inputs.")
+    parser.add_argument("--fighters", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    arena = create_free_for_all(args.fighters)
+    policy = random_policy(random.Random(args.seed))
+    start = time.perf_counter()
+    winner = arena.run(policy, args.ticks)
+    seconds = time.perf_counter() - start
+    print(f"fighters: {args.fighters}")
+    print(f"ticks: {arena.tick}")
+    print(f"winner: {winner}")
+    print(f"ms_per_tick: {seconds * 1000 / max(arena.tick, 1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
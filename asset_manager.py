@@ -0,0 +1,55 @@
+import concurrent.futures
+
+import pygame
+
+
+# Loads assets on a background thread pool. Files are read and decoded by
+# the workers; anything that needs the display (convert/convert_alpha) runs
+# on the main thread the first time the asset is fetched with get(), which
+# only blocks if that asset is still loading.
+class AssetManager:
+    def __init__(self, workers=4):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.futures = {}
+        self.finishers = {}
+        self.assets = {}
+
+    # Start loading an asset unless it is already loaded or loading
+    def request(self, key, loader, finish=None):
+        if key not in self.assets and key not in self.futures:
+            self.futures[key] = self.executor.submit(loader)
+            self.finishers[key] = finish
+
+    def request_image(self, path, alpha=True):
+        finish = (lambda img: img.convert_alpha()) if alpha else (lambda img: img.convert())
+        self.request(path, lambda: pygame.image.load(path), finish)
+
+    def request_sound(self, path, volume=1.0):
+        def finish(sound):
+            sound.set_volume(volume)
+            return sound
+        self.request(path, lambda: pygame.mixer.Sound(path), finish)
+
+    def ready(self, key):
+        return key in self.assets or (key in self.futures and self.futures[key].done())
+
+    # Get a loaded asset, waiting for it if needed. Loading errors are raised here.
+    def get(self, key):
+        asset = self.assets.get(key)
+        if asset is None:
+            if key not in self.futures:
+                raise KeyError(f"Asset was never requested: {key}")
+            asset = self.futures.pop(key).result()
+            finish = self.finishers.pop(key)
+            if finish is not None:
+                asset = finish(asset)
+            self.assets[key] = asset
+        return asset
+
+    # (finished, total) of everything requested so far
+    def progress(self):
+        done = len(self.assets) + sum(1 for future in self.futures.values() if future.done())
+        return done, len(self.assets) + len(self.futures)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,158 @@
+# Audio mixing.
+# Sound effects play on reserved mixer channels split into groups (hits, ui),
+# so nothing else can grab them or cut off the music. Each group has a fixed
+# number of voices and each sound a limit on copies of itself; when a group
+# is full a new sound steals the channel playing the lowest-priority, then
+# oldest, sound, or is dropped if everything playing matters more.
+#
+# Sounds are decoded into the mixer's PCM format when they are loaded (off
+# the main thread through the asset manager), together with a few
+# pitch-shifted variants so repeated hits don't all sound the same. Playing
+# one is then just handing a ready buffer to a channel.
+#
+# NullAudio has the same methods and does nothing. create_audio() returns it
+# for headless runs (BRAWLER_AUDIO=off) or when there is no audio device.
+import os
+import random
+
+import numpy as np
+import pygame
+
+DEFAULT_GROUPS = {"hits": 6, "ui": 2}
+DEFAULT_MAX_COPIES = 3
+PITCH_VARIANTS = (0.94, 1.0, 1.06)
+SPARE_CHANNELS = 2  # left unreserved for anything playing sounds directly
+
+
+# Function for a copy of a sound played faster (factor > 1) or slower
+def resample(sound, factor):
+    samples = pygame.sndarray.array(sound)
+    count = len(samples)
+    positions = np.linspace(0, count - 1, max(int(count / factor), 1))
+    source = np.arange(count)
+    if samples.ndim == 1:
+        resampled = np.interp(positions, source, samples)
+    else:
+        resampled = np.stack([np.interp(positions, source, samples[:, c]) for c in range(samples.shape[1])], axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(resampled.astype(samples.dtype)))
+
+
+# Function for loading a sound and its pitch variants (safe to run on a loader thread)
+def load_variants(path, volume=1.0, factors=PITCH_VARIANTS):
+    sound = pygame.mixer.Sound(path)
+    variants = [sound if factor == 1.0 else resample(sound, factor) for factor in factors]
+    for variant in variants:
+        variant.set_volume(volume)
+    return variants
+
+
+class AudioManager:
+    enabled = True
+
+    def __init__(self, groups=None, max_copies=DEFAULT_MAX_COPIES, seed=None):
+        groups = DEFAULT_GROUPS if groups is None else groups
+        reserved = sum(groups.values())
+        if pygame.mixer.get_num_channels() < reserved + SPARE_CHANNELS:
+            pygame.mixer.set_num_channels(reserved + SPARE_CHANNELS)
+        pygame.mixer.set_reserved(reserved)
+        self.groups = {}  # group name -> channel numbers
+        first = 0
+        for name, count in groups.items():
+            self.groups[name] = list(range(first, first + count))
+            first += count
+        self.channels = [pygame.mixer.Channel(i) for i in range(reserved)]
+        self.playing = [None] * reserved  # per channel: (sound name, priority, start order)
+        self.sounds = {}  # sound name -> variants
+        self.max_copies = max_copies
+        self.rng = random.Random(seed)
+        self.order = 0
+        self.dropped = 0
+        self.stolen = 0
+
+    def add(self, name, variants):
+        self.sounds[name] = list(variants)
+
+    def preload(self, name, path, volume=1.0):
+        self.add(name, load_variants(path, volume))
+
+    # Play a sound on a channel of the group, returns the channel or None if it was dropped
+    def play(self, name, group="hits", priority=0):
+        variants = self.sounds.get(name)
+        if not variants:
+            return None
+        free = None
+        copies = []
+        busy = []
+        for number in self.groups[group]:
+            if not self.channels[number].get_busy():
+                if free is None:
+                    free = number
+            else:
+                busy.append(number)
+                if self.playing[number][0] == name:
+                    copies.append(number)
+        if len(copies) >= self.max_copies:
+            # Voice limit for this sound: restart its oldest copy
+            number = min(copies, key=lambda n: self.playing[n][2])
+        elif free is not None:
+            number = free
+        else:
+            number = min(busy, key=lambda n: self.playing[n][1:])
+            if self.playing[number][1] > priority:
+                self.dropped += 1
+                return None
+            self.stolen += 1
+        channel = self.channels[number]
+        channel.play(self.rng.choice(variants))
+        self.playing[number] = (name, priority, self.order)
+        self.order += 1
+        return channel
+
+    def stop(self, group=None):
+        for number in (range(len(self.channels)) if group is None else self.groups[group]):
+            self.channels[number].stop()
+
+    # Streamed background music; returns False if the file is missing
+    def play_music(self, path, volume=0.5, fade_ms=5000):
+        if not os.path.exists(path):
+            return False
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(-1, 0.0, fade_ms)
+        return True
+
+    def stop_music(self, fade_ms=0):
+        if fade_ms:
+            pygame.mixer.music.fadeout(fade_ms)
+        else:
+            pygame.mixer.music.stop()
+
+
+# Silent stand-in with the same methods
+class NullAudio:
+    enabled = False
+
+    def add(self, name, variants):
+        pass
+
+    def preload(self, name, path, volume=1.0):
+        pass
+
+    def play(self, name, group="hits", priority=0):
+        return None
+
+    def stop(self, group=None):
+        pass
+
+    def play_music(self, path, volume=0.5, fade_ms=5000):
+        return False
+
+    def stop_music(self, fade_ms=0):
+        pass
+
+
+# Function for the audio backend: AudioManager when the mixer works, NullAudio otherwise
+def create_audio(groups=None):
+    if os.environ.get("BRAWLER_AUDIO") == "off" or not pygame.mixer.get_init():
+        return NullAudio()
+    return AudioManager(groups)
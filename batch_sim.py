@@ -0,0 +1,307 @@
+# Vectorized batch simulator.
+# Holds N independent warrior vs wizard matches as NumPy arrays and advances
+# all of them with one call, following the same rules, order and numbers as
+# simulation.Match (which stays the reference implementation).
+import numpy as np
+
+from characters import CharacterData, get_character, ACTION_IDLE, ACTION_RUN, ACTION_JUMP, ACTION_DEATH, ATTACK_ROWS
+from hitmask import character_hitmask
+from simulation import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, SPEED, GRAVITY, JUMP_VELOCITY, FLOOR_OFFSET, TICK_MS, TICK_RATE,
+    WARRIOR_DATA, WIZARD_DATA, WARRIOR_ANIMATION_STEPS, WIZARD_ANIMATION_STEPS, PLAYER_1_START,
+    PLAYER_2_START, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_ATTACK_1, INPUT_ATTACK_2
+)
+
+INPUT_BITS = INPUT_LEFT | INPUT_RIGHT | INPUT_JUMP | INPUT_ATTACK_1 | INPUT_ATTACK_2
+EMPTY_SPAN = 1 << 24  # padding runs start and end here, right of every frame, and cover nothing
+SWING_CHUNK = 64  # swing runs tested at once at first; the chunks double while attacks are left
+
+
+# A character's hit shapes (see hitmask.py) as arrays, so many hit tests can
+# be done in one go. Frames are numbered flip * frame count + first[action] +
+# frame index. Every frame is kept as running counts of its opaque pixels
+# along each sheet row, so whether a span covers any of a row's pixels is
+# one subtraction; the swings are kept as flat lists of runs, one per screen row.
+class HitShapes:
+    def __init__(self, character, hitmask):
+        scale = character.scale
+        size = character.size
+        steps = character.animation_steps
+        self.scale = scale
+        self.size = size
+        self.first = np.concatenate([[0], np.cumsum(steps)[:-1]]).astype(np.int32)
+        self.frame_count = sum(steps)
+        shapes = [shape for flip in (False, True) for action, count in enumerate(steps)
+                  for shape in (hitmask.shape(action, i, flip) for i in range(count))]
+        # Opaque pixels left of every column, with one empty row above and below every frame for rows off it
+        opaque = np.zeros((len(shapes), size + 2, size), dtype=bool)
+        for k, shape in enumerate(shapes):
+            for i, row in enumerate(shape.runs):
+                for start, end in zip(row[::2], row[1::2]):
+                    opaque[k, shape.top + i + 1, start:end] = True
+        self.counts = np.zeros((len(shapes) * (size + 2), size + 1), dtype=np.int16)
+        np.cumsum(opaque.reshape(-1, size), axis=1, out=self.counts[:, 1:])
+        self.bounds = self.shape_bounds(shapes, scale)
+
+        # Swing of each attack type (index attack type - 1) per facing, numbered flip * 2 + type - 1,
+        # as runs in screen pixels: the row from the frame's top, start and end from its left edge.
+        # The longest runs come first since they are the likeliest to land, and shorter lists are
+        # padded with runs that cover nothing.
+        swings = [hitmask.sweep(ATTACK_ROWS[attack_type], flip) for flip in (False, True) for attack_type in (1, 2)]
+        runs = [sorted([((swing.top + i) * scale + line, start * scale, end * scale)
+                        for i, row in enumerate(swing.runs) for start, end in zip(row[::2], row[1::2])
+                        for line in range(scale)], key=lambda run: run[1] - run[2])
+                for swing in swings]
+        self.swing_rows = np.zeros((len(swings), max(map(len, runs))), dtype=np.int32)
+        self.swing_starts = np.full(self.swing_rows.shape, EMPTY_SPAN, dtype=np.int32)
+        self.swing_ends = np.full(self.swing_rows.shape, EMPTY_SPAN, dtype=np.int32)
+        for k, swing_runs in enumerate(runs):
+            if swing_runs:
+                self.swing_rows[k, :len(swing_runs)], self.swing_starts[k, :len(swing_runs)], \
+                    self.swing_ends[k, :len(swing_runs)] = zip(*swing_runs)
+        self.swing_bounds = self.shape_bounds(swings, scale)
+
+    # Function for the bounds of shapes in screen pixels: left, top, right, bottom
+    @staticmethod
+    def shape_bounds(shapes, scale):
+        return np.array([(shape.left * scale, shape.top * scale, shape.right * scale, shape.bottom * scale)
+                         for shape in shapes], dtype=np.int32).reshape(-1, 4)
+
+
+# N matches in struct-of-arrays form. Per-player arrays have shape (n, 2),
+# column 0 is player 1 and column 1 is player 2.
+class BatchMatch:
+    def __init__(self, n, data_1=WARRIOR_DATA, steps_1=WARRIOR_ANIMATION_STEPS, data_2=WIZARD_DATA, steps_2=WIZARD_ANIMATION_STEPS):
+        characters = [data if isinstance(data, CharacterData) else get_character(data, steps)
+                      for data, steps in ((data_1, steps_1), (data_2, steps_2))]
+        self.n = n
+        self.tick = 0
+        self.characters = characters
+
+        # Static character data as lookup tables, shared by every match
+        self.size = np.array([c.size for c in characters], dtype=np.int32)
+        self.steps = np.array([c.animation_steps for c in characters], dtype=np.int32)
+        self.frame_ms = np.array([c.frame_ms for c in characters], dtype=np.float64)
+        self.damage = np.array([c.damage for c in characters], dtype=np.int32)
+        self.attack_width = np.array([c.attack_width for c in characters], dtype=np.int32)
+        self.offset = np.array([c.offset for c in characters], dtype=np.int32)
+        self.columns = np.arange(2)
+
+        # Hit shapes of the characters that have a hitmask (None for the others)
+        self.shapes = [None if h is None else HitShapes(c, h) for c, h in ((c, character_hitmask(c)) for c in characters)]
+
+        # Per-tick state
+        self.x = np.empty((n, 2), dtype=np.int32)
+        self.x[:, 0] = PLAYER_1_START[0]
+        self.x[:, 1] = PLAYER_2_START[0]
+        self.y = np.empty((n, 2), dtype=np.int32)
+        self.y[:, 0] = PLAYER_1_START[1]
+        self.y[:, 1] = PLAYER_2_START[1]
+        self.vel_y = np.zeros((n, 2), dtype=np.int32)
+        self.flip = np.zeros((n, 2), dtype=bool)
+        self.flip[:, 1] = True
+        self.running = np.zeros((n, 2), dtype=bool)
+        self.jump = np.zeros((n, 2), dtype=bool)
+        self.attacking = np.zeros((n, 2), dtype=bool)
+        self.attack_type = np.zeros((n, 2), dtype=np.int8)
+        self.health = np.full((n, 2), 100, dtype=np.int32)
+        self.alive = np.ones((n, 2), dtype=bool)
+        self.action = np.zeros((n, 2), dtype=np.int8)
+        self.frame_index = np.zeros((n, 2), dtype=np.int32)
+        self.image_action = np.zeros((n, 2), dtype=np.int8)  # the frame on show, FighterState.image_frame
+        self.image_index = np.zeros((n, 2), dtype=np.int32)
+        self.update_time = np.zeros((n, 2), dtype=np.float64)
+        self.round_over = np.zeros(n, dtype=bool)
+
+        # Per-match results
+        self.end_tick = np.full(n, -1, dtype=np.int32)
+        self.attacks = np.zeros((n, 2), dtype=np.int32)
+        self.damage_dealt = np.zeros((n, 2), dtype=np.int32)
+
+    @property
+    def now(self):
+        return self.tick * TICK_MS
+
+    def update(self, now):
+        dead = self.health <= 0
+        self.alive &= ~dead
+        attack_action = np.where(self.attack_type == 2, ATTACK_ROWS[2], ATTACK_ROWS[1])
+        new_action = np.select([dead, self.attacking, self.jump, self.running],
+                               [ACTION_DEATH, attack_action, ACTION_JUMP, ACTION_RUN], ACTION_IDLE).astype(np.int8)
+        changed = new_action != self.action
+        self.action[changed] = new_action[changed]
+        self.frame_index[changed] = 0
+        self.update_time[changed] = now
+
+        # Animation handling
+        self.image_action[:] = self.action
+        self.image_index[:] = self.frame_index
+        advance = now - self.update_time > self.frame_ms
+        self.update_time[advance] = now
+        self.frame_index += advance
+        frame_count = self.steps[self.columns, self.action]
+        finished = self.frame_index >= frame_count
+        self.frame_index = np.where(finished, np.where(self.alive, 0, frame_count - 1), self.frame_index)
+        self.attacking &= ~(finished & self.alive)
+        self.attack_type[finished & self.alive] = 0
+
+    # Which of the matches idx player column p's attack lands in, with the
+    # same test as FighterState.hits: the swing against the target's frame
+    def swing_hits(self, p, q, idx):
+        attacker = self.shapes[p]
+        target = self.shapes[q]
+        swing = self.flip[idx, p] * 2 + self.attack_type[idx, p] - 1
+        frame = (self.flip[idx, q] * target.frame_count + target.first[self.image_action[idx, q]]
+                 + self.image_index[idx, q])
+        ax = self.x[idx, p] - self.offset[p, 0]
+        ay = self.y[idx, p] - self.offset[p, 1]
+        tx = self.x[idx, q] - self.offset[q, 0]
+        ty = self.y[idx, q] - self.offset[q, 1]
+
+        # Bounding boxes first, rows only for the attacks that pass
+        a_bounds = attacker.swing_bounds[swing]
+        t_bounds = target.bounds[frame]
+        near = ((ax + a_bounds[:, 0] < tx + t_bounds[:, 2]) & (tx + t_bounds[:, 0] < ax + a_bounds[:, 2])
+                & (ay + a_bounds[:, 1] < ty + t_bounds[:, 3]) & (ty + t_bounds[:, 1] < ay + a_bounds[:, 3]))
+        hit = np.zeros(len(idx), dtype=bool)
+        k = np.flatnonzero(near)
+        if k.size:
+            hit[k] = self.runs_hit(attacker, target, swing[k], frame[k], ax[k] - tx[k], ay[k] - ty[k])
+        return hit
+
+    # Which attacks' swing runs cover a pixel of the target's frame, for
+    # attackers dx, dy from the target's frame. Runs are tested a chunk at a
+    # time and attacks that landed drop out, so most hits cost a few chunks.
+    @staticmethod
+    def runs_hit(attacker, target, swing, frame, dx, dy):
+        size = target.size
+        scale = target.scale
+        counts = target.counts.ravel()
+        hit = np.zeros(len(swing), dtype=bool)
+        left = np.arange(len(swing))
+        start = 0
+        chunk = SWING_CHUNK
+        while start < attacker.swing_rows.shape[1] and left.size:
+            runs = slice(start, start + chunk)
+            swings = swing[left]
+            # Target sheet row under every run (rows off the target's frame
+            # read the empty rows around it) and the sheet columns it touches
+            rows = (attacker.swing_rows[swings, runs] + dy[left][:, None]) // scale + 1
+            rows = (np.clip(rows, 0, size + 1) + (frame[left] * (size + 2))[:, None]) * (size + 1)
+            x = dx[left][:, None]
+            first = np.clip((attacker.swing_starts[swings, runs] + x) // scale, 0, size)
+            last = np.clip(-(-(attacker.swing_ends[swings, runs] + x) // scale), 0, size)
+            landed = (counts[rows + last] > counts[rows + first]).any(axis=1)
+            hit[left[landed]] = True
+            left = left[~landed]
+            start += chunk
+            chunk *= 2
+        return hit
+
+    # Move player column p against target column q in every running match
+    def move(self, p, q, inputs, active):
+        x = self.x[:, p]
+        y = self.y[:, p]
+        size = self.size[p]
+        vel_y = self.vel_y[:, p]
+        jump = self.jump[:, p]
+
+        control = active & self.alive[:, p]
+        left = control & ((inputs & INPUT_LEFT) != 0)
+        right = control & ((inputs & INPUT_RIGHT) != 0)
+        attack_1 = control & ((inputs & INPUT_ATTACK_1) != 0)
+        attack = attack_1 | (control & ((inputs & INPUT_ATTACK_2) != 0))
+        dx = np.where(right, SPEED, np.where(left, -SPEED, 0)).astype(np.int32)
+        self.running[:, p] = np.where(active, left | right, self.running[:, p])
+
+        # Jump
+        jump_now = control & ((inputs & INPUT_JUMP) != 0) & ~jump
+        vel_y[jump_now] = JUMP_VELOCITY
+        jump |= jump_now
+
+        # Attack, with the same hit test as FighterState.attack
+        start = attack & ~self.attacking[:, p]
+        self.attacking[:, p] |= start
+        self.attacks[:, p] += start
+        self.attack_type[start, p] = np.where(attack_1[start], 1, 2)
+        target_x = self.x[:, q]
+        target_y = self.y[:, q]
+        target_size = self.size[q]
+        if self.shapes[p] is not None and self.shapes[q] is not None:
+            hit = np.zeros(self.n, dtype=bool)
+            idx = np.flatnonzero(start)
+            if idx.size:
+                hit[idx] = self.swing_hits(p, q, idx)
+        else:
+            # The attack rect (the swing's bounds, or the reach box) against the target's box
+            if self.shapes[p] is not None:
+                bounds = self.shapes[p].swing_bounds[self.flip[:, p] * 2 + np.maximum(self.attack_type[:, p], 1) - 1]
+                attack_x = x - self.offset[p, 0] + bounds[:, 0]
+                attack_y = y - self.offset[p, 1] + bounds[:, 1]
+                attack_width = bounds[:, 2] - bounds[:, 0]
+                attack_height = bounds[:, 3] - bounds[:, 1]
+            else:
+                attack_width = self.attack_width[p]
+                attack_x = x + size // 2 - attack_width * self.flip[:, p]
+                attack_y = y
+                attack_height = size
+            hit = (start & (attack_width > 0) & (attack_height > 0) & (attack_x < target_x + target_size)
+                   & (target_x < attack_x + attack_width) & (attack_y < target_y + target_size)
+                   & (target_y < attack_y + attack_height))
+        damage = np.minimum(self.health[:, q], self.damage[p]) * hit
+        self.health[:, q] -= damage
+        self.damage_dealt[:, p] += damage
+
+        # Apply gravity
+        vel_y += GRAVITY * active
+        dy = vel_y.copy()
+
+        # Stay within screen bounds
+        dx = np.where(x + dx < 0, -x, dx)
+        dx = np.where(x + size + dx > SCREEN_WIDTH, SCREEN_WIDTH - (x + size), dx)
+        floor = SCREEN_HEIGHT - FLOOR_OFFSET
+        landed = active & (y + size + dy > floor)
+        vel_y[landed] = 0
+        jump[landed] = False
+        dy = np.where(landed, floor - (y + size), dy)
+
+        # Update position
+        x += dx * active
+        y += dy * active
+
+        # Flip character
+        self.flip[:, p] = np.where(active, target_x + target_size // 2 < x + size // 2, self.flip[:, p])
+
+    # Advance every match one tick. inputs is an (n, 2) array of input bits.
+    def step(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.uint8)
+        self.update(self.now)
+        active = ~self.round_over
+        self.move(0, 1, inputs[:, 0], active)
+        self.move(1, 0, inputs[:, 1], active)
+        ended = active & ~(self.alive[:, 0] & self.alive[:, 1])
+        self.end_tick[ended] = self.tick
+        self.round_over |= ended
+        self.tick += 1
+        return self.round_over
+
+    # 1 or 2 for the surviving player, 0 while the round runs or on a double KO
+    def winner(self):
+        return np.where(self.alive[:, 0] == self.alive[:, 1], 0, np.where(self.alive[:, 0], 1, 2))
+
+    # Play until every match ends or max_ticks pass. policy(batch) returns (n, 2) input bits.
+    def run(self, policy, max_ticks=60 * TICK_RATE):
+        while self.tick < max_ticks and not self.round_over.all():
+            self.step(policy(self))
+        return self.winner()
+
+
+# Policy pressing each button independently with the given chance every tick
+def random_policy(rng, press_chance=0.2):
+    bits = np.array([INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_ATTACK_1, INPUT_ATTACK_2], dtype=np.uint8)
+
+    def policy(batch):
+        pressed = rng.random((batch.n, 2, len(bits))) < press_chance
+        return (pressed * bits).sum(axis=2).astype(np.uint8) & INPUT_BITS
+
+    return policy
@@ -0,0 +1,276 @@
+# Benchmark suite.
+# Times the hot paths of the game on the SDL dummy video driver, so it runs
+# the same on a desktop and a headless CI box: sheet and bundle loading,
+# building a Fighter, drawing a fighter (facing either way), the hit test,
+# the background, text, a whole fight frame, and stepping a headless match.
+# The drawing cases call the game's own functions in fighter.py after
+# fighter.init_game(), so they time exactly what the game runs.
+#
+# Each case is repeated until a run takes at least --min-time and the best of
+# --repeat runs is reported as ops/sec. Memory is measured in a separate,
+# untimed run: the peak Python allocation (tracemalloc) and the growth of the
+# process's resident size, which also sees SDL's pixel buffers.
+#
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+#
+# --compare exits with status 1 if any case got slower than --threshold.
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+os.environ.setdefault("BRAWLER_AUDIO", "off")
+
+import numpy as np
+import pygame
+
+import bundle
+import fighter
+import sprites
+import tournament
+from characters import BUILTIN_CHARACTERS, ACTION_RUN
+from simulation import FighterState, Match, TICK_RATE
+
+BACKGROUND_MODE = "normal"
+SIM_TICKS = 60 * TICK_RATE
+
+
+# Function for the resident size of the process in KB, None where /proc is missing
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Function for timing one case: func() is one operation (or ops_per_call of
+# them). Returns ops/sec of the best and median run plus memory use.
+def measure(func, repeat=5, min_time=0.2, ops_per_call=1):
+    func()  # warm caches and lazy imports before timing
+    number = 1
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            seconds = time.perf_counter() - start
+            if seconds >= min_time:
+                break
+            number *= 2 if seconds < min_time / 4 else 1 + int(min_time / max(seconds, 1e-9))
+        runs = [seconds]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            runs.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    rss_before = rss_kb()
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_kb()
+
+    ops = number * ops_per_call
+    return {
+        "ops_per_sec": ops / min(runs),
+        "median_ops_per_sec": ops / statistics.median(runs),
+        "us_per_op": min(runs) / ops * 1e6,
+        "ops_per_run": ops,
+        "runs": len(runs),
+        "peak_kb": peak / 1024,
+        "retained_kb": current / 1024,
+        "rss_growth_kb": None if rss_before is None else rss_after - rss_before
+    }
+
+
+# Function for setting up the game as fighter.main() does, with the assets
+# of a fight loaded and a round of two CPU fighters under way
+def start_game():
+    fighter.init_game()
+    fighter.selected_mode = BACKGROUND_MODE
+    fighter.cpu_player = 2
+    fighter.start_match()
+    fighter.start_round()
+    fighter.fighter_1.controller = fighter.cpu_input
+    machine = fighter.create_scenes()
+    machine.scene = machine.scenes["fight"]
+    return machine
+
+
+# Function for running ticks of headless matches, starting a new one after every round
+def simulate(ticks, seed=0):
+    rng = random.Random(seed)
+    policy_1 = tournament.scripted_policy(rng)
+    policy_2 = tournament.scripted_policy(rng)
+    done = 0
+    while done < ticks:
+        match = Match(BUILTIN_CHARACTERS["warrior"], None, BUILTIN_CHARACTERS["wizard"], None)
+        match.run(policy_1, policy_2, ticks - done)
+        done += match.tick
+
+
+# Function for every case as name -> (func, ops per call); needs start_game()
+def build_cases(machine, sim_ticks=SIM_TICKS):
+    screen = fighter.screen
+    renderer = fighter.renderer
+    warrior = BUILTIN_CHARACTERS["warrior"]
+    warrior_sheet = sprites.load_sheet(warrior.sheet)
+    cases = {}
+
+    def load_sheet():
+        sprites.clear_cache()
+        sprites.load_sheet(warrior.sheet)
+    cases["asset.load_sheet"] = (load_sheet, 1)
+
+    if os.path.exists(bundle.BUNDLE_PATH):
+        def load_bundle():
+            asset_bundle = bundle.AssetBundle(bundle.BUNDLE_PATH)
+            for entry in asset_bundle.index["animations"]:
+                asset_bundle.animation(entry)
+        cases["asset.load_bundle"] = (load_bundle, 1)
+
+    # A new Fighter slices and scales its frames unless they are cached
+    def load_images():
+        sprites.clear_cache()
+        sprites.add_sheet(warrior.sheet, warrior_sheet)
+        fighter.create_fighter(1, 200, 310, False)
+    cases["Fighter.load_images"] = (load_images, 1)
+    cases["Fighter.load_images.cached"] = (lambda: fighter.create_fighter(1, 200, 310, False), 1)
+
+    drawn = fighter.create_fighter(1, 200, 310, False)
+
+    def draw_fighter(flip):
+        def draw():
+            drawn.flip = flip
+            for frame in range(100):
+                drawn.image_frame = (ACTION_RUN, frame % drawn.animation_steps[ACTION_RUN])
+                drawn.draw(screen, 1.0)
+        return draw
+    cases["Fighter.draw"] = (draw_fighter(False), 100)
+    cases["Fighter.draw.flip"] = (draw_fighter(True), 100)
+
+    def draw_bg():
+        renderer.invalidate()
+        fighter.draw_bg(BACKGROUND_MODE)
+    cases["draw_bg"] = (draw_bg, 1)
+
+    attacker = FighterState(1, 300, 310, False, warrior)
+    attacker.attack_type = 1
+    target = FighterState(2, 500, 310, True, BUILTIN_CHARACTERS["wizard"])
+    attacker.attacking = True
+    cases["Fighter.hits"] = (lambda: attacker.hits(attacker.attack_rect(), target), 1)
+
+    # draw_text queues its rect with the renderer, drop them between runs
+    def draw_text():
+        for _ in range(100):
+            fighter.draw_text("Player 1: ", fighter.score_font, fighter.RED, 20, 60)
+        renderer.dirty_rects = []
+    cases["draw_text"] = (draw_text, 100)
+    cases["draw_text.uncached"] = (
+        lambda: screen.blit(fighter.score_font.render("Player 1: ", True, fighter.RED), (20, 60)), 1)
+
+    # One tick and one frame of the fight scene, a new round whenever one ends
+    scene = machine.scenes["fight"]
+
+    def frame():
+        if not (fighter.fighter_1.alive and fighter.fighter_2.alive):
+            fighter.start_round()
+            fighter.fighter_1.controller = fighter.cpu_input
+        fighter.cpu_input.new_frame()
+        scene.step()
+        machine.pending = None
+        scene.render()
+    cases["frame"] = (frame, 1)
+    cases["simulation.ticks"] = (lambda: simulate(sim_ticks), sim_ticks)
+    return cases
+
+
+# Function for printing a comparison with an earlier result file; returns
+# the names of the cases that got slower by more than threshold
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"{'case':<28}{'before':>14}{'after':>14}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<28}{'-':>14}{result['ops_per_sec']:>14,.0f}{'new':>9}")
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<28}{before['ops_per_sec']:>14,.0f}{result['ops_per_sec']:>14,.0f}{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering, simulation and asset loading.")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the results as JSON")
+    parser.add_argument("--compare", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds each run takes at least")
+    parser.add_argument("--sim-ticks", type=int, default=SIM_TICKS)
+    parser.add_argument("--only", nargs="*", help="run only cases whose name starts with one of these")
+    args = parser.parse_args()
+
+    cases = build_cases(start_game(), args.sim_ticks)
+    results = {}
+    for name, (func, ops_per_call) in cases.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        result = measure(func, args.repeat, args.min_time, ops_per_call)
+        results[name] = result
+        print(f"{name:<28}{result['ops_per_sec']:>14,.0f} ops/s{result['us_per_op']:>12.2f} us"
+              f"{result['peak_kb']:>10.1f} KB peak")
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "video_driver": pygame.display.get_driver(),
+            "repeat": args.repeat,
+            "min_time": args.min_time,
+            "rss_kb": rss_kb()
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    fighter.game_assets.shutdown()
+    pygame.quit()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Slower than " + args.compare + ": " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
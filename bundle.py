@@ -0,0 +1,160 @@
+# Preprocessed asset bundle.
+#
+# The bake step (python bundle.py) slices, scales, crops and mirrors every
+# fighter frame and scales every background to the screen once, then writes
+# the raw BGRA pixels into one uncompressed file:
+#
+#   header | pixel data (64-byte aligned blocks) | JSON index
+#
+# At runtime the bundle is memory-mapped and each frame becomes a surface
+# that wraps its slice of the mapping, so nothing is decoded, scaled or
+# copied when the game starts or a round resets.
+#
+# The index stamps every entry with the size and modification time of the
+# file it was baked from. Entries whose source changed (or whose background
+# mode now points at another file) are not installed, so the game loads
+# those from the source instead of showing stale pixels.
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+import render
+import sprites
+from characters import load_roster
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT
+
+BUNDLE_PATH = "assets/bundle.bin"
+MAGIC = b"BRBN"
+VERSION = 2
+# magic, version, index offset, index length
+HEADER = struct.Struct("<4sHQQ")
+ALIGNMENT = 64
+PIXEL_FORMAT = "BGRA"  # same layout as convert_alpha() surfaces
+
+
+# Writes surfaces as aligned raw pixel blocks and remembers where they went
+class BundleWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def write_surface(self, surface):
+        padding = -self.file.tell() % ALIGNMENT
+        self.file.write(b"\0" * padding)
+        offset = self.file.tell()
+        self.file.write(pygame.image.tobytes(surface, PIXEL_FORMAT))
+        return [offset, surface.get_width(), surface.get_height()]
+
+    def write_animation(self, animation):
+        entry = {"frames": [], "offsets": animation.offsets, "flipped": [], "flipped_offsets": animation.flipped_offsets}
+        for frames, name in ((animation.frames, "frames"), (animation.flipped, "flipped")):
+            for action in frames:
+                entry[name].append([self.write_surface(frame) for frame in action])
+        return entry
+
+    def close(self, index):
+        index_data = json.dumps(index).encode()
+        index_offset = self.file.tell()
+        self.file.write(index_data)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index_data)))
+        self.file.close()
+
+
+# Function for the stamp of a source file: [size, modification time in ns], None if it is missing
+def source_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Function for baking every character of the roster and every background of
+# render.BG_PATHS into a bundle file
+def bake(path=BUNDLE_PATH, screen_size=(SCREEN_WIDTH, SCREEN_HEIGHT)):
+    writer = BundleWriter(path)
+    index = {"screen_size": list(screen_size), "animations": [], "backgrounds": {}}
+    for character in load_roster().values():
+        sheet = pygame.image.load(character.sheet).convert_alpha()
+        animation = sprites.build_animation(sheet, character.size, character.scale, character.animation_steps)
+        entry = writer.write_animation(animation)
+        entry["key"] = [character.sheet, character.size, character.scale, list(character.animation_steps)]
+        entry["stamp"] = source_stamp(character.sheet)
+        index["animations"].append(entry)
+    for mode, bg_path in render.BG_PATHS.items():
+        scaled_bg = pygame.transform.scale(pygame.image.load(bg_path).convert_alpha(), screen_size)
+        index["backgrounds"][mode] = {"source": bg_path, "stamp": source_stamp(bg_path),
+                                      "surface": writer.write_surface(scaled_bg)}
+    writer.close(index)
+
+
+# Memory-mapped bundle. Surfaces made from it share memory with the mapping,
+# so the bundle must stay open for as long as they are used.
+class AssetBundle:
+    def __init__(self, path=BUNDLE_PATH):
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        magic, version, index_offset, index_length = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an asset bundle: " + path)
+        if version != VERSION:
+            raise ValueError(f"Unsupported asset bundle version: {version}")
+        self.index = json.loads(bytes(self.view[index_offset:index_offset + index_length]))
+        self.stale = []  # sources that changed since baking, see install()
+
+    def surface(self, entry):
+        offset, width, height = entry
+        if width == 0 or height == 0:
+            return pygame.Surface((width, height), pygame.SRCALPHA)
+        return pygame.image.frombuffer(self.view[offset:offset + width * height * 4], (width, height), PIXEL_FORMAT)
+
+    def animation(self, entry):
+        frames = [[self.surface(frame) for frame in action] for action in entry["frames"]]
+        flipped = [[self.surface(frame) for frame in action] for action in entry["flipped"]]
+        offsets = [[tuple(offset) for offset in action] for action in entry["offsets"]]
+        flipped_offsets = [[tuple(offset) for offset in action] for action in entry["flipped_offsets"]]
+        return sprites.Animation(frames, offsets, flipped, flipped_offsets)
+
+    # Put every animation and background whose source is unchanged into the
+    # shared caches; the stale ones are listed in self.stale. Backgrounds are
+    # converted to the opaque display format (one copy) so they blit fast.
+    def install(self):
+        for entry in self.index["animations"]:
+            sheet_path, size, scale, steps = entry["key"]
+            if entry["stamp"] != source_stamp(sheet_path):
+                self.stale.append(sheet_path)
+                continue
+            sprites.add_animation(sprites.animation_key(sheet_path, size, scale, steps), self.animation(entry))
+        screen_size = tuple(self.index["screen_size"])
+        for mode, entry in self.index["backgrounds"].items():
+            if entry["source"] != render.BG_PATHS.get(mode) or entry["stamp"] != source_stamp(entry["source"]):
+                self.stale.append(entry["source"])
+                continue
+            render.add_scaled_bg(mode, screen_size, self.surface(entry["surface"]).convert())
+
+
+# Function for opening and installing the bundle if it has been baked. A
+# bundle baked by another version is ignored until it is baked again.
+def load_bundle(path=BUNDLE_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = AssetBundle(path)
+    except ValueError:
+        return None
+    bundle.install()
+    return bundle
+
+
+if __name__ == "__main__":
+    # convert_alpha() needs a display; the dummy driver is enough for baking
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    bake()
+    print(f"Wrote {BUNDLE_PATH} ({os.path.getsize(BUNDLE_PATH) / 1e6:.1f} MB)")
@@ -0,0 +1,199 @@
+# Character definitions.
+#
+# A character is declared as plain data (a dict here, or a JSON file in
+# assets/characters/) and compiled once into a read-only CharacterData
+# record. The simulation only ever indexes those records, so adding
+# characters adds no per-frame branching.
+#
+# Definition fields:
+#   name        unique name used to pick the character
+#   sheet       sprite sheet path, one row per entry of ANIMATIONS
+#   frame_size  size in pixels of a square frame on the sheet (and of the hurtbox)
+#   scale       how much frames are scaled up when drawn
+#   offset      [x, y] from the hurtbox to the top left of the drawn frame
+#   animations  frame count of every animation in ANIMATIONS
+#   frame_ms    how long each animation frame is shown (default 50)
+#   damage      health taken by a landed attack (default 10)
+#   reach       attack box width as a multiple of frame_size (default 2)
+#   sound       attack sound path (optional) and volume (default 1.0)
+#   hitmask     optional path of the hit shapes baked from the sheet (see
+#               hitmask.py); without one attacks hit with the reach box
+#   projectile  optional {speed, size: [w, h], damage, lifetime_ms}; in the
+#               arena the second attack fires it instead of striking
+import json
+import os
+from collections import namedtuple
+
+# Animation rows of every sprite sheet, in sheet order
+ANIMATIONS = ["idle", "run", "jump", "attack_1", "attack_2", "hit", "death"]
+
+# Rows the fighter state machine plays
+ACTION_IDLE = 0
+ACTION_RUN = 1
+ACTION_JUMP = 2
+ACTION_DEATH = 6
+
+# Row each attack type plays; its swing is the attack's hitbox
+ATTACK_ROWS = {1: ANIMATIONS.index("attack_1"), 2: ANIMATIONS.index("attack_2")}
+
+CHARACTER_DIR = "assets/characters"
+
+# Defaults for optional definition fields
+DEFAULT_FRAME_MS = 50
+DEFAULT_DAMAGE = 10
+DEFAULT_REACH = 2
+
+# Static, read-only character record shared by every fighter of that character
+CharacterData = namedtuple("CharacterData", ["name", "sheet", "size", "scale", "offset", "animation_steps",
+                                             "frame_ms", "damage", "attack_width", "sound", "volume", "projectile",
+                                             "hitmask"])
+ProjectileData = namedtuple("ProjectileData", ["speed", "width", "height", "damage", "lifetime_ms"])
+
+BUILTIN_DEFINITIONS = [
+    {
+        "name": "warrior",
+        "sheet": "assets/images/warrior/Sprites/warrior.png",
+        "frame_size": 162,
+        "scale": 4,
+        "offset": [72, 120],
+        "animations": {"idle": 10, "run": 8, "jump": 1, "attack_1": 7, "attack_2": 7, "hit": 3, "death": 7},
+        "sound": "assets/audio/sword.wav",
+        "volume": 0.5,
+        "hitmask": "assets/hitmasks/warrior.json"
+    },
+    {
+        "name": "wizard",
+        "sheet": "assets/images/wizard/Sprites/wizard.png",
+        "frame_size": 250,
+        "scale": 3,
+        "offset": [112, 150],
+        "animations": {"idle": 8, "run": 8, "jump": 1, "attack_1": 8, "attack_2": 8, "hit": 3, "death": 7},
+        "sound": "assets/audio/magic.wav",
+        "volume": 0.75,
+        "hitmask": "assets/hitmasks/wizard.json",
+        "projectile": {"speed": 18, "size": [80, 40], "damage": 8, "lifetime_ms": 1000}
+    }
+]
+
+
+def _positive_int(definition, field):
+    value = definition.get(field)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"Character {definition.get('name')!r}: {field} must be a positive integer")
+    return value
+
+
+# Function for validating a definition and compiling it into a CharacterData
+def compile_character(definition):
+    name = definition.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError("Character definition needs a name")
+    if not isinstance(definition.get("sheet"), str):
+        raise ValueError(f"Character {name!r}: sheet must be a path")
+    size = _positive_int(definition, "frame_size")
+    scale = _positive_int(definition, "scale")
+    offset = definition.get("offset")
+    if not isinstance(offset, (list, tuple)) or len(offset) != 2 or not all(isinstance(v, int) for v in offset):
+        raise ValueError(f"Character {name!r}: offset must be [x, y]")
+    animations = definition.get("animations")
+    if not isinstance(animations, dict) or set(animations) != set(ANIMATIONS):
+        raise ValueError(f"Character {name!r}: animations must give a frame count for each of {ANIMATIONS}")
+    steps = []
+    for animation in ANIMATIONS:
+        count = animations[animation]
+        if not isinstance(count, int) or count <= 0:
+            raise ValueError(f"Character {name!r}: animation {animation!r} needs at least one frame")
+        steps.append(count)
+    frame_ms = definition.get("frame_ms", DEFAULT_FRAME_MS)
+    damage = definition.get("damage", DEFAULT_DAMAGE)
+    reach = definition.get("reach", DEFAULT_REACH)
+    if not isinstance(frame_ms, (int, float)) or frame_ms <= 0:
+        raise ValueError(f"Character {name!r}: frame_ms must be positive")
+    if not isinstance(damage, int) or damage < 0:
+        raise ValueError(f"Character {name!r}: damage must be a non-negative integer")
+    if not isinstance(reach, (int, float)) or reach <= 0:
+        raise ValueError(f"Character {name!r}: reach must be positive")
+    sound = definition.get("sound")
+    if sound is not None and not isinstance(sound, str):
+        raise ValueError(f"Character {name!r}: sound must be a path")
+    projectile = definition.get("projectile")
+    if projectile is not None:
+        projectile = compile_projectile(name, projectile)
+    hitmask = definition.get("hitmask")
+    if hitmask is not None and not isinstance(hitmask, str):
+        raise ValueError(f"Character {name!r}: hitmask must be a path")
+    return CharacterData(name, definition["sheet"], size, scale, tuple(offset), tuple(steps), frame_ms, damage,
+                         int(reach * size), sound, float(definition.get("volume", 1.0)), projectile, hitmask)
+
+
+# Function for validating a character's projectile
+def compile_projectile(name, projectile):
+    size = projectile.get("size") if isinstance(projectile, dict) else None
+    if not isinstance(size, (list, tuple)) or len(size) != 2 or not all(isinstance(v, int) and v > 0 for v in size):
+        raise ValueError(f"Character {name!r}: projectile size must be [width, height]")
+    speed = projectile.get("speed")
+    damage = projectile.get("damage")
+    lifetime_ms = projectile.get("lifetime_ms")
+    if not isinstance(speed, int) or speed <= 0:
+        raise ValueError(f"Character {name!r}: projectile speed must be a positive integer")
+    if not isinstance(damage, int) or damage < 0:
+        raise ValueError(f"Character {name!r}: projectile damage must be a non-negative integer")
+    if not isinstance(lifetime_ms, (int, float)) or lifetime_ms <= 0:
+        raise ValueError(f"Character {name!r}: projectile lifetime_ms must be positive")
+    return ProjectileData(speed, size[0], size[1], damage, lifetime_ms)
+
+
+BUILTIN_CHARACTERS = {definition["name"]: compile_character(definition) for definition in BUILTIN_DEFINITIONS}
+
+
+# Function for reading every JSON definition in a directory
+def load_definitions(directory=CHARACTER_DIR):
+    definitions = []
+    if os.path.isdir(directory):
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(directory, file_name)) as f:
+                    definitions.append(json.load(f))
+    return definitions
+
+
+# Function for the full roster: built-in characters plus any JSON definitions.
+# Every declared hitmask is loaded and checked against its character here, so
+# a missing or mismatched file fails at startup (the baker skips the check).
+def load_roster(directory=CHARACTER_DIR, check_hitmasks=True):
+    roster = dict(BUILTIN_CHARACTERS)
+    for definition in load_definitions(directory):
+        character = compile_character(definition)
+        roster[character.name] = character
+    if check_hitmasks:
+        import hitmask  # hitmask imports this module
+        for character in roster.values():
+            hitmask.character_hitmask(character)
+    return roster
+
+
+_characters = {}
+
+
+# Function for getting the shared record for legacy [size, scale, offset]
+# data and animation steps. Data matching one of candidates (default: the
+# built-in characters) gets its full record; anything else gets the default
+# timing and combat values. Data matching more than one candidate is an
+# error, as the geometry alone cannot tell them apart.
+def get_character(data, animation_steps, candidates=None):
+    key = (data[0], data[1], tuple(data[2]), tuple(animation_steps))
+    character = _characters.get(key) if candidates is None else None
+    if character is None:
+        matches = [candidate for candidate in (BUILTIN_CHARACTERS.values() if candidates is None else candidates)
+                   if (candidate.size, candidate.scale, candidate.offset, candidate.animation_steps) == key]
+        if len(matches) > 1:
+            raise ValueError(f"Character data {list(data)} matches more than one character: "
+                             f"{', '.join(repr(match.name) for match in matches)}")
+        if matches:
+            character = matches[0]
+        else:
+            character = CharacterData(None, None, key[0], key[1], key[2], key[3], DEFAULT_FRAME_MS, DEFAULT_DAMAGE,
+                                      DEFAULT_REACH * key[0], None, 1.0, None, None)
+        if candidates is None:
+            _characters[key] = character
+    return character
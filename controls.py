@@ -0,0 +1,201 @@
+# Event-driven player input.
+# The game loop hands every event to InputLayer.handle_event once per frame;
+# keyboard and gamepad events go through a remappable binding table into
+# per-player action bitmasks (simulation.INPUT_* bits). Presses are latched
+# until the next simulation tick reads them, so a tap between two ticks is
+# never lost, and jump/attack presses are timestamped and stay buffered for a
+# short window so a press just before an action is possible still counts.
+#
+# Anything with read(player) -> bits and end_tick() can drive a Fighter, so
+# the AI plugs in the same way as the keyboard (replays step a
+# simulation.Match straight from their recorded bits, see replay.py).
+import json
+import os
+
+import pygame
+
+from simulation import INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_ATTACK_1, INPUT_ATTACK_2
+
+ACTIONS = {"left": INPUT_LEFT, "right": INPUT_RIGHT, "jump": INPUT_JUMP, "attack_1": INPUT_ATTACK_1,
+           "attack_2": INPUT_ATTACK_2}
+BUFFERED_BITS = (INPUT_JUMP, INPUT_ATTACK_1, INPUT_ATTACK_2)
+DEFAULT_BUFFER_MS = 100
+BINDINGS_PATH = "bindings.json"
+
+# Keyboard controls: key -> (player, action bit)
+DEFAULT_KEY_BINDINGS = {
+    pygame.K_a: (1, INPUT_LEFT),
+    pygame.K_d: (1, INPUT_RIGHT),
+    pygame.K_w: (1, INPUT_JUMP),
+    pygame.K_r: (1, INPUT_ATTACK_1),
+    pygame.K_t: (1, INPUT_ATTACK_2),
+    pygame.K_LEFT: (2, INPUT_LEFT),
+    pygame.K_RIGHT: (2, INPUT_RIGHT),
+    pygame.K_UP: (2, INPUT_JUMP),
+    pygame.K_KP1: (2, INPUT_ATTACK_1),
+    pygame.K_KP2: (2, INPUT_ATTACK_2)
+}
+
+# Gamepad buttons (the same for every pad): button -> action bit. The d-pad
+# and left stick move, d-pad up jumps.
+DEFAULT_PAD_BINDINGS = {
+    0: INPUT_JUMP,
+    2: INPUT_ATTACK_1,
+    3: INPUT_ATTACK_2
+}
+
+
+class InputLayer:
+    def __init__(self, key_bindings=None, pad_bindings=None, players=(1, 2), buffer_ms=DEFAULT_BUFFER_MS,
+                 deadzone=0.5):
+        self.key_bindings = dict(DEFAULT_KEY_BINDINGS if key_bindings is None else key_bindings)
+        self.pad_bindings = dict(DEFAULT_PAD_BINDINGS if pad_bindings is None else pad_bindings)
+        self.players = players
+        self.buffer_ms = buffer_ms
+        self.deadzone = deadzone
+        self.pads = {}  # joystick instance id -> (joystick, player)
+        self.keys = {player: 0 for player in players}  # held bits, one mask per source
+        self.buttons = {player: 0 for player in players}
+        self.dpad = {player: 0 for player in players}
+        self.stick = {player: 0 for player in players}
+        self.taps = {player: 0 for player in players}  # pressed since the last tick
+        self.press_times = {}  # (player, bit) -> ms of the last press
+
+    def held(self, player):
+        return self.keys[player] | self.buttons[player] | self.dpad[player] | self.stick[player]
+
+    def press(self, player, bits, now):
+        self.taps[player] |= bits
+        for bit in BUFFERED_BITS:
+            if bits & bit:
+                self.press_times[(player, bit)] = now
+
+    # Set one held mask of a player, counting newly set bits as presses
+    def set_held(self, masks, player, bits, now):
+        pressed = bits & ~masks[player]
+        masks[player] = bits
+        if pressed:
+            self.press(player, pressed, now)
+
+    # Feed one event; returns True if it was player input
+    def handle_event(self, event, now=None):
+        if now is None:
+            now = pygame.time.get_ticks()
+        if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+            binding = self.key_bindings.get(event.key)
+            if binding is None:
+                return False
+            player, bit = binding
+            if event.type == pygame.KEYDOWN:
+                self.set_held(self.keys, player, self.keys[player] | bit, now)
+            else:
+                self.keys[player] &= ~bit
+            return True
+        if event.type == pygame.JOYDEVICEADDED:
+            self.add_pad(event.device_index)
+            return True
+        if event.type == pygame.JOYDEVICEREMOVED:
+            self.remove_pad(event.instance_id)
+            return True
+        if event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYHATMOTION, pygame.JOYAXISMOTION):
+            pad = self.pads.get(event.instance_id)
+            if pad is None:
+                return False
+            player = pad[1]
+            if event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP):
+                bit = self.pad_bindings.get(event.button, 0)
+                bits = self.buttons[player] | bit if event.type == pygame.JOYBUTTONDOWN else self.buttons[player] & ~bit
+                self.set_held(self.buttons, player, bits, now)
+            elif event.type == pygame.JOYHATMOTION:
+                x, y = event.value
+                bits = (INPUT_LEFT if x < 0 else 0) | (INPUT_RIGHT if x > 0 else 0) | (INPUT_JUMP if y > 0 else 0)
+                self.set_held(self.dpad, player, bits, now)
+            elif event.axis == 0:
+                bits = (INPUT_LEFT if event.value < -self.deadzone else 0) | (INPUT_RIGHT if event.value > self.deadzone else 0)
+                self.set_held(self.stick, player, bits, now)
+            return True
+        return False
+
+    # A new pad goes to the first player without one
+    def add_pad(self, device_index):
+        taken = {player for _, player in self.pads.values()}
+        free = [player for player in self.players if player not in taken]
+        if free:
+            joystick = pygame.joystick.Joystick(device_index)
+            self.pads[joystick.get_instance_id()] = (joystick, free[0])
+
+    def remove_pad(self, instance_id):
+        pad = self.pads.pop(instance_id, None)
+        if pad is not None:
+            player = pad[1]
+            self.buttons[player] = self.dpad[player] = self.stick[player] = 0
+
+    # Buttons of a player for the coming tick: held, tapped since the last
+    # tick, or (jump and attacks) pressed within the buffer window
+    def read(self, player, now=None):
+        if player not in self.taps:
+            return 0
+        if now is None:
+            now = pygame.time.get_ticks()
+        bits = self.held(player) | self.taps[player]
+        for bit in BUFFERED_BITS:
+            press_time = self.press_times.get((player, bit))
+            if press_time is not None and now - press_time <= self.buffer_ms:
+                bits |= bit
+        return bits
+
+    # Call after every simulation tick; taps have been seen by then
+    def end_tick(self):
+        for player in self.taps:
+            self.taps[player] = 0
+
+    # Forget everything held or buffered, e.g. when a round starts
+    def reset(self):
+        for masks in (self.keys, self.buttons, self.dpad, self.stick, self.taps):
+            for player in masks:
+                masks[player] = 0
+        self.press_times.clear()
+
+    # Remap an action of a player to a key, replacing its old key
+    def bind_key(self, key, player, bit):
+        for old_key, binding in list(self.key_bindings.items()):
+            if binding == (player, bit):
+                del self.key_bindings[old_key]
+        self.key_bindings[key] = (player, bit)
+
+    # Remap a gamepad action to a button, replacing its old button
+    def bind_button(self, button, bit):
+        for old_button, old_bit in list(self.pad_bindings.items()):
+            if old_bit == bit:
+                del self.pad_bindings[old_button]
+        self.pad_bindings[button] = bit
+
+    # Bindings by name: {"1": {"left": "a", ...}, "2": {...}, "pad": {"jump": 0, ...}}
+    def to_names(self):
+        names = {"pad": {}}
+        action_names = {bit: name for name, bit in ACTIONS.items()}
+        for key, (player, bit) in self.key_bindings.items():
+            names.setdefault(str(player), {})[action_names[bit]] = pygame.key.name(key)
+        for button, bit in self.pad_bindings.items():
+            names["pad"][action_names[bit]] = button
+        return names
+
+    def load_names(self, names):
+        for player, actions in names.items():
+            for action, value in actions.items():
+                if action not in ACTIONS:
+                    raise ValueError(f"Unknown action in bindings: {action!r}")
+                if player == "pad":
+                    self.bind_button(int(value), ACTIONS[action])
+                else:
+                    self.bind_key(pygame.key.key_code(value), int(player), ACTIONS[action])
+
+    def save(self, path=BINDINGS_PATH):
+        with open(path, "w") as f:
+            json.dump(self.to_names(), f, indent=2)
+
+    # Apply saved bindings on top of the current ones, if the file exists
+    def load(self, path=BINDINGS_PATH):
+        if os.path.exists(path):
+            with open(path) as f:
+                self.load_names(json.load(f))
@@ -0,0 +1,123 @@
+# Pooled effects.
+# Projectiles and hit sparks live in preallocated NumPy arrays, one slot per
+# effect, with a stack of free slot numbers. Spawning and expiring thousands
+# of them creates no Python objects for the garbage collector to chase, the
+# whole pool is moved with a few array operations and render.draw_pool draws
+# the live ones with a single Surface.blits call.
+import numpy as np
+
+
+# Fixed-capacity slot storage shared by the effect pools
+class EffectPool:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = np.zeros(capacity, dtype=bool)
+        self.kind = np.zeros(capacity, dtype=np.int16)  # image index used when drawing
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32)  # stack, top is the end
+        self.free_count = capacity
+        self.dropped = 0  # spawns lost because the pool was full
+
+    @property
+    def count(self):
+        return self.capacity - self.free_count
+
+    # Take up to n free slots, returned as indices into the arrays
+    def allocate(self, n):
+        if n > self.free_count:
+            self.dropped += n - self.free_count
+            n = self.free_count
+        self.free_count -= n
+        slots = self.free[self.free_count:self.free_count + n].copy()
+        self.active[slots] = True
+        return slots
+
+    # Give slots back to the free stack
+    def release(self, slots):
+        self.active[slots] = False
+        self.free[self.free_count:self.free_count + len(slots)] = slots
+        self.free_count += len(slots)
+
+    def live_slots(self):
+        return np.flatnonzero(self.active)
+
+    def clear(self):
+        self.release(self.live_slots())
+
+
+# Short-lived sparks thrown out from a point, falling under gravity
+class ParticlePool(EffectPool):
+    def __init__(self, capacity=4096, gravity=0.002):
+        super().__init__(capacity)
+        self.gravity = gravity  # px per ms per ms
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)  # px per ms
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.float32)
+        self.lifetime = np.zeros(capacity, dtype=np.float32)
+
+    # Spawn count particles at (x, y) in random directions, returns how many fit
+    def burst(self, x, y, count, speed, lifetime_ms, rng, kinds=1):
+        slots = self.allocate(count)
+        n = len(slots)
+        angle = rng.uniform(0.0, 2 * np.pi, n)
+        velocity = rng.uniform(0.25 * speed, speed, n)
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angle) * velocity
+        self.vy[slots] = np.sin(angle) * velocity
+        self.age[slots] = 0.0
+        self.lifetime[slots] = rng.uniform(0.5 * lifetime_ms, lifetime_ms, n)
+        self.kind[slots] = rng.integers(0, kinds, n)
+        return n
+
+    # Move every particle dt milliseconds on and free the expired ones
+    def update(self, dt):
+        active = self.active
+        self.vy += self.gravity * dt * active
+        self.x += self.vx * dt * active
+        self.y += self.vy * dt * active
+        self.age += dt * active
+        expired = active & (self.age >= self.lifetime)
+        if expired.any():
+            self.release(np.flatnonzero(expired))
+
+
+# Straight-flying projectiles. Integer positions so the simulation that owns
+# them stays deterministic for replays and rollback.
+class ProjectilePool(EffectPool):
+    def __init__(self, capacity=512):
+        super().__init__(capacity)
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.width = np.zeros(capacity, dtype=np.int32)
+        self.height = np.zeros(capacity, dtype=np.int32)
+        self.vx = np.zeros(capacity, dtype=np.int32)  # px per tick
+        self.damage = np.zeros(capacity, dtype=np.int32)
+        self.owner = np.zeros(capacity, dtype=np.int32)
+        self.expires = np.zeros(capacity, dtype=np.float64)
+
+    # Spawn one projectile, returns its slot or -1 if the pool is full
+    def spawn(self, x, y, width, height, vx, damage, owner, expires, kind=0):
+        slots = self.allocate(1)
+        if not len(slots):
+            return -1
+        slot = slots[0]
+        self.x[slot] = x
+        self.y[slot] = y
+        self.width[slot] = width
+        self.height[slot] = height
+        self.vx[slot] = vx
+        self.damage[slot] = damage
+        self.owner[slot] = owner
+        self.expires[slot] = expires
+        self.kind[slot] = kind
+        return slot
+
+    # Move every projectile one tick and free the ones that expired or left [0, field_width]
+    def update(self, now, field_width):
+        active = self.active
+        self.x += self.vx * active
+        expired = active & ((now >= self.expires) | (self.x + self.width < 0) | (self.x > field_width))
+        if expired.any():
+            self.release(np.flatnonzero(expired))
@@ -1,10 +1,27 @@
 import os
+import time
+import numpy as np
 import pygame
 from pygame import mixer
-
-# Initialize pygame and mixer
-mixer.init()
-pygame.init()
+import sprites
+import render
+import simulation
+import profiler
+import text_cache
+import asset_manager
+import bundle
+import characters
+import timestep
+import effects
+import controls
+import ai
+import arena
+import netplay
+import replay
+import audio
+import telemetry
+import scenes
+from render import BG_PATHS, VICTORY_PATH, RED, YELLOW, WHITE
 
 # Helper function to safely load assets
 def load_asset(path, error_message="File not found: "):
@@ -12,294 +29,811 @@ def load_asset(path, error_message="File not found: "):
         raise FileNotFoundError(error_message + path)
     return path
 
-# Fighter class
-class Fighter:
-    def __init__(self, player, x, y, flip, data, sprite_sheet, animation_steps, sound):
-        self.player = player
-        self.size = data[0]
-        self.scale = data[1]
-        self.offset = data[2]
-        self.flip = flip
-        self.animation_list = self.load_images(sprite_sheet, animation_steps)
-        self.action = 0  # 0: Idle, 1: Run, 2: Jump, etc.
-        self.frame_index = 0
-        self.image = self.animation_list[self.action][self.frame_index]
-        self.update_time = pygame.time.get_ticks()
-        self.rect = pygame.Rect((x, y, self.size, self.size))
-        self.vel_y = 0
-        self.running = False
-        self.jump = False
-        self.attacking = False
-        self.attack_type = 0
-        self.health = 100
-        self.alive = True
-        self.sound = sound
+# Attack sounds and telemetry of a fighter's attacks, hits and actions, shared
+# by the fighters of every scene (mixed into simulation.FighterState subclasses).
+# The attack sound is the character's, loaded into game_audio by load_fight_assets.
+class FighterEvents:
+    __slots__ = ()
+
+    def take_damage(self, damage):
+        super().take_damage(damage)
+        game_telemetry.emit(telemetry.EVENT_HIT, self.player, damage, self.health)
+
+    def on_attack(self):
+        game_audio.play(self.character.sound, "hits", ATTACK_SOUND_PRIORITY)
+        game_telemetry.emit(telemetry.EVENT_ATTACK, self.player, self.attack_type, self.rect.centerx)
+
+    def update_action(self, new_action, now):
+        if new_action != self.action:
+            game_telemetry.emit(telemetry.EVENT_ACTION, self.player, new_action, self.action)
+        super().update_action(new_action, now)
+
+
+# Fighter class (rules live in simulation.FighterState, this adds input, sound and drawing).
+# now is simulation time from a timestep.FixedStepClock, not the wall clock.
+# controller is any input source with read(player) (default: the shared player_input).
+class Fighter(FighterEvents, simulation.FighterState):
+    __slots__ = ("animation", "prev_x", "prev_y", "controller", "input_bits")
+
+    def __init__(self, player, x, y, flip, data, sprite_sheet, animation_steps, now=0, controller=None):
+        super().__init__(player, x, y, flip, data, animation_steps, now)
+        self.animation = self.load_images(sprite_sheet, animation_steps)
+        self.controller = player_input if controller is None else controller
+        self.prev_x = x
+        self.prev_y = y
+        self.input_bits = 0  # what read_input last returned, for the replay
 
     def load_images(self, sprite_sheet, animation_steps):
-        animation_list = []
-        for y, animation in enumerate(animation_steps):
-            temp_img_list = []
-            for x in range(animation):
-                temp_img = sprite_sheet.subsurface(x * self.size, y * self.size, self.size, self.size)
-                temp_img = pygame.transform.scale(temp_img, (self.size * self.scale, self.size * self.scale))
-                temp_img_list.append(temp_img)
-            animation_list.append(temp_img_list)
-        return animation_list
+        # Frames are borrowed from the shared cache, so building a Fighter is cheap
+        return sprites.get_animation(sprite_sheet, self.size, self.scale, self.animation_steps)
+
+    # Function for reading this player's buttons for the current tick
+    def read_input(self):
+        self.input_bits = self.controller.read(self.player)
+        return simulation.FighterInput.from_bits(self.input_bits)
 
     def move(self, screen_width, screen_height, surface, target, round_over):
-        SPEED = 10
-        GRAVITY = 2
-        dx = 0
-        dy = 0
-        self.running = False
-        self.attack_type = 0
-
-        key = pygame.key.get_pressed()
-        if self.alive and not round_over:
-            # Player 1 Controls
-            if self.player == 1:
-                if key[pygame.K_a]:
-                    dx = -SPEED
-                    self.running = True
-                if key[pygame.K_d]:
-                    dx = SPEED
-                    self.running = True
-                if key[pygame.K_w] and not self.jump:
-                    self.vel_y = -30
-                    self.jump = True
-                if key[pygame.K_r] or key[pygame.K_t]:
-                    self.attack(target)
-                    self.attack_type = 1 if key[pygame.K_r] else 2
-
-            # Player 2 Controls
-            if self.player == 2:
-                if key[pygame.K_LEFT]:
-                    dx = -SPEED
-                    self.running = True
-                if key[pygame.K_RIGHT]:
-                    dx = SPEED
-                    self.running = True
-                if key[pygame.K_UP] and not self.jump:
-                    self.vel_y = -30
-                    self.jump = True
-                if key[pygame.K_KP1] or key[pygame.K_KP2]:
-                    self.attack(target)
-                    self.attack_type = 1 if key[pygame.K_KP1] else 2
-
-        # Apply gravity
-        self.vel_y += GRAVITY
-        dy += self.vel_y
-
-        # Stay within screen bounds
-        if self.rect.left + dx < 0:
-            dx = -self.rect.left
-        if self.rect.right + dx > screen_width:
-            dx = screen_width - self.rect.right
-        if self.rect.bottom + dy > screen_height - 110:
-            self.vel_y = 0
-            self.jump = False
-            dy = screen_height - 110 - self.rect.bottom
-
-        # Update position
-        self.rect.x += dx
-        self.rect.y += dy
-
-        # Flip character
-        self.flip = target.rect.centerx < self.rect.centerx
-
-    def attack(self, target):
-        if not self.attacking:
-            self.attacking = True
-            self.sound.play()
-            attacking_rect = pygame.Rect(self.rect.centerx - (2 * self.rect.width * self.flip), self.rect.y, 2 * self.rect.width, self.rect.height)
-            if attacking_rect.colliderect(target.rect):
-                target.health -= 10
-                target.health = max(target.health, 0)
-
-    def update(self):
-        if self.health <= 0:
-            self.alive = False
-            self.update_action(6)  # Death
-        elif self.attacking:
-            self.update_action(5)  # Attack
-        elif self.jump:
-            self.update_action(2)  # Jump
-        elif self.running:
-            self.update_action(1)  # Run
-        else:
-            self.update_action(0)  # Idle
-
-        # Animation handling
-        animation_cooldown = 50
-        self.image = self.animation_list[self.action][self.frame_index]
-        if pygame.time.get_ticks() - self.update_time > animation_cooldown:
-            self.update_time = pygame.time.get_ticks()
-            self.frame_index += 1
-        if self.frame_index >= len(self.animation_list[self.action]):
-            if not self.alive:
-                self.frame_index = len(self.animation_list[self.action]) - 1
-            else:
-                self.attacking = False
-                self.frame_index = 0
+        super().move(self.read_input(), target, round_over, screen_width, screen_height)
+
+    # Landed hits throw sparks from the middle of the fighter that was hit
+    def take_damage(self, damage):
+        super().take_damage(damage)
+        hit_sparks.burst(self.rect.centerx, self.rect.y + self.rect.height // 2, 24, 0.6, 400, spark_rng,
+                         len(SPARK_COLORS))
+
+    # Called once per simulation step, before move
+    def update(self, now):
+        self.prev_x = self.rect.x
+        self.prev_y = self.rect.y
+        super().update(now)
+
+    def draw(self, surface, alpha=1.0):
+        # Drawn between the previous and current step's position by alpha; the drawn rect is returned
+        x = round(self.prev_x + (self.rect.x - self.prev_x) * alpha)
+        y = round(self.prev_y + (self.rect.y - self.prev_y) * alpha)
+        return render.draw_fighter(surface, self, self.animation, x, y)
 
-    def update_action(self, new_action):
-        if new_action != self.action:
-            self.action = new_action
-            self.frame_index = 0
-            self.update_time = pygame.time.get_ticks()
 
-    def draw(self, surface):
-        img = pygame.transform.flip(self.image, self.flip, False)
-        surface.blit(img, (self.rect.x - self.offset[0], self.rect.y - self.offset[1]))
+# Free-for-all fighter: the arena's rules with the live attack sounds and telemetry
+class FreeForAllFighter(FighterEvents, arena.ArenaFighter):
+    __slots__ = ()
 
 
-# Create game window
+# Game window size
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Brawler")
 
-# Set framerate
+# Rendering runs at FPS (BRAWLER_FPS), the game itself always steps at simulation.TICK_RATE
+FPS = int(os.environ.get("BRAWLER_FPS", 60))
+ATTACK_SOUND_PRIORITY = 1
+
+# Define colors (RED, YELLOW and WHITE come from render)
+SPARK_COLORS = [YELLOW, (255, 160, 0), WHITE]
+BOLT_COLORS = [(90, 30, 160), (170, 90, 255), WHITE]  # projectiles, outside to core
+
+# Define game rules
+INTRO_COUNT = 3  # countdown before every round, in COUNT_MS steps
+COUNT_MS = 1000
+ROUND_OVER_COOLDOWN = 2000
+ROUNDS_TO_WIN = 3
+FREE_FOR_ALL_FIGHTERS = int(os.environ.get("BRAWLER_FIGHTERS", 8))  # fighters in the free-for-all (F in the menu)
+
+# Online play (N in the menu): BRAWLER_NETPLAY=player,local port,remote host:port,
+# e.g. 1,7000,192.168.1.20:7000 on one machine and 2,7000,192.168.1.10:7000 on the other
+NETPLAY = os.environ.get("BRAWLER_NETPLAY")
+NETPLAY_MAX_ROLLBACK = 8
+
+# Every round is recorded to a replay in BRAWLER_REPLAYS (off to not record)
+REPLAY_DIR = os.environ.get("BRAWLER_REPLAYS", "replays")
+
+# Asset paths
+MUSIC_PATH = "assets/audio/music.mp3"
+FONT_PATH = "assets/fonts/turok.ttf"
+
+# Game state shared by the fighters and the scenes. Anything that needs the
+# window, the audio device or files is set up by init_game(); until then the
+# fighters are silent and unlogged, so importing this module has no side effects.
 clock = pygame.time.Clock()
-FPS = 60
+game_clock = timestep.FixedStepClock()
+game_audio = audio.NullAudio()
+game_telemetry = telemetry.NullTelemetry()
+
+# Frame profiler (F3 toggles the overlay, BRAWLER_PROFILE=trace.csv/.json exports on quit)
+frame_profiler = profiler.FrameProfiler()
+PROFILE_PATH = os.environ.get("BRAWLER_PROFILE")
+
+# Player input from keyboard and gamepads, remappable through bindings.json
+player_input = controls.InputLayer()
+
+# CPU opponent (BRAWLER_CPU=2 or C in the menu); 0 means two human players
+cpu_input = ai.AIController()
+cpu_player = int(os.environ.get("BRAWLER_CPU", 0))
 
-# Define colors
-RED = (255, 0, 0)
-YELLOW = (255, 255, 0)
-WHITE = (255, 255, 255)
+# Hit sparks, pooled so a burst never allocates per spark. Every round
+# seeds them with its replay's round seed.
+hit_sparks = effects.ParticlePool(2048)
+spark_rng = np.random.default_rng()
+spark_images = []
+
+# Replay of the round being played (see open_replay)
+round_replay = replay.NullReplayWriter()
 
 # Define game variables
-intro_count = 3
-last_count_update = pygame.time.get_ticks()
+selected_mode = "normal"  # background picked in the menu
 score = [0, 0]  # player scores. [P1, P2]
-round_over = False
-ROUND_OVER_COOLDOWN = 2000
+round_number = 0
+round_start_tick = 0
+round_over_time = 0
+fighter_1 = None
+fighter_2 = None
+
+# Set up by init_game()
+screen = None
+renderer = None
+asset_bundle = None
+roster = None
+player_characters = None
+game_assets = None
+loading_bg = None
+victory_img = None
+count_font = None
+score_font = None
+profile_font = None
+hud_text = None
+score_digits = None
+count_digits = None
+
+
+# Function for opening the window and starting everything the scenes use
+def init_game():
+    global screen, renderer, game_audio, game_telemetry, spark_images, asset_bundle, roster, player_characters
+    global game_assets, loading_bg, count_font, score_font, profile_font, hud_text, score_digits, count_digits
+
+    # Initialize pygame and mixer (without an audio device the game runs silent)
+    try:
+        mixer.init()
+    except pygame.error:
+        pass
+    pygame.init()
+
+    # Create game window
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Brawler")
+    renderer = render.DirtyRenderer(screen)
+
+    # Sound effects on reserved channel groups (BRAWLER_AUDIO=off for silence)
+    game_audio = audio.create_audio()
+
+    # Match events (BRAWLER_TELEMETRY=events.jsonl or .bin), written by a background thread
+    game_telemetry = telemetry.create_telemetry(game_clock)
+
+    player_input.load()
+    spark_images = render.make_spark_images(SPARK_COLORS, 3)
+
+    # Use the pre-baked asset bundle when there is one (python bundle.py), it
+    # holds the scaled frames and backgrounds whose sources have not changed
+    asset_bundle = bundle.load_bundle()
+
+    # Characters come from the roster (built-ins plus assets/characters/*.json)
+    roster = characters.load_roster()
+    player_characters = {1: roster["warrior"], 2: roster["wizard"]}
+
+    # Start loading in the background so the menu shows immediately. Only the
+    # default background is requested now, the others when they are picked.
+    game_assets = asset_manager.AssetManager()
+    if render.find_scaled_bg("normal", (SCREEN_WIDTH, SCREEN_HEIGHT)) is None:
+        game_assets.request_image(BG_PATHS["normal"])
+    for character in player_characters.values():
+        request_character_assets(character)
+    game_assets.request_image(VICTORY_PATH)
+
+    # Background shown while the selected background is still loading
+    loading_bg = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    loading_bg.fill((0, 0, 0))
+
+    # Define font
+    count_font = pygame.font.Font(FONT_PATH, 80)
+    score_font = pygame.font.Font(FONT_PATH, 30)
+    profile_font = pygame.font.Font(None, 20)
+    hud_text = text_cache.TextCache()
+    score_digits = text_cache.DigitAtlas(score_font, RED)
+    count_digits = text_cache.DigitAtlas(count_font, YELLOW)
+
+# Function for starting to load a character's frames and attack sound
+def request_character_assets(character):
+    if sprites.find_animation(character.sheet, character.size, character.scale, character.animation_steps) is None:
+        game_assets.request_image(character.sheet)
+    if character.sound is not None and game_audio.enabled:
+        game_assets.request(character.sound, lambda: audio.load_variants(character.sound, character.volume))
+
+
+# Function for giving a player the next character of the roster (picked in the menu)
+def next_character(player):
+    names = list(roster)
+    character = roster[names[(names.index(player_characters[player].name) + 1) % len(names)]]
+    player_characters[player] = character
+    request_character_assets(character)
 
-# Define fighter variables
-WARRIOR_SIZE = 162
-WARRIOR_SCALE = 4
-WARRIOR_OFFSET = [72, 120]
-WARRIOR_DATA = [WARRIOR_SIZE, WARRIOR_SCALE, WARRIOR_OFFSET]
-WIZARD_SIZE = 250
-WIZARD_SCALE = 3
-WIZARD_OFFSET = [112, 150]
-WIZARD_DATA = [WIZARD_SIZE, WIZARD_SCALE, WIZARD_OFFSET]
-
-# Load music and sounds
-pygame.mixer.music.load("assets/audio/music.mp3")
-pygame.mixer.music.set_volume(0.5)
-pygame.mixer.music.play(-1, 0.0, 5000)
-sword_fx = pygame.mixer.Sound("assets/audio/sword.wav")
-sword_fx.set_volume(0.5)
-magic_fx = pygame.mixer.Sound("assets/audio/magic.wav")
-magic_fx.set_volume(0.75)
-
-# Load background image
-bg_images = {
-    "normal": pygame.image.load("assets/images/background/background.jpg").convert_alpha(),
-    "forest": pygame.image.load("assets/images/background/forest.jpg").convert_alpha(),
-    "ice": pygame.image.load("assets/images/background/snow.jpg").convert_alpha()
-}
-
-# Load spritesheets
-warrior_sheet = pygame.image.load("assets/images/warrior/Sprites/warrior.png").convert_alpha()
-wizard_sheet = pygame.image.load("assets/images/wizard/Sprites/wizard.png").convert_alpha()
-
-# Load victory image
-victory_img = pygame.image.load("assets/images/icons/victory.png").convert_alpha()
-
-# Define number of steps in each animation
-WARRIOR_ANIMATION_STEPS = [10, 8, 1, 7, 7, 3, 7]
-WIZARD_ANIMATION_STEPS = [8, 8, 1, 8, 8, 3, 7]
-
-# Define font
-count_font = pygame.font.Font("assets/fonts/turok.ttf", 80)
-score_font = pygame.font.Font("assets/fonts/turok.ttf", 30)
 
 # Function for drawing text
 def draw_text(text, font, text_col, x, y):
-    img = font.render(text, True, text_col)
-    screen.blit(img, (x, y))
+    img = hud_text.render(font, text, text_col)
+    return renderer.add(screen.blit(img, (x, y)))
+
+# Function for drawing a label followed by a number from the digit atlas
+def draw_score(label, value, x, y):
+    label_rect = draw_text(label, score_font, RED, x, y)
+    return renderer.add(score_digits.draw(screen, value, label_rect.right, y))
 
-# Function for drawing background
+# Function for drawing background (starts a new frame of the dirty-rect renderer)
 def draw_bg(selected_mode):
-    scaled_bg = pygame.transform.scale(bg_images[selected_mode], (SCREEN_WIDTH, SCREEN_HEIGHT))
-    screen.blit(scaled_bg, (0, 0))
+    scaled_bg = render.find_scaled_bg(selected_mode, (SCREEN_WIDTH, SCREEN_HEIGHT))
+    if scaled_bg is None:
+        path = BG_PATHS[selected_mode]
+        game_assets.request_image(path)
+        if game_assets.ready(path):
+            scaled_bg = render.get_scaled_bg(selected_mode, game_assets.get(path), (SCREEN_WIDTH, SCREEN_HEIGHT))
+    if scaled_bg is not None:
+        renderer.set_background(scaled_bg)
+        renderer.begin()
+    else:
+        renderer.set_background(loading_bg)
+        renderer.begin()
+        draw_loading()
+
+# Function for drawing the loading progress
+def draw_loading():
+    done, total = game_assets.progress()
+    draw_text("Loading", score_font, WHITE, 440, 500)
+    rect = pygame.draw.rect(screen, WHITE, (350, 550, 300, 10), 1)
+    pygame.draw.rect(screen, WHITE, (350, 550, 300 * done // max(total, 1), 10))
+    return renderer.add(rect)
 
 # Function for drawing fighter health bars
 def draw_health_bar(health, x, y):
-    ratio = health / 100
-    pygame.draw.rect(screen, WHITE, (x - 2, y - 2, 154, 24))
-    pygame.draw.rect(screen, RED, (x, y, 150, 20))
-    pygame.draw.rect(screen, YELLOW, (x, y, 150 * ratio, 20))
-
-# Start menu
-def start_menu():
-    global selected_mode
-    selected_mode = "normal"  # Default background mode
-    menu_running = True
-    while menu_running:
+    return renderer.add(render.draw_health_bar(screen, health, x, y, WHITE, RED, YELLOW))
+
+
+# Function for blocking only on what the fight needs
+def load_fight_assets():
+    global victory_img
+    if render.find_scaled_bg(selected_mode, (SCREEN_WIDTH, SCREEN_HEIGHT)) is None:
+        game_assets.request_image(BG_PATHS[selected_mode])
+        render.get_scaled_bg(selected_mode, game_assets.get(BG_PATHS[selected_mode]), (SCREEN_WIDTH, SCREEN_HEIGHT))
+    for character in player_characters.values():
+        if sprites.find_animation(character.sheet, character.size, character.scale, character.animation_steps) is None:
+            sprites.add_sheet(character.sheet, game_assets.get(character.sheet))
+    victory_img = game_assets.get(VICTORY_PATH)
+    for character in player_characters.values():
+        if character.sound is not None and game_audio.enabled:
+            game_audio.add(character.sound, game_assets.get(character.sound))
+
+
+# Function for the local player and a transport to the peer from BRAWLER_NETPLAY
+def open_netplay():
+    player, port, remote = NETPLAY.split(",")
+    host, remote_port = remote.rsplit(":", 1)
+    return int(player), netplay.UdpTransport(("0.0.0.0", int(port)), (host, int(remote_port)))
+
+
+# Function for starting the replay of a round whose fighters appear at the
+# current clock tick (a no-op writer when recording is off). The new round
+# seed also seeds the hit sparks.
+def open_replay(name, character_1, character_2, start_tick):
+    global round_replay, spark_rng
+    close_replay()
+    seed = int.from_bytes(os.urandom(8), "little")
+    spark_rng = np.random.default_rng(seed)
+    if REPLAY_DIR == "off":
+        return
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    path = os.path.join(REPLAY_DIR, time.strftime("%Y%m%d-%H%M%S-") + name + ".brpl")
+    round_replay = replay.ReplayWriter(path, seed, character_1, character_2, start_tick)
+
+
+def close_replay():
+    global round_replay
+    round_replay.close()
+    round_replay = replay.NullReplayWriter()
+
+
+# Function for drawing headless fighters (simulation.FighterState) between
+# their last two steps; returns where each one was drawn
+def draw_fighter_states(fighters, animations, previous):
+    alpha = game_clock.alpha
+    positions = []
+    for fighter, animation, (prev_x, prev_y) in zip(fighters, animations, previous):
+        x = round(prev_x + (fighter.rect.x - prev_x) * alpha)
+        y = round(prev_y + (fighter.rect.y - prev_y) * alpha)
+        renderer.add(render.draw_fighter(screen, fighter, animation, x, y))
+        positions.append((x, y))
+    return positions
+
+
+# Function for throwing sparks from the fighters that lost health since health was taken
+def spark_hits(fighters, health):
+    for fighter, before in zip(fighters, health):
+        if fighter.health < before:
+            hit_sparks.burst(fighter.rect.centerx, fighter.rect.y + fighter.rect.height // 2, 24, 0.6, 400, spark_rng,
+                             len(SPARK_COLORS))
+
+
+# Function for creating a player's fighter from its character
+def create_fighter(player, x, y, flip):
+    character = player_characters[player]
+    controller = cpu_input if player == cpu_player else player_input
+    return Fighter(player, x, y, flip, character, character.sheet, character.animation_steps, game_clock.now,
+                   controller)
+
+
+# Function for starting a match (first to ROUNDS_TO_WIN rounds wins)
+def start_match():
+    global round_number
+    load_fight_assets()
+    score[0] = score[1] = 0
+    round_number = 0
+    # The menu and results don't track releases, so nothing held there carries into the fight
+    player_input.reset()
+
+
+# Function for starting a round with two new fighters
+def start_round():
+    global fighter_1, fighter_2, round_number, round_start_tick
+    fighter_1 = create_fighter(1, 200, 310, False)
+    fighter_2 = create_fighter(2, 700, 310, True)
+    cpu_input.track(fighter_1, fighter_2)
+    round_number += 1
+    round_start_tick = game_clock.tick
+    open_replay(f"round{round_number}", fighter_1.character, fighter_2.character, round_start_tick)
+    game_telemetry.emit(telemetry.EVENT_ROUND_START, 0, round_number, cpu_player)
+
+
+# Function for ending the round; the survivor scores (nobody on a double KO)
+def end_round():
+    global round_over_time
+    round_over_time = game_clock.now
+    winner = 1 if fighter_1.alive else 2 if fighter_2.alive else 0
+    if winner:
+        score[winner - 1] += 1
+    game_telemetry.emit(telemetry.EVENT_ROUND_END, 0, winner, game_clock.tick - round_start_tick)
+    close_replay()
+
+
+# Start menu: pick a background and the CPU opponent
+class MenuScene(scenes.Scene):
+    name = "menu"
+    update_budget_ms = 1.0
+    render_budget_ms = 4.0
+
+    def __init__(self):
+        super().__init__()
+        self.music_pending = True
+
+    def handle_event(self, event):
+        global selected_mode, cpu_player
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.invalidate()
+        if event.type in (pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED):
+            player_input.handle_event(event)
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_1:
+                selected_mode = "normal"
+            elif event.key == pygame.K_2:
+                selected_mode = "forest"
+            elif event.key == pygame.K_3:
+                selected_mode = "ice"
+            elif event.key == pygame.K_c:
+                cpu_player = 0 if cpu_player else 2
+            elif event.key == pygame.K_q:
+                next_character(1)
+            elif event.key == pygame.K_p:
+                next_character(2)
+            elif event.key == pygame.K_RETURN:
+                self.machine.switch("countdown")
+            elif event.key == pygame.K_f:
+                self.machine.switch("free_for_all")
+            elif event.key == pygame.K_n and NETPLAY:
+                self.machine.switch("netplay")
+            elif event.key == pygame.K_ESCAPE:
+                self.machine.stop()
+
+    def render(self):
         draw_bg(selected_mode)
         draw_text("BRAWLER", count_font, RED, 330, 100)
+        draw_text(f"Press Q / P to pick: {player_characters[1].name} vs {player_characters[2].name}", score_font,
+                  WHITE, 200, 200)
         draw_text("Press 1 for Normal, 2 for Forest, 3 for Ice", score_font, WHITE, 180, 250)
-        draw_text("Press ENTER to Start", score_font, WHITE, 320, 350)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                quit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    selected_mode = "normal"
-                elif event.key == pygame.K_2:
-                    selected_mode = "forest"
-                elif event.key == pygame.K_3:
-                    selected_mode = "ice"
-                elif event.key == pygame.K_RETURN:
-                    menu_running = False
-        pygame.display.update()
-
-# Create two fighters
-fighter_1 = Fighter(1, 200, 310, False, WARRIOR_DATA, warrior_sheet, WARRIOR_ANIMATION_STEPS, sword_fx)
-fighter_2 = Fighter(2, 700, 310, True, WIZARD_DATA, wizard_sheet, WIZARD_ANIMATION_STEPS, magic_fx)
-
-# Game loop
-start_menu()
-run = True
-while run:
-    clock.tick(FPS)
-    draw_bg(selected_mode)
-    draw_health_bar(fighter_1.health, 20, 20)
-    draw_health_bar(fighter_2.health, 580, 20)
-    draw_text(f"Player 1: {score[0]}", score_font, RED, 20, 60)
-    draw_text(f"Player 2: {score[1]}", score_font, RED, 580, 60)
-
-    # Update and draw fighters
-    fighter_1.update()
-    fighter_2.update()
-    fighter_1.draw(screen)
-    fighter_2.draw(screen)
-
-    # Handle fighter movement
-    if not round_over:
-        fighter_1.move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, fighter_2, round_over)
-        fighter_2.move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, fighter_1, round_over)
-
-    # Check for end of round
-    if not fighter_1.alive or not fighter_2.alive:
-        round_over = True
-        screen.blit(victory_img, (360, 150))
-        if pygame.time.get_ticks() - last_count_update > ROUND_OVER_COOLDOWN:
-            round_over = False
-            fighter_1 = Fighter(1, 200, 310, False, WARRIOR_DATA, warrior_sheet, WARRIOR_ANIMATION_STEPS, sword_fx)
-            fighter_2 = Fighter(2, 700, 310, True, WIZARD_DATA, wizard_sheet, WIZARD_ANIMATION_STEPS, magic_fx)
-            intro_count = 3
-            last_count_update = pygame.time.get_ticks()
-
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            run = False
-
-    pygame.display.update()
-
-pygame.quit()
+        draw_text("Press C for a CPU opponent: " + ("on" if cpu_player else "off"), score_font, WHITE, 250, 300)
+        draw_text("Press ENTER to Start, ESCAPE to Quit", score_font, WHITE, 230, 350)
+        draw_text(f"Press F for a free-for-all of {FREE_FOR_ALL_FIGHTERS}", score_font, WHITE, 250, 400)
+        if NETPLAY:
+            draw_text("Press N to play online", score_font, WHITE, 330, 450)
+        renderer.end()
+
+        # Music is optional and only starts once the menu is on screen
+        if self.music_pending:
+            game_audio.play_music(MUSIC_PATH)
+            self.music_pending = False
+
+
+# Base of the scenes with fighters on screen. The game clock advances in
+# fixed steps until the update deadline; step() is one tick of the scene.
+class ArenaScene(scenes.Scene):
+    update_budget_ms = 8.0
+    render_budget_ms = 8.0
+
+    def handle_event(self, event):
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.invalidate()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            frame_profiler.show_overlay = not frame_profiler.show_overlay
+        player_input.handle_event(event)
+
+    def step(self):
+        pass
+
+    # Function for a step where nobody has control: gravity and the floor still apply
+    def settle(self):
+        fighter_1.update(game_clock.now)
+        fighter_2.update(game_clock.now)
+        frame_profiler.lap("Fighter.update")
+        simulation.FighterState.move(fighter_1, simulation.NO_INPUT, fighter_2, True, SCREEN_WIDTH, SCREEN_HEIGHT)
+        simulation.FighterState.move(fighter_2, simulation.NO_INPUT, fighter_1, True, SCREEN_WIDTH, SCREEN_HEIGHT)
+        frame_profiler.lap("Fighter.move")
+
+    def update(self, elapsed, deadline):
+        cpu_input.new_frame()
+        for _ in range(game_clock.advance(elapsed)):
+            self.step()
+            hit_sparks.update(simulation.TICK_MS)
+            player_input.end_tick()
+            cpu_input.end_tick()
+            game_clock.step()
+            # Steps left over stay in the clock for the next frame (or the next scene)
+            if self.machine.pending is not None or time.perf_counter() > deadline:
+                break
+
+    # Function for the health bars and scores
+    def draw_hud(self):
+        draw_health_bar(fighter_1.health, 20, 20)
+        draw_health_bar(fighter_2.health, 580, 20)
+        frame_profiler.lap("draw_health_bar")
+        draw_score("Player 1: ", score[0], 20, 60)
+        draw_score("Player 2: ", score[1], 580, 60)
+        frame_profiler.lap("draw_text")
+
+    # Function for drawing the fighters between the last two steps
+    def draw_fighters(self):
+        renderer.add(fighter_1.draw(screen, game_clock.alpha))
+        renderer.add(fighter_2.draw(screen, game_clock.alpha))
+
+    # Function for what the scene draws over the fight
+    def draw_overlay(self):
+        pass
+
+    def render(self):
+        draw_bg(selected_mode)
+        frame_profiler.lap("draw_bg")
+        self.draw_hud()
+        self.draw_fighters()
+        frame_profiler.lap("Fighter.draw")
+
+        # Sparks are decoration, left out for a frame after rendering ran over budget
+        if not self.render_over_budget:
+            sparks_rect = render.draw_pool(screen, hit_sparks, spark_images)
+            if sparks_rect is not None:
+                renderer.add(sparks_rect)
+        frame_profiler.lap("effects")
+        self.draw_overlay()
+
+        if frame_profiler.show_overlay:
+            for rect in frame_profiler.draw_overlay(screen, profile_font, WHITE, 20, 100):
+                renderer.add(rect)
+            frame_profiler.lap("overlay")
+
+        renderer.end()
+        frame_profiler.lap("display.update")
+
+
+# Countdown before every round; the new fighters land and stand still until it ends
+class CountdownScene(ArenaScene):
+    name = "countdown"
+
+    def __init__(self):
+        super().__init__()
+        self.count_start = 0
+
+    def enter(self, previous):
+        if previous is not None and previous.name == "menu":
+            start_match()
+            game_clock.reset()  # the menu and loading time is not game time
+        start_round()
+        self.count_start = game_clock.now
+
+    def step(self):
+        self.settle()
+        round_replay.write_bits(0, 0)  # nobody has control, so replaying no input steps the same
+        if game_clock.now - self.count_start >= INTRO_COUNT * COUNT_MS:
+            self.machine.switch("fight")
+
+    def draw_overlay(self):
+        count = max(INTRO_COUNT - int(game_clock.now - self.count_start) // COUNT_MS, 1)
+        renderer.add(count_digits.draw(screen, count, SCREEN_WIDTH / 2 - 50, SCREEN_HEIGHT / 3))
+
+
+# The fight, in the same order as simulation.Match.step
+class FightScene(ArenaScene):
+    name = "fight"
+
+    def step(self):
+        fighter_1.update(game_clock.now)
+        fighter_2.update(game_clock.now)
+        frame_profiler.lap("Fighter.update")
+
+        # Handle fighter movement
+        fighter_1.move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, fighter_2, False)
+        fighter_2.move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, fighter_1, False)
+        frame_profiler.lap("Fighter.move")
+        round_replay.write_bits(fighter_1.input_bits, fighter_2.input_bits)
+
+        # Check for end of round
+        if not fighter_1.alive or not fighter_2.alive:
+            end_round()
+            self.machine.switch("round_over")
+        frame_profiler.lap("round_over")
+
+
+# Victory image while the death animation plays out, then the next round or the results
+class RoundOverScene(ArenaScene):
+    name = "round_over"
+
+    def step(self):
+        self.settle()
+        if game_clock.now - round_over_time > ROUND_OVER_COOLDOWN:
+            self.machine.switch("results" if max(score) >= ROUNDS_TO_WIN else "countdown")
+
+    def draw_overlay(self):
+        renderer.add(screen.blit(victory_img, (360, 150)))
+
+
+# Free-for-all on an arena.Arena with FREE_FOR_ALL_FIGHTERS fighters. The
+# players keep their fighters (1 and 2, unless player 2 is the CPU), the
+# CPU plays everyone else against their nearest opponent. Characters with
+# a projectile fire it with the second attack. One round, then back to the
+# menu.
+class FreeForAllScene(ArenaScene):
+    name = "free_for_all"
+
+    def __init__(self):
+        super().__init__()
+        self.arena = None
+        self.animations = []
+        self.human = []
+        self.previous = []  # every fighter's position before the last step, for drawing between steps
+        self.over_time = None
+
+    def enter(self, previous):
+        load_fight_assets()
+        game_clock.reset()
+        self.arena = arena.create_free_for_all(FREE_FOR_ALL_FIGHTERS, player_characters, SCREEN_WIDTH,
+                                               FreeForAllFighter)
+        fighters = self.arena.fighters
+        self.animations = [sprites.character_animation(fighter.character) for fighter in fighters]
+        self.human = [fighter.player in (1, 2) and fighter.player != cpu_player for fighter in fighters]
+        self.previous = [(fighter.rect.x, fighter.rect.y) for fighter in fighters]
+        self.over_time = None
+        cpu_input.track(*fighters)
+        player_input.reset()
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.machine.switch("menu")
+
+    def step(self):
+        fighters = self.arena.fighters
+        self.previous = [(fighter.rect.x, fighter.rect.y) for fighter in fighters]
+        health = [fighter.health for fighter in fighters]
+        inputs = []
+        for fighter, target, human in zip(fighters, self.arena.find_targets(), self.human):
+            if human:
+                inputs.append(simulation.FighterInput.from_bits(player_input.read(fighter.player)))
+            elif fighter.alive and target is not None:
+                bits = cpu_input.decide(fighter, target) | self.shoot(fighter, target)
+                inputs.append(simulation.FighterInput.from_bits(bits))
+            else:
+                inputs.append(simulation.NO_INPUT)
+        frame_profiler.lap("input")
+        self.arena.step(inputs)
+        frame_profiler.lap("Fighter.move")
+        spark_hits(fighters, health)
+        if self.arena.round_over:
+            if self.over_time is None:
+                self.over_time = game_clock.now
+            elif game_clock.now - self.over_time > ROUND_OVER_COOLDOWN:
+                self.machine.switch("menu")
+
+    # Function for the CPU firing its character's projectile (the second
+    # attack in the arena) at a target out of melee range but within the
+    # bolt's flight, at the height the bolt flies
+    def shoot(self, fighter, target):
+        projectile = fighter.character.projectile
+        if projectile is None or fighter.attacking:
+            return 0
+        distance = abs(target.rect.centerx - fighter.rect.centerx)
+        if distance <= cpu_input.policy.preferred_distance(fighter.character, target.character):
+            return 0
+        if distance > projectile.speed * projectile.lifetime_ms / simulation.TICK_MS:
+            return 0
+        bolt_y = fighter.rect.y + (fighter.rect.height - projectile.height) // 2
+        if bolt_y + projectile.height <= target.rect.y or target.rect.bottom <= bolt_y:
+            return 0
+        return simulation.INPUT_ATTACK_2
+
+    def draw_hud(self):
+        draw_score("Fighters left: ", sum(fighter.alive for fighter in self.arena.fighters), 20, 20)
+        frame_profiler.lap("draw_text")
+
+    # Every fighter between its last two steps, with a small health bar over the living ones
+    def draw_fighters(self):
+        fighters = self.arena.fighters
+        for fighter, (x, y) in zip(fighters, draw_fighter_states(fighters, self.animations, self.previous)):
+            if fighter.alive:
+                renderer.add(render.draw_health_bar(screen, fighter.health, x + fighter.rect.width // 2 - 30, y - 16,
+                                                    WHITE, RED, YELLOW, 60, 6))
+        bolts_rect = render.draw_projectiles(screen, self.arena.projectiles, BOLT_COLORS)
+        if bolts_rect is not None:
+            renderer.add(bolts_rect)
+
+    def draw_overlay(self):
+        if self.arena.round_over:
+            renderer.add(screen.blit(victory_img, (360, 150)))
+
+
+# Fighter of the online scene's confirmed match, which only ever steps
+# final inputs; its sounds and telemetry are never rolled back
+class ConfirmedFighter(FighterEvents, simulation.FighterState):
+    __slots__ = ()
+
+
+# Rollback session of the online scene. Frames whose inputs are final are
+# recorded and stepped once more on a copy of the match with ConfirmedFighters,
+# so a rollback never rewrites the replay nor repeats a sound or an event.
+class OnlineSession(netplay.RollbackSession):
+    def __init__(self, local_player, match, max_rollback):
+        super().__init__(local_player, match, max_rollback)
+        self.confirmed_match = simulation.Match(match.fighter_1.character, None, match.fighter_2.character, None,
+                                                match.tick, ConfirmedFighter)
+
+    def on_confirmed(self, frame, bits_1, bits_2):
+        round_replay.write_bits(bits_1, bits_2)
+        self.confirmed_match.step(simulation.FighterInput.from_bits(bits_1), simulation.FighterInput.from_bits(bits_2))
+
+
+# One round against a player on another machine. Both peers run the match
+# through a netplay.RollbackSession: local input is applied at once, the
+# remote input is predicted and the session rolls back when it arrives
+# different. The local player uses player 1's controls whichever side they
+# play. Back to the menu after the round (or ESCAPE).
+class NetplayScene(ArenaScene):
+    name = "netplay"
+
+    def __init__(self):
+        super().__init__()
+        self.session = None
+        self.transport = None
+        self.animations = []
+        self.previous = []
+        self.over_time = None
+        self.stalls = 0
+
+    @property
+    def fighters(self):
+        return (self.session.match.fighter_1, self.session.match.fighter_2)
+
+    def enter(self, previous):
+        load_fight_assets()
+        game_clock.reset()
+        player, self.transport = open_netplay()
+        match = simulation.Match(player_characters[1], None, player_characters[2], None)
+        self.session = OnlineSession(player, match, NETPLAY_MAX_ROLLBACK)
+        open_replay("online", match.fighter_1.character, match.fighter_2.character, match.tick)
+        self.animations = [sprites.character_animation(fighter.character) for fighter in self.fighters]
+        self.previous = [(fighter.rect.x, fighter.rect.y) for fighter in self.fighters]
+        self.over_time = None
+        self.stalls = 0
+        player_input.reset()
+
+    def exit(self):
+        self.transport.close()
+        close_replay()
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.machine.switch("menu")
+
+    def step(self):
+        session = self.session
+        fighters = self.fighters
+        self.previous = [(fighter.rect.x, fighter.rect.y) for fighter in fighters]
+        health = [fighter.health for fighter in fighters]
+        session.poll(self.transport)
+        if session.can_advance():
+            session.advance(player_input.read(1))
+        else:
+            self.stalls += 1  # the peer is too far behind, wait for its inputs
+        session.send(self.transport)
+        frame_profiler.lap("Fighter.move")
+        spark_hits(fighters, health)
+        if session.match.round_over:
+            if self.over_time is None:
+                self.over_time = game_clock.now
+            elif game_clock.now - self.over_time > ROUND_OVER_COOLDOWN:
+                self.machine.switch("menu")
+
+    def draw_hud(self):
+        fighter_1, fighter_2 = self.fighters
+        draw_health_bar(fighter_1.health, 20, 20)
+        draw_health_bar(fighter_2.health, 580, 20)
+        frame_profiler.lap("draw_health_bar")
+        draw_text("You" if self.session.local_player == 1 else "Online", score_font, RED, 20, 60)
+        draw_text("You" if self.session.local_player == 2 else "Online", score_font, RED, 580, 60)
+        frame_profiler.lap("draw_text")
+
+    def draw_fighters(self):
+        draw_fighter_states(self.fighters, self.animations, self.previous)
+
+    def draw_overlay(self):
+        if self.session.match.round_over:
+            renderer.add(screen.blit(victory_img, (360, 150)))
+
+
+# Final score of the match
+class ResultsScene(scenes.Scene):
+    name = "results"
+    update_budget_ms = 1.0
+    render_budget_ms = 4.0
+
+    def handle_event(self, event):
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.invalidate()
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RETURN:
+                self.machine.switch("menu")
+            elif event.key == pygame.K_ESCAPE:
+                self.machine.stop()
+
+    def render(self):
+        draw_bg(selected_mode)
+        winner = 1 if score[0] > score[1] else 2
+        draw_text(f"Player {winner} Wins", count_font, RED, 280, 100)
+        draw_score("Player 1: ", score[0], 400, 250)
+        draw_score("Player 2: ", score[1], 400, 300)
+        draw_text("Press ENTER for the Menu, ESCAPE to Quit", score_font, WHITE, 200, 400)
+        renderer.end()
+
+
+# Function for the scene machine with every scene of the game
+def create_scenes():
+    machine = scenes.SceneMachine(clock, FPS, game_telemetry, frame_profiler)
+    for scene in (MenuScene(), CountdownScene(), FightScene(), RoundOverScene(), FreeForAllScene(), NetplayScene(),
+                  ResultsScene()):
+        machine.add(scene)
+    return machine
+
+
+def main():
+    init_game()
+    create_scenes().run("menu")
+    close_replay()
+
+    if PROFILE_PATH:
+        frame_profiler.export(PROFILE_PATH)
+    game_assets.shutdown()
+    game_telemetry.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# Hit shapes for the rules.
+# Attacks land where the fighters are drawn: a fighter's hurtbox is the shape
+# of the frame it shows, and an attack's hitbox is the swing of the sheet row
+# it plays (every frame of the row laid on top of each other). The shapes are
+# baked from the sprite sheets into one small JSON file per character, so the
+# headless rules, the batch simulator and the live game all test the same
+# data without loading images or importing pygame.
+#
+# A shape is the frame's pixel mask at sheet resolution (alpha above
+# MASK_THRESHOLD, like pygame.mask.from_surface), stored as runs: for every
+# row the [start, end) spans of opaque pixels, left to right. Frames are
+# scaled up by whole factors when drawn, so a sheet row covers `scale` screen
+# rows and its runs scale with it.
+#
+# A baked file records the digest of the sheet it was baked from; a file whose
+# sheet changed since is refused, not loaded stale.
+#
+#   python hitmask.py              # bake every character that declares a hitmask
+import argparse
+import hashlib
+import json
+import os
+
+import characters
+
+MASK_THRESHOLD = 127
+VERSION = 2
+
+
+# Rows top .. top + len(runs) - 1 of a frame. Every row is a flat tuple of
+# runs (start, end, start, end, ...) in sheet pixels from the frame's left
+# edge, sorted and not touching; an empty tuple is an empty row.
+class Shape:
+    __slots__ = ("top", "runs", "left", "right")
+
+    def __init__(self, top, runs):
+        self.top = top
+        self.runs = runs
+        self.left = min((row[0] for row in runs if row), default=0)
+        self.right = max((row[-1] for row in runs if row), default=0)
+
+    @property
+    def bottom(self):
+        return self.top + len(self.runs)
+
+    # The shape of the frame drawn mirrored, for a frame size pixels wide
+    def mirrored(self, size):
+        return Shape(self.top, [tuple(size - x for x in reversed(row)) for row in self.runs])
+
+
+# Function for the union of runs (start, end) as one sorted flat row
+def merge_runs(runs):
+    merged = []
+    for start, end in sorted(runs):
+        if merged and start <= merged[-1]:
+            merged[-1] = max(merged[-1], end)
+        else:
+            merged += [start, end]
+    return tuple(merged)
+
+
+# Function for the swing of an attack: every shape of a row on top of each other
+def sweep(shapes):
+    shapes = [shape for shape in shapes if shape.runs]
+    if not shapes:
+        return Shape(0, [])
+    top = min(shape.top for shape in shapes)
+    bottom = max(shape.bottom for shape in shapes)
+    rows = [[] for _ in range(bottom - top)]
+    for shape in shapes:
+        for i, row in enumerate(shape.runs):
+            rows[shape.top - top + i] += zip(row[::2], row[1::2])
+    return Shape(top, [merge_runs(runs) for runs in rows])
+
+
+# Function for whether two rows of runs overlap, a drawn scaled by a_scale
+# from x position ax and b the same way from bx
+def runs_overlap(a, ax, a_scale, b, bx, b_scale):
+    i = j = 0
+    while i < len(a) and j < len(b):
+        a_start = ax + a[i] * a_scale
+        a_end = ax + a[i + 1] * a_scale
+        b_start = bx + b[j] * b_scale
+        b_end = bx + b[j + 1] * b_scale
+        if a_start < b_end and b_start < a_end:
+            return True
+        # Move on whichever run ends first
+        if a_end <= b_end:
+            i += 2
+        else:
+            j += 2
+    return False
+
+
+# Function for whether shape a, drawn scaled by a_scale with its frame's top
+# left at (ax, ay), overlaps shape b drawn the same way at (bx, by). The
+# bounding boxes are compared first, then the rows both shapes cover.
+def shapes_overlap(a, ax, ay, a_scale, b, bx, by, b_scale):
+    a_top = ay + a.top * a_scale
+    b_top = by + b.top * b_scale
+    if (ax + a.right * a_scale <= bx + b.left * b_scale or bx + b.right * b_scale <= ax + a.left * a_scale
+            or a_top + len(a.runs) * a_scale <= b_top or b_top + len(b.runs) * b_scale <= a_top):
+        return False
+    # Walk both shapes' rows down from where they start to overlap
+    top = max(a_top, b_top)
+    i = (top - a_top) // a_scale
+    j = (top - b_top) // b_scale
+    a_runs, b_runs = a.runs, b.runs
+    while i < len(a_runs) and j < len(b_runs):
+        if a_runs[i] and b_runs[j] and runs_overlap(a_runs[i], ax, a_scale, b_runs[j], bx, b_scale):
+            return True
+        # Move on whichever row ends first (both when they end together)
+        a_bottom = a_top + (i + 1) * a_scale
+        b_bottom = b_top + (j + 1) * b_scale
+        if a_bottom <= b_bottom:
+            i += 1
+        if b_bottom <= a_bottom:
+            j += 1
+    return False
+
+
+# Every frame's shape of a character and the swing of every row, both facings
+class Hitmask:
+    # sheet and digest are what it was baked from (see sheet_digest)
+    def __init__(self, size, shapes, sheet=None, digest=None):
+        mirrored = [[shape.mirrored(size) for shape in row] for row in shapes]
+        self.size = size
+        self.animation_steps = tuple(len(row) for row in shapes)
+        self.sheet = sheet
+        self.digest = digest
+        self.shapes = (shapes, mirrored)
+        self.sweeps = ([sweep(row) for row in shapes], [sweep(row) for row in mirrored])
+
+    def shape(self, action, frame_index, flip):
+        return self.shapes[flip][action][frame_index]
+
+    def sweep(self, action, flip):
+        return self.sweeps[flip][action]
+
+
+_hitmasks = {}
+_boxes = {}
+
+
+# Function for the shape of a solid box (a projectile), shared by every box of that size
+def box_shape(width, height):
+    shape = _boxes.get((width, height))
+    if shape is None:
+        shape = _boxes[width, height] = Shape(0, [(0, width)] * height)
+    return shape
+
+
+# Function for the digest of a sprite sheet's contents, which a baked file
+# keeps to tell whether it is stale (file times don't survive a checkout)
+def sheet_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Function for reading a baked hitmask file
+def load_hitmask(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != VERSION:
+        raise ValueError(f"Unsupported hitmask version in {path}: {data.get('version')}, bake it again")
+    shapes = [[Shape(top, [tuple(row) for row in runs]) for top, runs in animation] for animation in data["animations"]]
+    return Hitmask(data["frame_size"], shapes, data["sheet"], data["digest"])
+
+
+# Function for the shared hitmask of a characters.CharacterData, None for characters without one
+def character_hitmask(character):
+    path = character.hitmask
+    if path is None:
+        return None
+    hitmask = _hitmasks.get(path)
+    if hitmask is None:
+        if not os.path.isfile(path):
+            raise ValueError(f"Hitmask {path} of character {character.name!r} does not exist, bake it with hitmask.py")
+        hitmask = load_hitmask(path)
+        if hitmask.digest != sheet_digest(hitmask.sheet):
+            raise ValueError(f"Hitmask {path} is stale, {hitmask.sheet} changed since it was baked; bake it again")
+        _hitmasks[path] = hitmask
+    # Checked on every call: characters sharing a file share one cached hitmask
+    if (hitmask.size != character.size or hitmask.animation_steps != character.animation_steps
+            or hitmask.sheet != character.sheet):
+        raise ValueError(f"Hitmask {path} does not match character {character.name!r}, bake it again")
+    return hitmask
+
+
+# Function for baking a character's shapes from its sprite sheet (needs pygame)
+def bake(character, path):
+    import numpy as np  # only baking reads images; the rules never import pygame or NumPy
+    import pygame
+
+    sheet = pygame.image.load(character.sheet)
+    size = character.size
+    animations = []
+    for y, count in enumerate(character.animation_steps):
+        animation = []
+        for x in range(count):
+            opaque = pygame.surfarray.array_alpha(sheet.subsurface(x * size, y * size, size, size)).T > MASK_THRESHOLD
+            # Runs start where a row turns opaque and end where it turns clear
+            edges = np.diff(np.pad(opaque.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+            runs = [np.flatnonzero(row).tolist() for row in edges]
+            filled = [i for i, row in enumerate(runs) if row]
+            top = filled[0] if filled else 0
+            bottom = filled[-1] + 1 if filled else 0
+            animation.append([top, runs[top:bottom]])
+        animations.append(animation)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"version": VERSION, "sheet": character.sheet, "digest": sheet_digest(character.sheet),
+                   "frame_size": size, "animations": animations}, f, separators=(",", ":"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake hit shapes from the characters' sprite sheets.")
+    parser.add_argument("names", nargs="*", help="characters to bake (default: all with a hitmask path)")
+    args = parser.parse_args()
+    roster = characters.load_roster(check_hitmasks=False)
+    for name in args.names or [name for name, character in roster.items() if character.hitmask]:
+        character = roster[name]
+        if character.hitmask is None:
+            raise SystemExit(f"Character {name!r} has no hitmask path in its definition")
+        bake(character, character.hitmask)
+        print(f"Wrote {character.hitmask}")
+
+
+if __name__ == "__main__":
+    main()
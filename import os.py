@@ -1,155 +1,6 @@
-import os
-import pygame
-from pygame import mixer
+# Older entry point, kept so existing shortcuts keep working. The menu,
+# countdown, fight and results are the scenes in fighter.py.
+from fighter import main
 
-# Initialize pygame and mixer
-mixer.init()
-pygame.init()
-
-# Helper function to safely load assets
-def load_asset(path, error_message="File not found: "):
-    if not os.path.exists(path):
-        raise FileNotFoundError(error_message + path)
-    return path
-
-# Fighter class
-class Fighter:
-    def __init__(self, player, x, y, flip, data, sprite_sheet, animation_steps, sound):
-        self.player = player
-        self.size = data[0]
-        self.scale = data[1]
-        self.offset = data[2]
-        self.flip = flip
-        self.animation_list = self.load_images(sprite_sheet, animation_steps)
-        self.action = 0  # 0: Idle, 1: Run, 2: Jump, etc.
-        self.frame_index = 0
-        self.image = self.animation_list[self.action][self.frame_index]
-        self.update_time = pygame.time.get_ticks()
-        self.rect = pygame.Rect((x, y, self.size, self.size))
-        self.vel_y = 0
-        self.running = False
-        self.jump = False
-        self.attacking = False
-        self.attack_type = 0
-        self.health = 100
-        self.alive = True
-        self.sound = sound
-
-    def load_images(self, sprite_sheet, animation_steps):
-        animation_list = []
-        for y, animation in enumerate(animation_steps):
-            temp_img_list = []
-            for x in range(animation):
-                temp_img = sprite_sheet.subsurface(x * self.size, y * self.size, self.size, self.size)
-                temp_img = pygame.transform.scale(temp_img, (self.size * self.scale, self.size * self.scale))
-                temp_img_list.append(temp_img)
-            animation_list.append(temp_img_list)
-        return animation_list
-
-    def move(self, screen_width, screen_height, surface, target, round_over):
-        SPEED = 10
-        GRAVITY = 2
-        dx = 0
-        dy = 0
-        self.running = False
-        self.attack_type = 0
-
-        key = pygame.key.get_pressed()
-        if self.alive and not round_over:
-            # Player 1 Controls
-            if self.player == 1:
-                if key[pygame.K_a]:
-                    dx = -SPEED
-                    self.running = True
-                if key[pygame.K_d]:
-                    dx = SPEED
-                    self.running = True
-                if key[pygame.K_w] and not self.jump:
-                    self.vel_y = -30
-                    self.jump = True
-                if key[pygame.K_r] or key[pygame.K_t]:
-                    self.attack(target)
-                    self.attack_type = 1 if key[pygame.K_r] else 2
-
-            # Player 2 Controls
-            if self.player == 2:
-                if key[pygame.K_LEFT]:
-                    dx = -SPEED
-                    self.running = True
-                if key[pygame.K_RIGHT]:
-                    dx = SPEED
-                    self.running = True
-                if key[pygame.K_UP] and not self.jump:
-                    self.vel_y = -30
-                    self.jump = True
-                if key[pygame.K_KP1] or key[pygame.K_KP2]:
-                    self.attack(target)
-                    self.attack_type = 1 if key[pygame.K_KP1] else 2
-
-        # Apply gravity
-        self.vel_y += GRAVITY
-        dy += self.vel_y
-
-        # Stay within screen bounds
-        if self.rect.left + dx < 0:
-            dx = -self.rect.left
-        if self.rect.right + dx > screen_width:
-            dx = screen_width - self.rect.right
-        if self.rect.bottom + dy > screen_height - 110:
-            self.vel_y = 0
-            self.jump = False
-            dy = screen_height - 110 - self.rect.bottom
-
-        # Update position
-        self.rect.x += dx
-        self.rect.y += dy
-
-        # Flip character
-        self.flip = target.rect.centerx < self.rect.centerx
-
-    def attack(self, target):
-        if not self.attacking:
-            self.attacking = True
-            self.sound.play()
-            attacking_rect = pygame.Rect(self.rect.centerx - (2 * self.rect.width * self.flip), self.rect.y, 2 * self.rect.width, self.rect.height)
-            if attacking_rect.colliderect(target.rect):
-                target.health -= 10
-                target.health = max(target.health, 0)
-
-    def update(self):
-        if self.health <= 0:
-            self.alive = False
-            self.update_action(6)  # Death
-        elif self.attacking:
-            self.update_action(5)  # Attack
-        elif self.jump:
-            self.update_action(2)  # Jump
-        elif self.running:
-            self.update_action(1)  # Run
-        else:
-            self.update_action(0)  # Idle
-
-        # Animation handling
-        animation_cooldown = 50
-        self.image = self.animation_list[self.action][self.frame_index]
-        if pygame.time.get_ticks() - self.update_time > animation_cooldown:
-            self.update_time = pygame.time.get_ticks()
-            self.frame_index += 1
-        if self.frame_index >= len(self.animation_list[self.action]):
-            if not self.alive:
-                self.frame_index = len(self.animation_list[self.action]) - 1
-            else:
-                self.attacking = False
-                self.frame_index = 0
-
-    def update_action(self, new_action):
-        if new_action != self.action:
-            self.action = new_action
-            self.frame_index = 0
-            self.update_time = pygame.time.get_ticks()
-
-    def draw(self, surface):
-        img = pygame.transform.flip(self.image, self.flip, False)
-        surface.blit(img, (self.rect.x - self.offset[0], self.rect.y - self.offset[1]))
-
-# The rest of your game code (initialization, game loop, etc.) goes here.
+if __name__ == "__main__":
+    main()
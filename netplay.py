@@ -0,0 +1,251 @@
+# Rollback netcode for two-player online play.
+#
+# Each peer simulates the match locally every tick with its own input and a
+# prediction of the remote player's input (the last input received). When a
+# remote input arrives that differs from what was predicted, the match is
+# restored from the snapshot taken before that tick and re-simulated up to
+# the present, so local input is never delayed by the network.
+#
+#   python netplay.py --ticks 1200 --rtt 100     (two peers over UDP loopback)
+import argparse
+import random
+import socket
+import struct
+import time
+
+from simulation import FighterInput, Match, TICK_RATE
+
+# ack (frames of the receiver's input already received), first frame, count; input bytes follow
+PACKET = struct.Struct("<IIB")
+MAX_INPUTS_PER_PACKET = 255
+
+
+# One peer of a rollback session over a simulation.Match
+class RollbackSession:
+    def __init__(self, local_player, match=None, max_rollback=8):
+        self.local_player = local_player
+        self.match = match if match is not None else Match()
+        self.max_rollback = max_rollback
+        self.frame = self.match.tick  # next frame to simulate
+        self.local_inputs = {}
+        self.remote_inputs = {}
+        self.predicted = {}  # remote input each simulated frame was run with
+        self.snapshots = [None] * (max_rollback + 2)
+        self.confirmed = self.frame  # every remote input before this frame has arrived
+        self.reported = self.frame  # frames before this one were passed to on_confirmed
+        self.peer_ack = self.frame  # every local input before this frame reached the peer
+        self.last_remote_bits = 0
+        self.rollback_frame = None
+        # Stats
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.rollback_seconds = 0.0
+
+    # The local player may only run max_rollback frames ahead of the confirmed remote inputs
+    def can_advance(self):
+        return self.frame - self.confirmed < self.max_rollback
+
+    def add_remote_input(self, frame, bits):
+        if frame < self.confirmed or frame in self.remote_inputs:
+            return
+        self.remote_inputs[frame] = bits
+        while self.confirmed in self.remote_inputs:
+            self.last_remote_bits = self.remote_inputs[self.confirmed]
+            self.confirmed += 1
+        if frame < self.frame and self.predicted.get(frame) != bits:
+            if self.rollback_frame is None or frame < self.rollback_frame:
+                self.rollback_frame = frame
+
+    def simulate(self, frame):
+        self.snapshots[frame % len(self.snapshots)] = self.match.snapshot()
+        remote_bits = self.remote_inputs.get(frame, self.last_remote_bits)
+        self.predicted[frame] = remote_bits
+        local_input = FighterInput.from_bits(self.local_inputs[frame])
+        remote_input = FighterInput.from_bits(remote_bits)
+        if self.local_player == 1:
+            self.match.step(local_input, remote_input)
+        else:
+            self.match.step(remote_input, local_input)
+
+    # Restore the match from before the first mispredicted frame and re-simulate to the present
+    def rollback(self):
+        if self.rollback_frame is None:
+            return
+        start = time.perf_counter()
+        self.match.restore(self.snapshots[self.rollback_frame % len(self.snapshots)])
+        for frame in range(self.rollback_frame, self.frame):
+            self.simulate(frame)
+        self.rollbacks += 1
+        self.resimulated_frames += self.frame - self.rollback_frame
+        self.rollback_seconds += time.perf_counter() - start
+        self.rollback_frame = None
+
+    # Called once for every frame whose inputs are known on both sides, in
+    # order, with player 1's and player 2's bits; these frames never roll back
+    def on_confirmed(self, frame, bits_1, bits_2):
+        pass
+
+    def report_confirmed(self):
+        for frame in range(self.reported, min(self.confirmed, self.frame)):
+            local_bits = self.local_inputs[frame]
+            remote_bits = self.remote_inputs[frame]
+            if self.local_player == 1:
+                self.on_confirmed(frame, local_bits, remote_bits)
+            else:
+                self.on_confirmed(frame, remote_bits, local_bits)
+            self.reported = frame + 1
+
+    # Simulate the next frame with the local input bits
+    def advance(self, local_bits):
+        self.rollback()
+        self.local_inputs[self.frame] = local_bits
+        self.simulate(self.frame)
+        self.frame += 1
+        self.report_confirmed()
+
+        # Forget what can no longer be rolled back to or resent
+        oldest = min(self.confirmed, self.frame - self.max_rollback - 1)
+        for frame in [f for f in self.predicted if f < oldest]:
+            del self.predicted[frame]
+            self.remote_inputs.pop(frame, None)
+        for frame in [f for f in self.local_inputs if f < oldest and f < self.peer_ack]:
+            del self.local_inputs[frame]
+
+    # Packet with every local input the peer has not acknowledged yet
+    def make_packet(self):
+        first = self.peer_ack
+        inputs = bytes(self.local_inputs[frame] for frame in range(first, min(self.frame, first + MAX_INPUTS_PER_PACKET)))
+        return PACKET.pack(self.confirmed, first, len(inputs)) + inputs
+
+    def read_packet(self, packet):
+        ack, first, count = PACKET.unpack_from(packet, 0)
+        self.peer_ack = max(self.peer_ack, ack)
+        for i in range(count):
+            self.add_remote_input(first + i, packet[PACKET.size + i])
+
+    def poll(self, transport):
+        for packet in transport.receive():
+            self.read_packet(packet)
+        self.report_confirmed()
+
+    def send(self, transport):
+        transport.send(self.make_packet())
+
+
+# Non-blocking UDP transport between two peers
+class UdpTransport:
+    def __init__(self, local_address, remote_address=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(local_address)
+        self.socket.setblocking(False)
+        self.remote_address = remote_address
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def send(self, data):
+        self.socket.sendto(data, self.remote_address)
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                packet, _ = self.socket.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except (ConnectionResetError, ConnectionRefusedError):
+                continue  # Windows reports a packet sent before the peer was listening on the next receive
+            packets.append(packet)
+
+    def close(self):
+        self.socket.close()
+
+
+# Holds received packets back for a fixed delay to emulate network latency
+class DelayedTransport:
+    def __init__(self, transport, delay, clock=time.monotonic):
+        self.transport = transport
+        self.delay = delay
+        self.clock = clock
+        self.queue = []
+
+    def send(self, data):
+        self.transport.send(data)
+
+    def receive(self):
+        now = self.clock()
+        self.queue.extend((now + self.delay, packet) for packet in self.transport.receive())
+        ready = [packet for arrival, packet in self.queue if arrival <= now]
+        self.queue = [(arrival, packet) for arrival, packet in self.queue if arrival > now]
+        return ready
+
+    def close(self):
+        self.transport.close()
+
+
+# Function for creating two UDP transports on localhost that talk to each other
+def loopback_pair():
+    transport_1 = UdpTransport(("127.0.0.1", 0))
+    transport_2 = UdpTransport(("127.0.0.1", 0))
+    transport_1.remote_address = transport_2.address
+    transport_2.remote_address = transport_1.address
+    return transport_1, transport_2
+
+
+# Function for playing both peers of a session over UDP loopback with emulated
+# round-trip time and checking that they end in exactly the same state
+def run_loopback(ticks=1200, rtt=0.1, seed=0, max_rollback=8):
+    rng = random.Random(seed)
+    sim_time = [0.0]
+    clock = lambda: sim_time[0]
+    transports = [DelayedTransport(transport, rtt / 2, clock) for transport in loopback_pair()]
+    sessions = [RollbackSession(1, max_rollback=max_rollback), RollbackSession(2, max_rollback=max_rollback)]
+    held = [0, 0]
+    stalls = 0
+    while min(session.frame for session in sessions) < ticks:
+        for session, transport, player in zip(sessions, transports, range(2)):
+            session.poll(transport)
+            if session.frame < ticks and session.can_advance():
+                if rng.random() < 0.1:
+                    held[player] = rng.randrange(32)
+                session.advance(held[player])
+            else:
+                stalls += 1
+            session.send(transport)
+        sim_time[0] += 1 / TICK_RATE
+        time.sleep(0.0002)
+
+    # Let both peers receive the last inputs, then settle any pending rollback
+    for _ in range(int(rtt * TICK_RATE) + 2):
+        sim_time[0] += 1 / TICK_RATE
+        time.sleep(0.001)
+        for session, transport in zip(sessions, transports):
+            session.poll(transport)
+            session.send(transport)
+    for session in sessions:
+        session.rollback()
+    for transport in transports:
+        transport.close()
+    return sessions, stalls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run two rollback peers over UDP loopback")
+    parser.add_argument("--ticks", type=int, default=1200)
+    parser.add_argument("--rtt", type=float, default=100, help="emulated round-trip time in milliseconds")
+    parser.add_argument("--max-rollback", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sessions, stalls = run_loopback(args.ticks, args.rtt / 1000, args.seed, args.max_rollback)
+    for session in sessions:
+        average = session.rollback_seconds / max(session.rollbacks, 1) * 1000
+        print(f"player {session.local_player}: {session.rollbacks} rollbacks, "
+              f"{session.resimulated_frames} frames resimulated, {average:.3f} ms per rollback")
+    print(f"stalled ticks: {stalls}")
+    print("in sync" if sessions[0].match.snapshot() == sessions[1].match.snapshot() else "DESYNC")
+
+
+if __name__ == "__main__":
+    main()
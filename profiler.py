@@ -0,0 +1,96 @@
+# Frame-time profiler for the main loop.
+# The loop calls lap(name) after each phase and end_frame() once per frame;
+# each lap is charged the time since the previous one. Rolling percentiles
+# are kept per phase, can be drawn as an on-screen overlay and exported as a
+# CSV or JSON trace.
+import collections
+import csv
+import json
+import time
+
+
+class FrameProfiler:
+    def __init__(self, window=600, trace_length=36000, overlay_refresh=30):
+        self.window = window
+        self.phases = {}  # phase name -> rolling window of seconds
+        self.frame_times = collections.deque(maxlen=window)
+        self.trace = collections.deque(maxlen=trace_length)
+        self.current = {}
+        self.frame = 0
+        self.frame_start = self.last = time.perf_counter()
+        self.show_overlay = False
+        self.overlay_refresh = overlay_refresh
+        self.overlay_images = []
+
+    # Restart timing, e.g. after a menu so the first frame isn't charged for it
+    def begin_frame(self):
+        self.current = {}
+        self.frame_start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        total = now - self.frame_start
+        self.frame_times.append(total)
+        for name, seconds in self.current.items():
+            times = self.phases.get(name)
+            if times is None:
+                times = self.phases[name] = collections.deque(maxlen=self.window)
+            times.append(seconds)
+        self.trace.append((self.frame, total, self.current))
+        self.frame += 1
+        self.current = {}
+        self.frame_start = self.last = now
+
+    # Function for rolling percentiles of a window of seconds, in milliseconds
+    @staticmethod
+    def percentiles(times, percents=(50, 95, 99)):
+        ordered = sorted(times)
+        if not ordered:
+            return {f"p{p}": 0.0 for p in percents}
+        return {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in percents}
+
+    def summary(self):
+        result = {"frame": self.percentiles(self.frame_times)}
+        for name, times in self.phases.items():
+            result[name] = self.percentiles(times)
+        return result
+
+    def export_csv(self, path):
+        names = list(self.phases)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "frame_ms"] + [f"{name}_ms" for name in names])
+            for frame, total, phases in self.trace:
+                writer.writerow([frame, f"{total * 1000:.4f}"] + [f"{phases.get(name, 0.0) * 1000:.4f}" for name in names])
+
+    def export_json(self, path):
+        frames = [{"frame": frame, "frame_ms": total * 1000, "phases_ms": {name: seconds * 1000 for name, seconds in phases.items()}}
+                  for frame, total, phases in self.trace]
+        with open(path, "w") as f:
+            json.dump({"summary_ms": self.summary(), "frames": frames}, f)
+
+    # Export by file extension (.csv, anything else is JSON)
+    def export(self, path):
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    # Draw the overlay and return the rects it touched. The text is only
+    # re-rendered every overlay_refresh frames so the overlay stays cheap.
+    def draw_overlay(self, surface, font, color, x, y):
+        if self.frame % self.overlay_refresh == 0 or not self.overlay_images:
+            lines = []
+            for name, values in self.summary().items():
+                lines.append(f"{name}: {values['p50']:.2f} / {values['p95']:.2f} / {values['p99']:.2f} ms")
+            self.overlay_images = [font.render(line, True, color) for line in lines]
+        rects = []
+        for image in self.overlay_images:
+            rects.append(surface.blit(image, (x, y)))
+            y += image.get_height()
+        return rects
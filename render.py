@@ -0,0 +1,164 @@
+import pygame
+
+# Assets and colors every drawing of a fight uses (the game, the bundle
+# baker and the replay exporter)
+BG_PATHS = {
+    "normal": "assets/images/background/background.jpg",
+    "forest": "assets/images/background/forest.jpg",
+    "ice": "assets/images/background/snow.jpg"
+}
+VICTORY_PATH = "assets/images/icons/victory.png"
+RED = (255, 0, 0)
+YELLOW = (255, 255, 0)
+WHITE = (255, 255, 255)
+
+# Backgrounds scaled to the screen, keyed by (mode, screen size)
+_bg_cache = {}
+
+
+# Function for getting an already scaled background, or None
+def find_scaled_bg(mode, size):
+    return _bg_cache.get((mode, tuple(size)))
+
+
+# Function for registering a background that was scaled elsewhere (e.g. loaded from a bundle)
+def add_scaled_bg(mode, size, scaled_bg):
+    _bg_cache[(mode, tuple(size))] = scaled_bg
+
+
+# Function for getting a background scaled to the screen, built once per mode and size
+def get_scaled_bg(mode, image, size):
+    key = (mode, tuple(size))
+    scaled_bg = _bg_cache.get(key)
+    if scaled_bg is None:
+        scaled_bg = pygame.transform.scale(image, size).convert()
+        _bg_cache[key] = scaled_bg
+    return scaled_bg
+
+
+# Dirty-rectangle renderer. Everything in the game is drawn on top of a static
+# background, so each frame only the areas drawn last frame are restored from
+# the background and only those plus the areas drawn this frame are pushed to
+# the display.
+class DirtyRenderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = None
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.last_rects = []
+
+    def set_background(self, background):
+        if background is not self.background:
+            self.background = background
+            self.full_redraw = True
+
+    # Force the next frame to redraw and update the whole screen
+    def invalidate(self):
+        self.full_redraw = True
+
+    def begin(self):
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.last_rects:
+                self.screen.blit(self.background, rect, rect)
+        self.dirty_rects = []
+
+    def add(self, rect):
+        self.dirty_rects.append(rect)
+        return rect
+
+    def end(self):
+        if self.full_redraw:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.last_rects + self.dirty_rects)
+        self.last_rects = self.dirty_rects
+
+
+# Function for drawing a health bar (border, empty and filled colors), returns its rect
+def draw_health_bar(surface, health, x, y, border, empty, filled, width=150, height=20):
+    ratio = health / 100
+    rect = pygame.draw.rect(surface, border, (x - 2, y - 2, width + 4, height + 4))
+    pygame.draw.rect(surface, empty, (x, y, width, height))
+    pygame.draw.rect(surface, filled, (x, y, width * ratio, height))
+    return rect
+
+
+# Function for drawing a fighter's current frame with its rect at (x, y).
+# Frames are cropped to their visible pixels; the drawn rect is returned.
+def draw_fighter(surface, fighter, animation, x, y):
+    img, frame_offset = animation.get_frame(fighter.image_frame[0], fighter.image_frame[1], fighter.flip)
+    return surface.blit(img, (x - fighter.offset[0] + frame_offset[0], y - fighter.offset[1] + frame_offset[1]))
+
+
+# Bolt images, built once per size
+_bolt_cache = {}
+
+
+# Function for a glowing bolt of the given size: nested ellipses, from the
+# first (outermost, faint) color to the last (core)
+def get_bolt_image(width, height, colors):
+    key = (width, height, tuple(colors))
+    image = _bolt_cache.get(key)
+    if image is None:
+        image = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, color in enumerate(colors):
+            inset_x = width * i // (2 * len(colors))
+            inset_y = height * i // (2 * len(colors))
+            alpha = 255 * (i + 1) // len(colors)
+            pygame.draw.ellipse(image, (*color, alpha), (inset_x, inset_y, width - 2 * inset_x, height - 2 * inset_y))
+        image = image.convert_alpha()
+        _bolt_cache[key] = image
+    return image
+
+
+# Function for drawing every live projectile of an effects.ProjectilePool as
+# a bolt with one blits call. Positions are top left corners like the rules'
+# rects. Returns the rect around everything drawn, or None when none fly.
+def draw_projectiles(surface, pool, colors):
+    slots = pool.live_slots()
+    if not len(slots):
+        return None
+    xs = pool.x[slots].tolist()
+    ys = pool.y[slots].tolist()
+    widths = pool.width[slots].tolist()
+    heights = pool.height[slots].tolist()
+    images = [get_bolt_image(width, height, colors) for width, height in zip(widths, heights)]
+    surface.blits(zip(images, zip(xs, ys)), doreturn=False)
+    left = min(xs)
+    top = min(ys)
+    right = max(x + width for x, width in zip(xs, widths))
+    bottom = max(y + height for y, height in zip(ys, heights))
+    return pygame.Rect(left, top, right - left, bottom - top).clip(surface.get_rect())
+
+
+# Function for making small round spark images, one per color
+def make_spark_images(colors, radius=4):
+    images = []
+    for color in colors:
+        image = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(image, color, (radius, radius), radius)
+        images.append(image.convert_alpha())
+    return images
+
+
+# Function for drawing every live effect of an effects pool with one blits
+# call. The pool's kind picks the image; positions are image centers. Returns
+# the rect around everything drawn, or None when the pool is empty.
+def draw_pool(surface, pool, images):
+    slots = pool.live_slots()
+    if not len(slots):
+        return None
+    half_width = max(image.get_width() for image in images) // 2
+    half_height = max(image.get_height() for image in images) // 2
+    xs = pool.x[slots].astype(int) - half_width
+    ys = pool.y[slots].astype(int) - half_height
+    kinds = pool.kind[slots].tolist()
+    surface.blits(zip(map(images.__getitem__, kinds), zip(xs.tolist(), ys.tolist())), doreturn=False)
+    left = int(xs.min())
+    top = int(ys.min())
+    rect = pygame.Rect(left, top, int(xs.max()) - left + 2 * half_width, int(ys.max()) - top + 2 * half_height)
+    return rect.clip(surface.get_rect())
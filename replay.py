@@ -0,0 +1,219 @@
+# Deterministic match replays.
+#
+# A replay is a small header followed by one record of two bytes per tick:
+# the input bits (see simulation.INPUT_*) of player 1 and player 2. The
+# header holds both characters' compiled records (characters.CharacterData)
+# as JSON, so a replay plays back with the numbers it was recorded with even
+# after the roster changes or when two characters share a sprite geometry.
+# It also holds the round seed (the live game seeds the round's hit sparks
+# with it) and the clock tick the round started at, since fighter timing
+# counts from the game clock. The live game records every round from the
+# moment its fighters appear, countdown included (those ticks have no
+# input). The header never changes after it is written and the tick count
+# is derived from the file size, so a replay can be appended to while the
+# match is still running, read as a stream, or memory-mapped and indexed by
+# tick. Stepping a simulation.Match with the recorded inputs reproduces the
+# match bit for bit at any speed.
+#
+# Replays of older versions were recorded under older hit rules (versions 1
+# and 2 predate the attack rows and the pixel-exact hit shapes) and would
+# play back differently, so they are refused.
+import json
+import mmap
+import struct
+
+from characters import CharacterData, ProjectileData
+from simulation import FighterInput, Match, TICK_RATE
+
+MAGIC = b"BRPL"
+VERSION = 3
+# magic, version
+MAGIC_VERSION = struct.Struct("<4sH")
+# magic, version, header size, tick rate, round seed, start tick
+PREFIX = struct.Struct("<4sHHHQQ")
+# Length of a character record (UTF-8 JSON follows)
+CHARACTER = struct.Struct("<H")
+TICK_BYTES = 2
+
+
+# Function for building the header of a replay from two characters.CharacterData
+def encode_header(seed, character_1, character_2, tick_rate=TICK_RATE, start_tick=0):
+    body = b""
+    for character in (character_1, character_2):
+        record = character._asdict()
+        if character.projectile is not None:
+            record["projectile"] = character.projectile._asdict()
+        record = json.dumps(record, separators=(",", ":")).encode()
+        body += CHARACTER.pack(len(record)) + record
+    return PREFIX.pack(MAGIC, VERSION, PREFIX.size + len(body), tick_rate, seed, start_tick) + body
+
+
+# Function for turning a record written by encode_header back into a CharacterData
+def decode_character(record):
+    record = json.loads(record)
+    record["offset"] = tuple(record["offset"])
+    record["animation_steps"] = tuple(record["animation_steps"])
+    if record["projectile"] is not None:
+        record["projectile"] = ProjectileData(**record["projectile"])
+    return CharacterData(**record)
+
+
+# Function for checking the fixed start of a header and reading it as
+# (header size, tick rate, seed, start tick)
+def decode_prefix(buffer):
+    if len(buffer) < MAGIC_VERSION.size:
+        raise ValueError("Replay is too short to hold a header")
+    magic, version = MAGIC_VERSION.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a replay file")
+    if version < VERSION:
+        raise ValueError(f"Replay version {version} was recorded under older hit rules and can't be played back")
+    if version != VERSION:
+        raise ValueError(f"Unsupported replay version: {version}")
+    if len(buffer) < PREFIX.size:
+        raise ValueError("Replay is too short to hold a header")
+    header_size, tick_rate, seed, start_tick = PREFIX.unpack_from(buffer, 0)[2:]
+    if tick_rate != TICK_RATE:
+        raise ValueError(f"Replay was recorded at {tick_rate} ticks per second, the game runs at {TICK_RATE}")
+    return header_size, tick_rate, seed, start_tick
+
+
+# Function for reading a header back as (seed, tick rate, start tick, [character 1, character 2], header size)
+def decode_header(buffer):
+    header_size, tick_rate, seed, start_tick = decode_prefix(buffer)
+    characters = []
+    offset = PREFIX.size
+    for _ in range(2):
+        (length,) = CHARACTER.unpack_from(buffer, offset)
+        offset += CHARACTER.size
+        characters.append(decode_character(bytes(buffer[offset:offset + length])))
+        offset += length
+    return seed, tick_rate, start_tick, characters, header_size
+
+
+# Appends ticks to a replay file. Every write goes straight to the file so a
+# reader can follow the match while it is recorded.
+class ReplayWriter:
+    def __init__(self, path, seed, character_1, character_2, start_tick=0):
+        self.file = open(path, "wb", buffering=0)
+        self.file.write(encode_header(seed, character_1, character_2, start_tick=start_tick))
+        self.file.flush()
+        self.ticks = 0
+
+    def write_bits(self, bits_1, bits_2):
+        self.file.write(bytes((bits_1, bits_2)))
+        self.ticks += 1
+
+    def write(self, input_1, input_2):
+        self.write_bits(input_1.to_bits(), input_2.to_bits())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Stand-in writer while nothing is being recorded
+class NullReplayWriter:
+    ticks = 0
+
+    def write_bits(self, bits_1, bits_2):
+        pass
+
+    def write(self, input_1, input_2):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Memory-mapped replay with random access by tick
+class ReplayReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buffer = None
+        self.refresh()
+        self.seed, self.tick_rate, self.start_tick, self.characters, self.header_size = decode_header(self.buffer)
+
+    # Re-map the file to see ticks appended since it was opened
+    def refresh(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return (len(self.buffer) - self.header_size) // TICK_BYTES
+
+    def input_bits(self, tick):
+        offset = self.header_size + tick * TICK_BYTES
+        return self.buffer[offset], self.buffer[offset + 1]
+
+    def inputs(self, start=0):
+        for tick in range(start, len(self)):
+            bits_1, bits_2 = self.input_bits(tick)
+            yield FighterInput.from_bits(bits_1), FighterInput.from_bits(bits_2)
+
+    def create_match(self):
+        character_1, character_2 = self.characters
+        return Match(character_1, None, character_2, None, self.start_tick)
+
+    # Headless fast-forward: step a match through the first ticks recorded
+    # ticks (default: all) and return it
+    def play(self, match=None, ticks=None):
+        if match is None:
+            match = self.create_match()
+        end = len(self) if ticks is None else min(ticks, len(self))
+        for tick in range(match.tick - self.start_tick, end):
+            bits_1, bits_2 = self.input_bits(tick)
+            match.step(FighterInput.from_bits(bits_1), FighterInput.from_bits(bits_2))
+        return match
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Function for reading a replay sequentially from any binary stream.
+# Yields the header first (as decode_header returns it), then (bits_1, bits_2) for every tick.
+def read_stream(stream):
+    prefix = stream.read(PREFIX.size)
+    header_size = decode_prefix(prefix)[0]
+    yield decode_header(prefix + stream.read(header_size - PREFIX.size))
+    while True:
+        record = stream.read(TICK_BYTES)
+        if len(record) < TICK_BYTES:
+            return
+        yield record[0], record[1]
+
+
+# Function for playing a match with input policies while recording it;
+# match is a fresh simulation.Match (default: warrior vs wizard), recorded from its tick
+def record_match(path, policy_1, policy_2, seed=0, max_ticks=60 * TICK_RATE, match=None):
+    if match is None:
+        match = Match()
+    fighter_1 = match.fighter_1
+    fighter_2 = match.fighter_2
+    end = match.tick + max_ticks
+    with ReplayWriter(path, seed, fighter_1.character, fighter_2.character, match.tick) as writer:
+        while not match.round_over and match.tick < end:
+            input_1 = policy_1(match, fighter_1, fighter_2)
+            input_2 = policy_2(match, fighter_2, fighter_1)
+            writer.write(input_1, input_2)
+            match.step(input_1, input_2)
+    return match
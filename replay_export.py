@@ -0,0 +1,336 @@
+# Offline match rendering.
+# Plays a recorded replay (see replay.py) headless and draws every output
+# frame off-screen with the game's own render helpers, then streams the raw
+# pixels through a bounded queue to encoder threads, so drawing the next
+# frame overlaps with encoding the last one. Nothing waits on a display or a
+# frame clock, so a match renders as fast as the CPU allows.
+#
+# Formats:
+#   gif  animated GIF, written by a small built-in encoder: a fixed 3-3-2
+#        color palette, uncompressed LZW codes and every frame cropped to
+#        the area that changed since the one before
+#   png  numbered PNG files in a directory (several encoder threads)
+#   raw  headerless rgb24 frames, e.g. for
+#        ffmpeg -f rawvideo -pix_fmt rgb24 -s 1000x600 -r 30 -i match.rgb match.mp4
+#
+#   python replay_export.py match.brpl --format gif --fps 30 --scale 0.5
+#   python replay_export.py replays/*.brpl --out highlights --processes 8
+import argparse
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+# Leave SIGINT/SIGTERM alone, SDL would turn them into quit events nobody reads
+# here (Ctrl+C and Pool.terminate would not stop a render)
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+import numpy as np
+import pygame
+
+import bundle
+import render
+import sprites
+from replay import ReplayReader
+from render import BG_PATHS, VICTORY_PATH, RED, YELLOW, WHITE
+from simulation import FighterInput, NO_INPUT, SCREEN_WIDTH, SCREEN_HEIGHT, TICK_RATE
+
+FORMATS = {"gif": ".gif", "png": "", "raw": ".rgb"}
+
+asset_bundle = None  # kept open while its frames are in use
+
+# GIF encoding: 8-bit palette indices, sent as 9-bit LZW codes with a clear
+# code often enough that the decoder's table never makes the codes wider
+GIF_CLEAR = 256
+GIF_END = 257
+GIF_CODE_BITS = 9
+GIF_CLEAR_EVERY = 250
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# zlib level and strategy: run-length matches only, the fastest to write and
+# (after the Sub filter) smaller than level 1 on the game's frames
+PNG_LEVEL = 1
+PNG_STRATEGY = zlib.Z_RLE
+
+
+# Function for the 256 colors of the 3-3-2 palette as RGB bytes
+def gif_palette():
+    index = np.arange(256)
+    colors = np.stack([(index >> 5) * 255 // 7, (index >> 2 & 7) * 255 // 7, (index & 3) * 255 // 3], axis=1)
+    return colors.astype(np.uint8).tobytes()
+
+
+# Function for mapping an (h, w, 3) RGB array to palette indices
+def quantize(pixels):
+    return (pixels[:, :, 0] & 0xE0) | (pixels[:, :, 1] & 0xE0) >> 3 | pixels[:, :, 2] >> 6
+
+
+# Function for packing 9-bit codes into bytes, least significant bit first:
+# every 8 codes make 9 bytes, each built from at most two neighbouring codes
+def pack_codes(codes):
+    count = len(codes)
+    groups = np.zeros((-(-count // 8), 8), dtype=np.uint32)
+    groups.ravel()[:count] = codes
+    packed = np.empty((len(groups), GIF_CODE_BITS), dtype=np.uint8)
+    for byte in range(GIF_CODE_BITS):
+        code, shift = divmod(8 * byte, GIF_CODE_BITS)
+        value = groups[:, code] >> shift
+        if code + 1 < 8:
+            value |= groups[:, code + 1] << (GIF_CODE_BITS - shift)
+        packed[:, byte] = value & 0xFF
+    return packed.ravel()[:-(-count * GIF_CODE_BITS // 8)]
+
+
+# Function for the LZW image data of palette indices, split into GIF sub-blocks
+def lzw_blocks(indices):
+    flat = indices.ravel()
+    chunks = -(-len(flat) // GIF_CLEAR_EVERY)
+    padded = np.zeros(chunks * GIF_CLEAR_EVERY, dtype=np.uint16)
+    padded[:len(flat)] = flat
+    codes = np.empty((chunks, GIF_CLEAR_EVERY + 1), dtype=np.uint16)
+    codes[:, 0] = GIF_CLEAR
+    codes[:, 1:] = padded.reshape(chunks, GIF_CLEAR_EVERY)
+    codes = codes.ravel()[:len(flat) + chunks]
+    data = pack_codes(np.append(codes, GIF_END))
+    full, rest = divmod(len(data), 255)
+    blocks = np.empty((full, 256), dtype=np.uint8)
+    blocks[:, 0] = 255
+    blocks[:, 1:] = data[:full * 255].reshape(full, 255)
+    tail = bytes([rest]) + data[full * 255:].tobytes() if rest else b""
+    return bytes([8]) + blocks.tobytes() + tail + b"\x00"
+
+
+# Streams frames into an animated GIF. Frames must arrive in order.
+class GifWriter:
+    workers = 1
+
+    def __init__(self, path, size, fps):
+        self.file = open(path, "wb")
+        self.size = size
+        self.fps = fps
+        self.frames = 0
+        self.previous = None
+        width, height = size
+        self.file.write(b"GIF89a" + width.to_bytes(2, "little") + height.to_bytes(2, "little") + b"\xf7\x00\x00")
+        self.file.write(gif_palette())
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")  # loop forever
+
+    def write(self, index, pixels):
+        width, height = self.size
+        indices = quantize(np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3))
+        left, top, right, bottom = 0, 0, width, height
+        if self.previous is not None:
+            changed = indices != self.previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+            else:
+                right, bottom = 1, 1  # nothing changed, a 1x1 frame just holds the time
+        self.previous = indices
+        # Frame delays are in hundredths of a second, rounded so they add up
+        delay = round((self.frames + 1) * 100 / self.fps) - round(self.frames * 100 / self.fps)
+        self.frames += 1
+        self.file.write(b"\x21\xf9\x04\x04" + delay.to_bytes(2, "little") + b"\x00\x00")
+        self.file.write(b"\x2c" + b"".join(int(v).to_bytes(2, "little") for v in (left, top, right - left, bottom - top))
+                        + b"\x00")
+        self.file.write(lzw_blocks(indices[top:bottom, left:right]))
+
+    def close(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
+# Function for a PNG chunk: length, type, data and CRC
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+# Writes every frame to its own PNG file in a directory; order doesn't matter.
+# Rows use the Sub filter (each byte minus the one a pixel to its left) and
+# zlib runs without the GIL, so the worker threads compress in parallel.
+# pygame.image.save compresses at a fixed high level, too slow for real time.
+class PngWriter:
+    workers = 4
+
+    def __init__(self, directory, size, fps):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.size = size
+
+    def write(self, index, pixels):
+        width, height = self.size
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width * 3)
+        rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+        rows[:, 0] = 1  # Sub filter
+        rows[:, 1:4] = image[:, :3]
+        np.subtract(image[:, 3:], image[:, :-3], out=rows[:, 4:])
+        header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+        compressor = zlib.compressobj(PNG_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, PNG_STRATEGY)
+        data = compressor.compress(rows.tobytes()) + compressor.flush()
+        with open(os.path.join(self.directory, f"frame_{index:05d}.png"), "wb") as f:
+            f.write(PNG_SIGNATURE + png_chunk(b"IHDR", header) + png_chunk(b"IDAT", data)
+                    + png_chunk(b"IEND", b""))
+
+    def close(self):
+        pass
+
+
+# Appends raw rgb24 frames to one file
+class RawWriter:
+    workers = 1
+
+    def __init__(self, path, size, fps):
+        self.file = open(path, "wb")
+
+    def write(self, index, pixels):
+        self.file.write(pixels)
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {"gif": GifWriter, "png": PngWriter, "raw": RawWriter}
+
+
+# Hands frames to a writer's worker threads through a bounded queue. submit
+# blocks while the queue is full so a slow encoder can't eat all the memory;
+# the first error raised by the writer is raised again from submit or close.
+class EncoderPipeline:
+    def __init__(self, writer, queue_size=8):
+        self.writer = writer
+        self.queue = queue.Queue(queue_size)
+        self.error = None
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(writer.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.writer.write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def submit(self, index, pixels):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((index, pixels))
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+
+# Function for opening a 1x1 display for surfaces to be converted for, once
+# per process, and installing the pre-baked asset bundle if there is one
+def init_display():
+    global asset_bundle
+    if not pygame.display.get_init():
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        asset_bundle = bundle.load_bundle()
+
+
+# Function for rendering a replay into output (file or directory) and returning
+# (frames, seconds). start and ticks pick the part of the match to render;
+# tail_ms keeps rendering that long past the end so the loser falls.
+def export_replay(path, output, fmt="gif", fps=30, scale=1.0, mode="normal", start=0, ticks=None, tail_ms=1000):
+    started = time.perf_counter()
+    init_display()
+    screen_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    frame = pygame.Surface(screen_size).convert()
+    background = render.find_scaled_bg(mode, screen_size)
+    if background is None:
+        background = render.get_scaled_bg(mode, pygame.image.load(BG_PATHS[mode]), screen_size)
+    victory_img = pygame.image.load(VICTORY_PATH).convert_alpha()
+    size = screen_size if scale == 1.0 else (round(SCREEN_WIDTH * scale), round(SCREEN_HEIGHT * scale))
+    scaled = None if scale == 1.0 else pygame.Surface(size).convert()
+
+    with ReplayReader(path) as reader:
+        match = reader.play(ticks=start)
+        fighters = (match.fighter_1, match.fighter_2)
+        animations = [sprites.character_animation(fighter.character) for fighter in fighters]
+        end = len(reader) if ticks is None else min(len(reader), start + ticks)
+        last = end + int(tail_ms * TICK_RATE / 1000)
+        pipeline = EncoderPipeline(WRITERS[fmt](output, size, fps))
+        frames = 0
+        try:
+            for tick in range(match.tick - reader.start_tick, last):
+                if tick < end:
+                    bits_1, bits_2 = reader.input_bits(tick)
+                    match.step(FighterInput.from_bits(bits_1), FighterInput.from_bits(bits_2))
+                else:
+                    match.step(NO_INPUT, NO_INPUT)
+                # Output frames fall on the ticks where the frame clock passes a frame
+                if (tick + 1 - start) * fps // TICK_RATE == (tick - start) * fps // TICK_RATE:
+                    continue
+                frame.blit(background, (0, 0))
+                render.draw_health_bar(frame, match.fighter_1.health, 20, 20, WHITE, RED, YELLOW)
+                render.draw_health_bar(frame, match.fighter_2.health, 580, 20, WHITE, RED, YELLOW)
+                for fighter, animation in zip(fighters, animations):
+                    render.draw_fighter(frame, fighter, animation, fighter.rect.x, fighter.rect.y)
+                if match.round_over:
+                    frame.blit(victory_img, (360, 150))
+                if scaled is not None:
+                    pygame.transform.smoothscale(frame, size, scaled)
+                pipeline.submit(frames, pygame.image.tobytes(scaled or frame, "RGB"))
+                frames += 1
+        finally:
+            pipeline.close()
+    return frames, time.perf_counter() - started
+
+
+# Worker job for bulk exports: one replay per job
+def export_job(job):
+    path, output, options = job
+    frames, seconds = export_replay(path, output, **options)
+    return path, output, frames, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render recorded matches off-screen to GIF, PNG frames or raw video.")
+    parser.add_argument("replays", nargs="+", help="replay files")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="gif")
+    parser.add_argument("--out", default=".", help="directory for the outputs, named after the replays")
+    parser.add_argument("--fps", type=int, default=30, help="output frame rate (at most the tick rate)")
+    parser.add_argument("--scale", type=float, default=1.0, help="output size relative to the game screen")
+    parser.add_argument("--background", choices=sorted(BG_PATHS), default="normal")
+    parser.add_argument("--start", type=int, default=0, help="first tick to render")
+    parser.add_argument("--ticks", type=int, default=None, help="how many ticks to render (default: to the end)")
+    parser.add_argument("--tail-ms", type=int, default=1000, help="keep rendering this long after the replay ends")
+    parser.add_argument("--processes", type=int, default=1, help="replays rendered at once")
+    args = parser.parse_args()
+    if not 0 < args.fps <= TICK_RATE:
+        parser.error(f"--fps must be between 1 and {TICK_RATE}")
+
+    os.makedirs(args.out, exist_ok=True)
+    options = {"fmt": args.format, "fps": args.fps, "scale": args.scale, "mode": args.background,
+               "start": args.start, "ticks": args.ticks, "tail_ms": args.tail_ms}
+    jobs = [(path, os.path.join(args.out, os.path.splitext(os.path.basename(path))[0] + FORMATS[args.format]), options)
+            for path in args.replays]
+    if args.processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(args.processes) as pool:
+            results = list(pool.imap_unordered(export_job, jobs))
+    else:
+        results = [export_job(job) for job in jobs]
+    for path, output, frames, seconds in results:
+        video_seconds = frames / args.fps
+        print(f"{path} -> {output}: {frames} frames in {seconds:.2f}s ({video_seconds / max(seconds, 1e-9):.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
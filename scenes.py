@@ -0,0 +1,135 @@
+# Scene engine.
+# The game is a state machine of scenes (menu, countdown, fight, round over,
+# results) driven by one main loop. Every frame the loop ticks the clock,
+# hands the events to the current scene, then calls its update and render.
+#
+# Each scene has an explicit budget in milliseconds for update and for
+# render. update is given the deadline its budget ends at and is expected to
+# stop there (the fight stops stepping the simulation and leaves the rest to
+# the timestep clock, which drops it if the game can't catch up). render is
+# timed, and a scene that went over is told so on its next frame through
+# render_over_budget so it can leave out what is only decoration. Overruns
+# are counted per scene and phase in SceneMachine.overruns.
+#
+# Scenes switch by name with machine.switch(); the switch happens at the
+# start of the next frame, so a scene never runs half a frame after it left.
+# Nothing here opens a window or touches the display.
+import time
+
+import pygame
+
+import telemetry
+
+# A frame taking longer than this many frames is logged as an overrun
+OVERRUN_FRAMES = 1.5
+
+
+# Base scene, every method is optional
+class Scene:
+    name = "scene"
+    update_budget_ms = 2.0
+    render_budget_ms = 8.0
+
+    def __init__(self):
+        self.machine = None
+        self.render_over_budget = False
+
+    # Called when the scene becomes current, previous is the scene it replaces (or None)
+    def enter(self, previous):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    # elapsed is the frame time in ms, deadline the time.perf_counter() the update budget ends at
+    def update(self, elapsed, deadline):
+        pass
+
+    def render(self):
+        pass
+
+
+class SceneMachine:
+    # events is a telemetry sink, profiler a profiler.FrameProfiler (both optional)
+    def __init__(self, clock, fps, events=None, profiler=None):
+        self.clock = clock
+        self.fps = fps
+        self.frame_ms = 1000 // fps
+        self.events = telemetry.NullTelemetry() if events is None else events
+        self.profiler = profiler
+        self.scenes = {}
+        self.scene = None
+        self.pending = None
+        self.running = False
+        self.overruns = {}  # (scene name, "update" or "render") -> frames over budget
+
+    def add(self, scene):
+        scene.machine = self
+        self.scenes[scene.name] = scene
+        return scene
+
+    def switch(self, name):
+        self.pending = self.scenes[name]
+
+    def stop(self):
+        self.running = False
+
+    def lap(self, name):
+        if self.profiler is not None:
+            self.profiler.lap(name)
+
+    def enter_pending(self):
+        previous, self.scene, self.pending = self.scene, self.pending, None
+        if previous is not None:
+            previous.exit()
+        self.scene.render_over_budget = False
+        self.scene.enter(previous)
+        # Entering may load or wait; that time is not charged to the scene's first frame
+        self.clock.tick()
+        if self.profiler is not None:
+            self.profiler.begin_frame()
+
+    # Function for counting a phase that went over its budget; returns whether it did
+    def charge(self, scene, phase, seconds, budget_ms):
+        if seconds * 1000 <= budget_ms:
+            return False
+        key = (scene.name, phase)
+        self.overruns[key] = self.overruns.get(key, 0) + 1
+        return True
+
+    # The main loop, runs until a scene (or closing the window) stops it
+    def run(self, first):
+        self.switch(first)
+        self.running = True
+        while self.running:
+            if self.pending is not None:
+                self.enter_pending()
+                if not self.running:
+                    break
+            scene = self.scene
+            elapsed = self.clock.tick(self.fps)
+            if elapsed > self.frame_ms * OVERRUN_FRAMES:
+                self.events.emit(telemetry.EVENT_OVERRUN, 0, elapsed, self.frame_ms)
+            self.lap("clock.tick")
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.stop()
+                else:
+                    scene.handle_event(event)
+            self.lap("events")
+
+            start = time.perf_counter()
+            scene.update(elapsed, start + scene.update_budget_ms / 1000)
+            updated = time.perf_counter()
+            scene.render()
+            rendered = time.perf_counter()
+            self.charge(scene, "update", updated - start, scene.update_budget_ms)
+            scene.render_over_budget = self.charge(scene, "render", rendered - updated, scene.render_budget_ms)
+            if self.profiler is not None:
+                self.profiler.end_frame()
+        if self.scene is not None:
+            self.scene.exit()
@@ -0,0 +1,346 @@
+# Headless fighter simulation.
+# Pure Python with no pygame imports: no display, mixer or wall clock, so
+# matches can be stepped as fast as the CPU allows for balance testing and
+# server-side validation. The live game's Fighter is built on FighterState.
+from characters import (
+    BUILTIN_CHARACTERS, CharacterData, get_character, ACTION_IDLE, ACTION_RUN, ACTION_JUMP, ACTION_DEATH, ATTACK_ROWS
+)
+from hitmask import box_shape, character_hitmask, shapes_overlap
+
+# Screen size the rules are tuned for
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 600
+
+# Physics and combat rules
+SPEED = 10
+GRAVITY = 2
+JUMP_VELOCITY = -30
+FLOOR_OFFSET = 110
+
+# Fixed simulation tick
+TICK_RATE = 60
+TICK_MS = 1000 / TICK_RATE
+
+# Define fighter variables (from the character definitions)
+WARRIOR = BUILTIN_CHARACTERS["warrior"]
+WIZARD = BUILTIN_CHARACTERS["wizard"]
+WARRIOR_SIZE = WARRIOR.size
+WARRIOR_SCALE = WARRIOR.scale
+WARRIOR_OFFSET = list(WARRIOR.offset)
+WARRIOR_DATA = [WARRIOR_SIZE, WARRIOR_SCALE, WARRIOR_OFFSET]
+WIZARD_SIZE = WIZARD.size
+WIZARD_SCALE = WIZARD.scale
+WIZARD_OFFSET = list(WIZARD.offset)
+WIZARD_DATA = [WIZARD_SIZE, WIZARD_SCALE, WIZARD_OFFSET]
+
+# Define number of steps in each animation
+WARRIOR_ANIMATION_STEPS = list(WARRIOR.animation_steps)
+WIZARD_ANIMATION_STEPS = list(WIZARD.animation_steps)
+
+# Starting positions of each player
+PLAYER_1_START = (200, 310)
+PLAYER_2_START = (700, 310)
+
+
+# Minimal integer rectangle with the parts of pygame.Rect the rules use
+class Rect:
+    __slots__ = ("x", "y", "width", "height")
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def left(self):
+        return self.x
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def top(self):
+        return self.y
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    @property
+    def centerx(self):
+        return self.x + self.width // 2
+
+    def colliderect(self, other):
+        # Same semantics as pygame.Rect.colliderect: touching edges and empty rects never collide
+        if self.width <= 0 or self.height <= 0 or other.width <= 0 or other.height <= 0:
+            return False
+        return (self.x < other.x + other.width and other.x < self.x + self.width
+                and self.y < other.y + other.height and other.y < self.y + self.height)
+
+
+# Input bits, used wherever inputs are stored or sent as one byte per player
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_ATTACK_1 = 8
+INPUT_ATTACK_2 = 16
+
+
+# Buttons held by one player during one tick
+class FighterInput:
+    def __init__(self, left=False, right=False, jump=False, attack_1=False, attack_2=False):
+        self.left = left
+        self.right = right
+        self.jump = jump
+        self.attack_1 = attack_1
+        self.attack_2 = attack_2
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(bool(bits & INPUT_LEFT), bool(bits & INPUT_RIGHT), bool(bits & INPUT_JUMP),
+                   bool(bits & INPUT_ATTACK_1), bool(bits & INPUT_ATTACK_2))
+
+    def to_bits(self):
+        return ((INPUT_LEFT if self.left else 0) | (INPUT_RIGHT if self.right else 0)
+                | (INPUT_JUMP if self.jump else 0) | (INPUT_ATTACK_1 if self.attack_1 else 0)
+                | (INPUT_ATTACK_2 if self.attack_2 else 0))
+
+
+NO_INPUT = FighterInput()
+
+
+# Fighter rules and state, independent of how the fighter is drawn or controlled.
+# Only the per-tick mutable fields live on the instance (in slots); everything
+# static is read from the shared CharacterData. data is either a CharacterData
+# or legacy [size, scale, offset] data with its animation steps.
+class FighterState:
+    __slots__ = ("player", "character", "flip", "action", "frame_index", "image_frame", "update_time", "rect",
+                 "vel_y", "running", "jump", "attacking", "attack_type", "health", "alive")
+
+    def __init__(self, player, x, y, flip, data, animation_steps=None, now=0):
+        self.player = player
+        self.character = data if isinstance(data, CharacterData) else get_character(data, animation_steps)
+        self.flip = flip
+        self.action = ACTION_IDLE
+        self.frame_index = 0
+        self.image_frame = (self.action, self.frame_index)
+        self.update_time = now
+        self.rect = Rect(x, y, self.character.size, self.character.size)
+        self.vel_y = 0
+        self.running = False
+        self.jump = False
+        self.attacking = False
+        self.attack_type = 0
+        self.health = 100
+        self.alive = True
+
+    @property
+    def size(self):
+        return self.character.size
+
+    @property
+    def scale(self):
+        return self.character.scale
+
+    @property
+    def offset(self):
+        return self.character.offset
+
+    @property
+    def animation_steps(self):
+        return self.character.animation_steps
+
+    # Copy of every per-tick field as one flat tuple
+    def snapshot(self):
+        return (self.rect.x, self.rect.y, self.vel_y, self.flip, self.running, self.jump, self.attacking,
+                self.attack_type, self.health, self.alive, self.action, self.frame_index, self.image_frame,
+                self.update_time)
+
+    def restore(self, snapshot):
+        (self.rect.x, self.rect.y, self.vel_y, self.flip, self.running, self.jump, self.attacking,
+         self.attack_type, self.health, self.alive, self.action, self.frame_index, self.image_frame,
+         self.update_time) = snapshot
+
+    def move(self, inp, target, round_over, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
+        dx = 0
+        dy = 0
+        self.running = False
+
+        if self.alive and not round_over:
+            if inp.left:
+                dx = -SPEED
+                self.running = True
+            if inp.right:
+                dx = SPEED
+                self.running = True
+            if inp.jump and not self.jump:
+                self.vel_y = JUMP_VELOCITY
+                self.jump = True
+            if (inp.attack_1 or inp.attack_2) and not self.attacking:
+                self.attack_type = 1 if inp.attack_1 else 2
+                self.attack(target)
+
+        # Apply gravity
+        self.vel_y += GRAVITY
+        dy += self.vel_y
+
+        # Stay within screen bounds
+        if self.rect.left + dx < 0:
+            dx = -self.rect.left
+        if self.rect.right + dx > screen_width:
+            dx = screen_width - self.rect.right
+        if self.rect.bottom + dy > screen_height - FLOOR_OFFSET:
+            self.vel_y = 0
+            self.jump = False
+            dy = screen_height - FLOOR_OFFSET - self.rect.bottom
+
+        # Update position
+        self.rect.x += dx
+        self.rect.y += dy
+
+        # Flip character
+        self.flip = target.rect.centerx < self.rect.centerx
+
+    def attack(self, target):
+        if not self.attacking:
+            self.attacking = True
+            self.on_attack()
+            self.strike(self.attack_rect(), (target,))
+
+    # Area the attack can reach: the bounds of its swing for characters with
+    # a hitmask, otherwise the reach box in front of the fighter
+    def attack_rect(self):
+        hitmask = character_hitmask(self.character)
+        if hitmask is not None:
+            swing = hitmask.sweep(ATTACK_ROWS[self.attack_type], self.flip)
+            scale = self.character.scale
+            return Rect(self.rect.x - self.offset[0] + swing.left * scale, self.rect.y - self.offset[1] + swing.top * scale,
+                        (swing.right - swing.left) * scale, len(swing.runs) * scale)
+        attack_width = self.character.attack_width
+        return Rect(self.rect.centerx - (attack_width * self.flip), self.rect.y, attack_width, self.rect.height)
+
+    # Deal this character's damage to every target (other than itself) the attack hits
+    def strike(self, attacking_rect, targets):
+        for target in targets:
+            if target is not self and self.hits(attacking_rect, target):
+                target.take_damage(self.character.damage)
+
+    # Whether an attack lands on target: the swing against the frame the
+    # target shows when both have hitmasks, otherwise attacking_rect against its box
+    def hits(self, attacking_rect, target):
+        hitmask = character_hitmask(self.character)
+        target_hitmask = character_hitmask(target.character)
+        if hitmask is None or target_hitmask is None:
+            return attacking_rect.colliderect(target.rect)
+        action, frame_index = target.image_frame
+        return shapes_overlap(hitmask.sweep(ATTACK_ROWS[self.attack_type], self.flip),
+                              self.rect.x - self.offset[0], self.rect.y - self.offset[1], self.character.scale,
+                              target_hitmask.shape(action, frame_index, target.flip),
+                              target.rect.x - target.offset[0], target.rect.y - target.offset[1], target.character.scale)
+
+    # Whether a box (a projectile) lands on the frame the fighter shows, or
+    # on its hurtbox for characters without a hitmask
+    def hit_by(self, rect):
+        hitmask = character_hitmask(self.character)
+        if hitmask is None:
+            return rect.colliderect(self.rect)
+        action, frame_index = self.image_frame
+        return shapes_overlap(box_shape(rect.width, rect.height), rect.x, rect.y, 1,
+                              hitmask.shape(action, frame_index, self.flip),
+                              self.rect.x - self.offset[0], self.rect.y - self.offset[1], self.character.scale)
+
+    def take_damage(self, damage):
+        self.health = max(self.health - damage, 0)
+
+    # Called when an attack starts; the live game plays the attack sound here
+    def on_attack(self):
+        pass
+
+    def update(self, now):
+        if self.health <= 0:
+            self.alive = False
+            self.update_action(ACTION_DEATH, now)
+        elif self.attacking:
+            self.update_action(ATTACK_ROWS[self.attack_type], now)
+        elif self.jump:
+            self.update_action(ACTION_JUMP, now)
+        elif self.running:
+            self.update_action(ACTION_RUN, now)
+        else:
+            self.update_action(ACTION_IDLE, now)
+
+        # Animation handling
+        self.image_frame = (self.action, self.frame_index)
+        if now - self.update_time > self.character.frame_ms:
+            self.update_time = now
+            self.frame_index += 1
+        frame_count = self.character.animation_steps[self.action]
+        if self.frame_index >= frame_count:
+            if not self.alive:
+                self.frame_index = frame_count - 1
+            else:
+                self.attacking = False
+                self.attack_type = 0
+                self.frame_index = 0
+
+    def update_action(self, new_action, now):
+        if new_action != self.action:
+            self.action = new_action
+            self.frame_index = 0
+            self.update_time = now
+
+
+# One warrior vs wizard round stepped at a fixed tick
+class Match:
+    __slots__ = ("tick", "fighter_1", "fighter_2", "round_over")
+
+    # tick is the clock tick the round starts at (the live game's clock keeps running between rounds)
+    # fighter_class makes the fighters (a FighterState subclass, e.g. one with sound)
+    def __init__(self, data_1=WARRIOR_DATA, steps_1=WARRIOR_ANIMATION_STEPS, data_2=WIZARD_DATA, steps_2=WIZARD_ANIMATION_STEPS,
+                 tick=0, fighter_class=FighterState):
+        self.tick = tick
+        self.fighter_1 = fighter_class(1, PLAYER_1_START[0], PLAYER_1_START[1], False, data_1, steps_1, self.now)
+        self.fighter_2 = fighter_class(2, PLAYER_2_START[0], PLAYER_2_START[1], True, data_2, steps_2, self.now)
+        self.round_over = False
+
+    # Simulation time of the current tick in milliseconds
+    @property
+    def now(self):
+        return self.tick * TICK_MS
+
+    # Advance one tick in the same order as the live game loop
+    def step(self, input_1, input_2):
+        now = self.now
+        self.fighter_1.update(now)
+        self.fighter_2.update(now)
+        if not self.round_over:
+            self.fighter_1.move(input_1, self.fighter_2, self.round_over)
+            self.fighter_2.move(input_2, self.fighter_1, self.round_over)
+        if not self.fighter_1.alive or not self.fighter_2.alive:
+            self.round_over = True
+        self.tick += 1
+        return self.round_over
+
+    # Cheap copy of the whole match state, used for replays and rollback
+    def snapshot(self):
+        return (self.tick, self.round_over, self.fighter_1.snapshot(), self.fighter_2.snapshot())
+
+    def restore(self, snapshot):
+        self.tick, self.round_over, fighter_1, fighter_2 = snapshot
+        self.fighter_1.restore(fighter_1)
+        self.fighter_2.restore(fighter_2)
+
+    # 1 or 2 for the surviving player, 0 while the round runs or on a double KO
+    def winner(self):
+        if self.fighter_1.alive == self.fighter_2.alive:
+            return 0
+        return 1 if self.fighter_1.alive else 2
+
+    # Play the round with input policies until it ends or max_ticks pass.
+    # A policy is called as policy(match, fighter, opponent) and returns a FighterInput.
+    def run(self, policy_1, policy_2, max_ticks=60 * TICK_RATE):
+        while not self.round_over and self.tick < max_ticks:
+            self.step(policy_1(self, self.fighter_1, self.fighter_2), policy_2(self, self.fighter_2, self.fighter_1))
+        return self.winner()
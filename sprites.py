@@ -0,0 +1,101 @@
+import pygame
+
+# Process-wide caches. Sheets are keyed by path, animations by
+# (sheet path, size, scale, animation steps) so every Fighter built from
+# the same data shares the same frame surfaces.
+_sheet_cache = {}
+_animation_cache = {}
+
+
+# Scaled frames of one sprite sheet. Every frame is cropped to its visible
+# pixels (with the crop's position in the full frame kept in offsets) and has
+# a mirrored copy, so drawing never flips and only touches opaque areas.
+class Animation:
+    def __init__(self, frames, offsets, flipped, flipped_offsets):
+        self.frames = frames
+        self.offsets = offsets
+        self.flipped = flipped
+        self.flipped_offsets = flipped_offsets
+
+    def get_frame(self, action, frame_index, flip):
+        if flip:
+            return self.flipped[action][frame_index], self.flipped_offsets[action][frame_index]
+        return self.frames[action][frame_index], self.offsets[action][frame_index]
+
+
+# Function for loading a sprite sheet once per process
+def load_sheet(sheet_path):
+    sheet = _sheet_cache.get(sheet_path)
+    if sheet is None:
+        sheet = pygame.image.load(sheet_path).convert_alpha()
+        _sheet_cache[sheet_path] = sheet
+    return sheet
+
+
+# Function for registering a sheet that was already loaded (e.g. by the asset manager)
+def add_sheet(sheet_path, sheet):
+    _sheet_cache[sheet_path] = sheet
+
+
+# Function for slicing and scaling every frame of a sheet
+def build_animation(sprite_sheet, size, scale, animation_steps):
+    frames = []
+    offsets = []
+    flipped = []
+    flipped_offsets = []
+    for y, animation in enumerate(animation_steps):
+        temp_img_list = []
+        temp_offset_list = []
+        temp_flipped_list = []
+        temp_flipped_offset_list = []
+        for x in range(animation):
+            temp_img = sprite_sheet.subsurface(x * size, y * size, size, size)
+            temp_img = pygame.transform.scale(temp_img, (size * scale, size * scale))
+            temp_flipped = pygame.transform.flip(temp_img, True, False)
+            rect = temp_img.get_bounding_rect()
+            flipped_rect = pygame.Rect(temp_img.get_width() - rect.right, rect.y, rect.width, rect.height)
+            temp_img_list.append(temp_img.subsurface(rect))
+            temp_offset_list.append(rect.topleft)
+            temp_flipped_list.append(temp_flipped.subsurface(flipped_rect))
+            temp_flipped_offset_list.append(flipped_rect.topleft)
+        frames.append(temp_img_list)
+        offsets.append(temp_offset_list)
+        flipped.append(temp_flipped_list)
+        flipped_offsets.append(temp_flipped_offset_list)
+    return Animation(frames, offsets, flipped, flipped_offsets)
+
+
+# Function for the cache key of an animation
+def animation_key(sheet_path, size, scale, animation_steps):
+    return (sheet_path, size, scale, tuple(animation_steps))
+
+
+# Function for registering an animation that was built elsewhere (e.g. loaded from a bundle)
+def add_animation(key, animation):
+    _animation_cache[key] = animation
+
+
+# Function for getting an already built animation, or None
+def find_animation(sheet_path, size, scale, animation_steps):
+    return _animation_cache.get(animation_key(sheet_path, size, scale, animation_steps))
+
+
+# Function for getting the shared animation of a sheet
+def get_animation(sheet_path, size, scale, animation_steps):
+    key = animation_key(sheet_path, size, scale, animation_steps)
+    animation = _animation_cache.get(key)
+    if animation is None:
+        animation = build_animation(load_sheet(sheet_path), size, scale, animation_steps)
+        _animation_cache[key] = animation
+    return animation
+
+
+# Function for the shared animation of a characters.CharacterData
+def character_animation(character):
+    return get_animation(character.sheet, character.size, character.scale, character.animation_steps)
+
+
+# Function for dropping every cached sheet and animation
+def clear_cache():
+    _sheet_cache.clear()
+    _animation_cache.clear()
@@ -0,0 +1,170 @@
+# Match telemetry.
+# The game emits small structured events (attacks, hits, action changes,
+# rounds, frame overruns) into a preallocated ring of slots. Emitting is a
+# tuple store and two index updates on the main thread; a background thread
+# wakes up every flush interval, takes everything written since its last
+# visit and appends it to the log in one batch, so file I/O and encoding
+# never happen in the game loop. If the flusher falls a whole ring behind,
+# new events are dropped and counted rather than blocking the game.
+#
+# Events are (tick, kind, player, a, b) with the simulation tick of the
+# timestep clock. What a and b mean depends on the kind, see EVENT_FIELDS.
+# Logs are JSON lines (.jsonl) or a compact binary format (anything else):
+#
+#   header | (tick u32, kind u8, player u8, a i32, b i32) per event
+#
+#   BRAWLER_TELEMETRY=match.jsonl python fighter.py
+import json
+import os
+import struct
+import threading
+import time
+
+from simulation import TICK_RATE
+
+EVENT_ROUND_START = 1
+EVENT_ROUND_END = 2
+EVENT_ACTION = 3
+EVENT_ATTACK = 4
+EVENT_HIT = 5
+EVENT_OVERRUN = 6
+
+# Event kind -> (name, meaning of a, meaning of b)
+EVENT_FIELDS = {
+    EVENT_ROUND_START: ("round_start", "round", "cpu_player"),
+    EVENT_ROUND_END: ("round_end", "winner", "round_ticks"),
+    EVENT_ACTION: ("action", "action", "previous"),
+    EVENT_ATTACK: ("attack", "attack_type", "x"),
+    EVENT_HIT: ("hit", "damage", "health"),
+    EVENT_OVERRUN: ("overrun", "frame_ms", "budget_ms")
+}
+
+MAGIC = b"BRTL"
+VERSION = 1
+# magic, version, tick rate, session start (ms since the epoch)
+HEADER = struct.Struct("<4sHHQ")
+EVENT = struct.Struct("<IBBii")
+DEFAULT_CAPACITY = 1 << 14
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+
+# Appends batches of events to a JSON lines file
+class JsonlLog:
+    def __init__(self, path, started_ms):
+        self.file = open(path, "w")
+        self.file.write(json.dumps({"event": "session", "started_ms": started_ms, "tick_rate": TICK_RATE}, separators=(",", ":")) + "\n")
+
+    def write(self, events):
+        lines = []
+        for tick, kind, player, a, b in events:
+            name, a_name, b_name = EVENT_FIELDS[kind]
+            lines.append(f'{{"tick":{tick},"event":"{name}","player":{player},"{a_name}":{a},"{b_name}":{b}}}\n')
+        self.file.write("".join(lines))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Appends batches of events to a binary log, one EVENT record each
+class BinaryLog:
+    def __init__(self, path, started_ms):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, TICK_RATE, started_ms))
+
+    def write(self, events):
+        self.file.write(b"".join([EVENT.pack(*event) for event in events]))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Function for reading a binary log back as (tick rate, session start, events)
+def read_binary(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, tick_rate, started_ms = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a telemetry log: " + path)
+    if version != VERSION:
+        raise ValueError(f"Unsupported telemetry log version: {version}")
+    end = HEADER.size + (len(data) - HEADER.size) // EVENT.size * EVENT.size
+    return tick_rate, started_ms, list(EVENT.iter_unpack(data[HEADER.size:end]))
+
+
+# Event ring with a background flusher. clock is anything with a tick
+# attribute (a timestep.FixedStepClock in the game).
+class Telemetry:
+    enabled = True
+
+    def __init__(self, path, clock, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if capacity & (capacity - 1):
+            raise ValueError("Telemetry capacity must be a power of two")
+        started_ms = int(time.time() * 1000)
+        self.log = JsonlLog(path, started_ms) if path.endswith(".jsonl") else BinaryLog(path, started_ms)
+        self.clock = clock
+        self.slots = [None] * capacity
+        self.mask = capacity - 1
+        self.capacity = capacity
+        self.write_index = 0  # only the game thread moves this
+        self.read_index = 0  # only the flusher moves this
+        self.dropped = 0
+        self.flush_interval = flush_interval
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def emit(self, kind, player=0, a=0, b=0):
+        index = self.write_index
+        if index - self.read_index > self.mask:
+            self.dropped += 1
+            return
+        self.slots[index & self.mask] = (self.clock.tick, kind, player, a, b)
+        self.write_index = index + 1
+
+    # Write out everything emitted so far (called on the flusher thread)
+    def flush(self):
+        start = self.read_index
+        end = self.write_index
+        if start == end:
+            return
+        first = start & self.mask
+        last = end & self.mask
+        if first < last:
+            events = self.slots[first:last]
+        else:
+            events = self.slots[first:] + self.slots[:last]
+        self.log.write(events)
+        self.read_index = end
+
+    def run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+
+    # Stop the flusher, write what is left and close the log
+    def close(self):
+        self.stopping.set()
+        self.thread.join()
+        self.flush()
+        self.log.close()
+
+
+# Stand-in that drops every event
+class NullTelemetry:
+    enabled = False
+    dropped = 0
+
+    def emit(self, kind, player=0, a=0, b=0):
+        pass
+
+    def close(self):
+        pass
+
+
+# Function for the telemetry sink: a Telemetry writing to BRAWLER_TELEMETRY if set
+def create_telemetry(clock, path=None):
+    path = path or os.environ.get("BRAWLER_TELEMETRY")
+    if not path:
+        return NullTelemetry()
+    return Telemetry(path, clock)
@@ -0,0 +1,10 @@
+# Shared test setup.
+# The game's modules live at the top of the repository and load their assets
+# by paths relative to it, so the tests import and run from there.
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,63 @@
+# With two fighters and no projectiles the arena plays like simulation.Match, and
+# everything it adds (bolts, spawning) follows the same rules
+import random
+
+import pytest
+
+from arena import Arena, ArenaFighter, create_free_for_all
+from characters import BUILTIN_CHARACTERS
+from hitmask import character_hitmask
+from simulation import PLAYER_1_START, PLAYER_2_START, FighterInput, Match, Rect
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_two_fighter_arena_matches_match(seed):
+    warrior = BUILTIN_CHARACTERS["warrior"]
+    wizard = BUILTIN_CHARACTERS["wizard"]._replace(projectile=None)
+    match = Match(warrior, None, wizard, None)
+    arena = Arena()
+    arena.add_fighter(warrior, *PLAYER_1_START)
+    arena.add_fighter(wizard, *PLAYER_2_START, flip=True)
+    rng = random.Random(seed)
+    for tick in range(3000):
+        inputs = [FighterInput(*(rng.random() < 0.25 for _ in range(5))) for _ in range(2)]
+        match.step(*inputs)
+        arena.step(inputs)
+        assert [f.snapshot() for f in arena.fighters] == [match.fighter_1.snapshot(), match.fighter_2.snapshot()]
+        assert arena.round_over == match.round_over
+        if match.round_over:
+            break
+    assert arena.winner() == match.winner()
+
+
+# A bolt lands on the frame the fighter shows, not on its hurtbox
+def test_bolts_hit_the_drawn_frame():
+    warrior = BUILTIN_CHARACTERS["warrior"]
+    fighter = Arena().add_fighter(warrior, *PLAYER_1_START)
+    shape = character_hitmask(warrior).shape(*fighter.image_frame, fighter.flip)
+    frame_x = fighter.rect.x - warrior.offset[0]
+    frame_y = fighter.rect.y - warrior.offset[1]
+    drawn_outside = empty_inside = None
+    for y in range(frame_y, frame_y + warrior.size * warrior.scale):
+        for x in range(frame_x, frame_x + warrior.size * warrior.scale):
+            row = (y - frame_y) // warrior.scale - shape.top
+            column = (x - frame_x) // warrior.scale
+            runs = shape.runs[row] if 0 <= row < len(shape.runs) else ()
+            drawn = any(start <= column < end for start, end in zip(runs[::2], runs[1::2]))
+            inside = fighter.rect.colliderect(Rect(x, y, 1, 1))
+            if drawn and not inside and drawn_outside is None:
+                drawn_outside = (x, y)
+            if not drawn and inside and empty_inside is None:
+                empty_inside = (x, y)
+    assert drawn_outside is not None and empty_inside is not None
+    assert fighter.hit_by(Rect(*drawn_outside, 1, 1))
+    assert not fighter.hit_by(Rect(*empty_inside, 1, 1))
+
+
+def test_free_for_all_spawns_on_the_field():
+    arena = create_free_for_all(8, BUILTIN_CHARACTERS, 1000)
+    assert all(0 <= f.rect.x and f.rect.right <= arena.width for f in arena.fighters)
+    assert all(type(f) is ArenaFighter for f in arena.fighters)
+    for count in (0, 1):
+        with pytest.raises(ValueError):
+            create_free_for_all(count)
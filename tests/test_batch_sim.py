@@ -0,0 +1,40 @@
+# BatchMatch has to give the same state as simulation.Match, tick for tick
+import numpy as np
+
+from batch_sim import BatchMatch, random_policy
+from simulation import FighterInput, Match
+
+MATCHES = 40
+TICKS = 600
+
+
+# Function for a fighter's per-tick fields in BatchMatch's order
+def match_state(fighter):
+    return (fighter.rect.x, fighter.rect.y, fighter.vel_y, fighter.health, fighter.alive, fighter.action,
+            fighter.frame_index, fighter.attacking, fighter.jump, fighter.flip, fighter.running,
+            fighter.attack_type, *fighter.image_frame)
+
+
+def batch_state(batch, i, p):
+    return (batch.x[i, p], batch.y[i, p], batch.vel_y[i, p], batch.health[i, p], batch.alive[i, p],
+            batch.action[i, p], batch.frame_index[i, p], batch.attacking[i, p], batch.jump[i, p],
+            batch.flip[i, p], batch.running[i, p], batch.attack_type[i, p], batch.image_action[i, p],
+            batch.image_index[i, p])
+
+
+def test_batch_matches_match_every_tick():
+    batch = BatchMatch(MATCHES)
+    matches = [Match() for _ in range(MATCHES)]
+    policy = random_policy(np.random.default_rng(3), 0.25)
+    for tick in range(TICKS):
+        inputs = policy(batch)
+        batch.step(inputs)
+        for i, match in enumerate(matches):
+            match.step(FighterInput.from_bits(int(inputs[i, 0])), FighterInput.from_bits(int(inputs[i, 1])))
+            for p, fighter in enumerate((match.fighter_1, match.fighter_2)):
+                expected = tuple(map(int, match_state(fighter)))
+                assert tuple(map(int, batch_state(batch, i, p))) == expected, (tick, i, p)
+            assert bool(batch.round_over[i]) == match.round_over
+    assert batch.winner().tolist() == [match.winner() for match in matches]
+    # The random inputs have to get far enough for hits to matter
+    assert batch.damage_dealt.sum() > 0
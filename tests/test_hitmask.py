@@ -0,0 +1,75 @@
+# The baked hit shapes have to be the frames' pixel masks, and a stale bake is refused
+import json
+import shutil
+
+import numpy as np
+import pygame
+import pytest
+
+import hitmask
+from characters import BUILTIN_CHARACTERS, BUILTIN_DEFINITIONS, load_roster
+
+
+# Function for a shape as a boolean frame image
+def shape_pixels(shape, size):
+    pixels = np.zeros((size, size), dtype=bool)
+    for i, row in enumerate(shape.runs):
+        for start, end in zip(row[::2], row[1::2]):
+            pixels[shape.top + i, start:end] = True
+    return pixels
+
+
+@pytest.mark.parametrize("name", sorted(BUILTIN_CHARACTERS))
+def test_shapes_match_pygame_masks(name):
+    character = BUILTIN_CHARACTERS[name]
+    mask_of = hitmask.character_hitmask(character)
+    sheet = pygame.image.load(character.sheet)
+    size = character.size
+    for action, count in enumerate(character.animation_steps):
+        for i in range(count):
+            mask = pygame.mask.from_surface(sheet.subsurface(i * size, action * size, size, size), hitmask.MASK_THRESHOLD)
+            surface = mask.to_surface(setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 0))
+            expected = pygame.surfarray.array_alpha(surface).T > 0
+            assert (shape_pixels(mask_of.shape(action, i, False), size) == expected).all(), (action, i)
+            assert (shape_pixels(mask_of.shape(action, i, True), size) == expected[:, ::-1]).all(), (action, i)
+
+
+# A hit between two shapes needs a pixel of each on the same screen pixel
+def test_shapes_overlap_is_pixel_exact():
+    a = hitmask.Shape(0, [(0, 2, 6, 8)])
+    b = hitmask.Shape(0, [(0, 1)])
+    # b's one pixel falls in a's gap, then on its first run (drawn twice as big) and on its second
+    assert not hitmask.shapes_overlap(a, 0, 0, 1, b, 3, 0, 1)
+    assert hitmask.shapes_overlap(a, 0, 0, 1, b, 1, 0, 2)
+    assert hitmask.shapes_overlap(a, 0, 0, 1, b, 7, 0, 1)
+    assert not hitmask.shapes_overlap(a, 0, 0, 1, b, 8, 0, 1)
+
+
+def test_stale_bake_is_refused(tmp_path):
+    warrior = BUILTIN_CHARACTERS["warrior"]
+    sheet = str(tmp_path / "sheet.png")
+    shutil.copy(warrior.sheet, sheet)
+    character = warrior._replace(sheet=sheet, hitmask=str(tmp_path / "sheet.json"))
+    hitmask.bake(character, character.hitmask)
+    assert hitmask.load_hitmask(character.hitmask).digest == hitmask.sheet_digest(sheet)
+
+    with open(sheet, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="stale"):
+        hitmask.character_hitmask(character)
+
+
+# A roster character whose hitmask is missing or baked for another character fails when the roster loads
+def test_roster_checks_hitmasks(tmp_path):
+    definition = dict(BUILTIN_DEFINITIONS[0], name="brute", hitmask=str(tmp_path / "missing.json"))
+    with open(tmp_path / "brute.json", "w") as f:
+        json.dump(definition, f)
+    with pytest.raises(ValueError, match="does not exist"):
+        load_roster(str(tmp_path))
+    assert load_roster(str(tmp_path), check_hitmasks=False)["brute"].hitmask == definition["hitmask"]
+
+    definition["hitmask"] = BUILTIN_DEFINITIONS[1]["hitmask"]
+    with open(tmp_path / "brute.json", "w") as f:
+        json.dump(definition, f)
+    with pytest.raises(ValueError, match="does not match"):
+        load_roster(str(tmp_path))
@@ -0,0 +1,52 @@
+# Two rollback peers over UDP loopback have to end on the same state
+import netplay
+from netplay import UdpTransport, run_loopback
+from simulation import FighterInput, Match
+
+
+def test_loopback_peers_stay_in_sync():
+    sessions, stalls = run_loopback(ticks=300, rtt=0.1, seed=1)
+    assert [session.frame for session in sessions] == [300, 300]
+    assert sessions[0].match.snapshot() == sessions[1].match.snapshot()
+
+
+def test_loopback_peers_stay_in_sync_without_latency():
+    sessions, stalls = run_loopback(ticks=120, rtt=0.0, seed=2)
+    assert sessions[0].match.snapshot() == sessions[1].match.snapshot()
+
+
+# Every frame is reported once, in order, with inputs that step a match to the session's state
+def test_confirmed_frames_are_reported_once_in_order(monkeypatch):
+    class ConfirmedSession(netplay.RollbackSession):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.frames = []
+            self.confirmed_match = Match()
+
+        def on_confirmed(self, frame, bits_1, bits_2):
+            self.frames.append(frame)
+            self.confirmed_match.step(FighterInput.from_bits(bits_1), FighterInput.from_bits(bits_2))
+
+    monkeypatch.setattr(netplay, "RollbackSession", ConfirmedSession)
+    sessions, stalls = run_loopback(ticks=240, rtt=0.1, seed=3)
+    for session in sessions:
+        assert session.frames == list(range(240))
+        assert session.confirmed_match.snapshot() == session.match.snapshot()
+
+
+# On Windows a receive fails when an earlier packet found nobody listening; the packets after it still arrive
+def test_receive_skips_connection_errors():
+    class ResettingSocket:
+        def __init__(self):
+            self.results = [ConnectionResetError(), b"a", ConnectionRefusedError(), b"b", BlockingIOError()]
+
+        def recvfrom(self, size):
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result, ("127.0.0.1", 7000)
+
+    transport = UdpTransport(("127.0.0.1", 0))
+    transport.socket.close()
+    transport.socket = ResettingSocket()
+    assert transport.receive() == [b"a", b"b"]
@@ -0,0 +1,113 @@
+# A recorded replay has to play back to the same match
+import random
+import struct
+
+import pytest
+
+import netplay
+from characters import BUILTIN_CHARACTERS
+from replay import PREFIX, ReplayReader, ReplayWriter, read_stream, record_match
+from simulation import NO_INPUT, Match
+from tournament import random_policy
+
+
+def record_and_play(path, match, seed):
+    rng = random.Random(seed)
+    recorded = record_match(str(path), random_policy(rng, 0.3), random_policy(rng, 0.3), seed=seed,
+                            max_ticks=1200, match=match)
+    with ReplayReader(str(path)) as reader:
+        assert reader.seed == seed
+        assert reader.start_tick + len(reader) == recorded.tick
+        played = reader.play()
+        characters = reader.characters
+    return recorded, played, characters
+
+
+def test_replay_round_trip(tmp_path):
+    recorded, played, characters = record_and_play(tmp_path / "match.rpl", None, 7)
+    assert played.snapshot() == recorded.snapshot()
+    assert played.winner() == recorded.winner()
+    assert [c.name for c in characters] == ["warrior", "wizard"]
+
+
+# A roster character sharing the warrior's sheet and steps has to come back as itself
+def test_replay_round_trip_roster_character(tmp_path):
+    warrior = BUILTIN_CHARACTERS["warrior"]
+    wizard = BUILTIN_CHARACTERS["wizard"]
+    brute = warrior._replace(name="brute", damage=25, frame_ms=80)
+    path = tmp_path / "brute.rpl"
+    recorded, played, characters = record_and_play(path, Match(brute, None, wizard, None), 11)
+    assert characters[0] == brute
+    assert played.snapshot() == recorded.snapshot()
+
+    with open(path, "rb") as f:
+        records = read_stream(f)
+        seed, tick_rate, start_tick, stream_characters, header_size = next(records)
+        assert seed == 11 and stream_characters[0] == brute
+        assert sum(1 for _ in records) == recorded.tick
+
+
+# The live game's rounds start wherever its clock is; fighter timing counts from there
+def test_replay_round_trip_from_a_later_tick(tmp_path):
+    recorded, played, characters = record_and_play(tmp_path / "later.rpl", Match(tick=12345), 5)
+    assert played.snapshot() == recorded.snapshot()
+    with ReplayReader(str(tmp_path / "later.rpl")) as reader:
+        assert reader.start_tick == 12345
+        halfway = reader.play(ticks=len(reader) // 2)
+        assert halfway.tick == 12345 + len(reader) // 2
+        assert reader.play(halfway).snapshot() == recorded.snapshot()
+
+
+# A countdown is recorded as ticks without input, which steps like the live game's settle
+def test_countdown_ticks_replay_as_no_input(tmp_path):
+    path = str(tmp_path / "countdown.rpl")
+    live = Match(tick=600)
+    with ReplayWriter(path, 1, live.fighter_1.character, live.fighter_2.character, live.tick) as writer:
+        for _ in range(180):
+            for fighter, target in ((live.fighter_1, live.fighter_2), (live.fighter_2, live.fighter_1)):
+                fighter.update(live.now)
+            for fighter, target in ((live.fighter_1, live.fighter_2), (live.fighter_2, live.fighter_1)):
+                fighter.move(NO_INPUT, target, True)
+            live.tick += 1
+            writer.write_bits(0, 0)
+    with ReplayReader(path) as reader:
+        assert reader.play().snapshot() == live.snapshot()
+
+
+def test_other_versions_and_tick_rates_are_refused(tmp_path):
+    path = tmp_path / "match.rpl"
+    rng = random.Random(1)
+    record_match(str(path), random_policy(rng, 0.3), random_policy(rng, 0.3), max_ticks=10)
+    data = bytearray(path.read_bytes())
+
+    old = data[:4] + struct.pack("<H", 2) + data[6:]
+    path.write_bytes(old)
+    with pytest.raises(ValueError, match="older hit rules"):
+        ReplayReader(str(path))
+
+    magic, version, header_size, tick_rate, seed, start_tick = PREFIX.unpack_from(data, 0)
+    path.write_bytes(PREFIX.pack(magic, version, header_size, tick_rate * 2, seed, start_tick) + data[PREFIX.size:])
+    with pytest.raises(ValueError, match="ticks per second"):
+        ReplayReader(str(path))
+
+
+# An online round is recorded from its confirmed frames, which never roll back
+def test_confirmed_netplay_frames_replay_to_the_same_match(tmp_path, monkeypatch):
+    class RecordingSession(netplay.RollbackSession):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.path = str(tmp_path / f"online{self.local_player}.rpl")
+            self.writer = ReplayWriter(self.path, 3,
+                                       self.match.fighter_1.character, self.match.fighter_2.character)
+
+        def on_confirmed(self, frame, bits_1, bits_2):
+            assert frame == self.writer.ticks
+            self.writer.write_bits(bits_1, bits_2)
+
+    monkeypatch.setattr(netplay, "RollbackSession", RecordingSession)
+    sessions, stalls = netplay.run_loopback(ticks=200, rtt=0.1, seed=4)
+    for session in sessions:
+        session.writer.close()
+        with ReplayReader(session.path) as reader:
+            assert len(reader) == 200
+            assert reader.play().snapshot() == session.match.snapshot()
@@ -0,0 +1,26 @@
+# The PNG frames of an export have to hold the same pixels as the raw export
+import os
+import random
+
+import numpy as np
+import pygame
+
+from replay import record_match
+from replay_export import export_replay
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT
+from tournament import random_policy
+
+
+def test_png_frames_match_raw(tmp_path):
+    rng = random.Random(3)
+    path = str(tmp_path / "match.brpl")
+    record_match(path, random_policy(rng, 0.3), random_policy(rng, 0.3), max_ticks=120)
+    options = {"fps": 30, "scale": 0.5, "tail_ms": 0}
+    frames, seconds = export_replay(path, str(tmp_path / "match.rgb"), "raw", **options)
+    assert export_replay(path, str(tmp_path / "frames"), "png", **options)[0] == frames
+
+    width, height = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
+    raw = np.fromfile(tmp_path / "match.rgb", dtype=np.uint8).reshape(frames, height, width, 3)
+    for index in range(frames):
+        image = pygame.image.load(os.path.join(tmp_path, "frames", f"frame_{index:05d}.png"))
+        assert (pygame.surfarray.array3d(image).transpose(1, 0, 2) == raw[index]).all(), index
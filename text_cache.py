@@ -0,0 +1,42 @@
+import collections
+
+
+# Rendered text surfaces keyed by (font, text, color, antialias), so labels
+# and menu lines are rasterized once instead of every frame. The least
+# recently used surfaces are dropped once max_size is reached.
+class TextCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = collections.OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        img = self.surfaces.get(key)
+        if img is not None:
+            self.surfaces.move_to_end(key)
+            return img
+        img = font.render(text, antialias, color)
+        self.surfaces[key] = img
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return img
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Pre-rendered digits of one font and color for numbers that change often
+# (scores, countdowns): drawing a number is a few blits and no rasterizing.
+class DigitAtlas:
+    def __init__(self, font, color, antialias=True):
+        self.glyphs = {char: font.render(char, antialias, color) for char in "0123456789-"}
+
+    # Draw a number and return the rect it covers
+    def draw(self, surface, value, x, y):
+        rect = None
+        for char in str(value):
+            glyph = self.glyphs[char]
+            glyph_rect = surface.blit(glyph, (x, y))
+            rect = glyph_rect if rect is None else rect.union(glyph_rect)
+            x += glyph.get_width()
+        return rect
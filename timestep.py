@@ -0,0 +1,47 @@
+# Fixed-step simulation clock.
+# Real frame time goes into an accumulator and the game is advanced in whole
+# steps of TICK_MS, so gameplay runs at the same speed whatever the render
+# rate. The leftover fraction of a step (alpha) is used to interpolate what
+# gets drawn between the last two simulated positions.
+from simulation import TICK_MS
+
+
+class FixedStepClock:
+    def __init__(self, step_ms=TICK_MS, max_steps=5):
+        self.step_ms = step_ms
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.tick = 0
+        self.dropped_ms = 0.0
+
+    # Simulation time in ms, the 'now' passed to FighterState.update
+    @property
+    def now(self):
+        return self.tick * self.step_ms
+
+    # How far between the previous and the current step the next frame is drawn
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.step_ms, 1.0)
+
+    # Add elapsed real time and return how many steps are due. After a long
+    # stall at most max_steps are run and the rest of the time is dropped, so
+    # a slow machine draws fewer frames instead of falling further behind.
+    def advance(self, elapsed_ms):
+        self.accumulator += elapsed_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            dropped = (steps - self.max_steps) * self.step_ms
+            self.accumulator -= dropped
+            self.dropped_ms += dropped
+            steps = self.max_steps
+        return steps
+
+    # Call once after every simulated step
+    def step(self):
+        self.accumulator -= self.step_ms
+        self.tick += 1
+
+    # Forget pending time, e.g. after a menu or loading screen
+    def reset(self):
+        self.accumulator = 0.0
@@ -0,0 +1,153 @@
+# Multiprocess tournament runner.
+# Plays many headless warrior vs wizard matches across a process pool and
+# merges win rates, round lengths and damage stats at the end.
+#
+#   python tournament.py --matches 100000 --p1 scripted --p2 random
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+import ai
+import simulation
+from simulation import FighterInput, Match, TICK_RATE, WARRIOR_DATA, WIZARD_DATA, WARRIOR_ANIMATION_STEPS, WIZARD_ANIMATION_STEPS
+
+
+# Input policies. Each is built with a random generator and returns a
+# function called as policy(match, fighter, opponent) -> FighterInput.
+def idle_policy(rng):
+    def policy(match, fighter, opponent):
+        return simulation.NO_INPUT
+    return policy
+
+
+def random_policy(rng, press_chance=0.2):
+    def policy(match, fighter, opponent):
+        return FighterInput(rng.random() < press_chance, rng.random() < press_chance, rng.random() < press_chance / 4,
+                            rng.random() < press_chance, rng.random() < press_chance)
+    return policy
+
+
+# Walk towards the opponent and attack once they are within reach
+def scripted_policy(rng):
+    def policy(match, fighter, opponent):
+        distance = opponent.rect.centerx - fighter.rect.centerx
+        reach = fighter.rect.width * 2
+        if abs(distance) > reach:
+            return FighterInput(left=distance < 0, right=distance > 0, jump=rng.random() < 0.01)
+        return FighterInput(attack_1=rng.random() < 0.5, attack_2=rng.random() < 0.5)
+    return policy
+
+
+POLICIES = {
+    "idle": idle_policy,
+    "random": random_policy,
+    "scripted": scripted_policy,
+    "ai": ai.ai_policy
+}
+
+
+# Stats of a set of matches. Everything is a sum or histogram so partial
+# results from workers merge exactly.
+class TournamentStats:
+    def __init__(self, max_ticks):
+        self.matches = 0
+        self.wins = [0, 0, 0]  # [draw or timeout, P1, P2]
+        self.timeouts = 0
+        self.damage = [0, 0]  # damage dealt by [P1, P2]
+        self.length_histogram = [0] * (max_ticks + 1)
+
+    def add(self, match, winner, max_ticks):
+        self.matches += 1
+        self.wins[winner] += 1
+        if not match.round_over:
+            self.timeouts += 1
+        self.damage[0] += 100 - match.fighter_2.health
+        self.damage[1] += 100 - match.fighter_1.health
+        self.length_histogram[min(match.tick, max_ticks)] += 1
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.timeouts += other.timeouts
+        self.damage = [a + b for a, b in zip(self.damage, other.damage)]
+        self.length_histogram = [a + b for a, b in zip(self.length_histogram, other.length_histogram)]
+
+    def length_percentile(self, percent):
+        target = self.matches * percent / 100
+        seen = 0
+        for ticks, count in enumerate(self.length_histogram):
+            seen += count
+            if count and seen >= target:
+                return ticks
+        return 0
+
+    def summary(self):
+        matches = max(self.matches, 1)
+        total_ticks = sum(ticks * count for ticks, count in enumerate(self.length_histogram))
+        return {
+            "matches": self.matches,
+            "p1_win_rate": self.wins[1] / matches,
+            "p2_win_rate": self.wins[2] / matches,
+            "draw_rate": self.wins[0] / matches,
+            "timeouts": self.timeouts,
+            "mean_round_seconds": total_ticks / matches / TICK_RATE,
+            "p50_round_seconds": self.length_percentile(50) / TICK_RATE,
+            "p95_round_seconds": self.length_percentile(95) / TICK_RATE,
+            "p1_mean_damage": self.damage[0] / matches,
+            "p2_mean_damage": self.damage[1] / matches
+        }
+
+
+# Worker job: play a chunk of matches with its own game state and generator
+def play_matches(job):
+    seed, count, p1_policy, p2_policy, max_ticks = job
+    rng = random.Random(seed)
+    policy_1 = POLICIES[p1_policy](rng)
+    policy_2 = POLICIES[p2_policy](rng)
+    stats = TournamentStats(max_ticks)
+    for _ in range(count):
+        match = Match(WARRIOR_DATA, WARRIOR_ANIMATION_STEPS, WIZARD_DATA, WIZARD_ANIMATION_STEPS)
+        winner = match.run(policy_1, policy_2, max_ticks)
+        stats.add(match, winner, max_ticks)
+    return stats
+
+
+# Function for splitting the tournament into jobs and merging their stats
+def run_tournament(matches, p1_policy, p2_policy, processes=None, seed=0, max_ticks=60 * TICK_RATE, chunk_size=250):
+    jobs = []
+    for start in range(0, matches, chunk_size):
+        jobs.append((seed * 1000003 + start, min(chunk_size, matches - start), p1_policy, p2_policy, max_ticks))
+    stats = TournamentStats(max_ticks)
+    with multiprocessing.Pool(processes) as pool:
+        for partial in pool.imap_unordered(play_matches, jobs):
+            stats.merge(partial)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless warrior vs wizard matches across all cores")
+    parser.add_argument("--matches", type=int, default=10000)
+    parser.add_argument("--p1", choices=sorted(POLICIES), default="scripted", help="player 1 (warrior) policy")
+    parser.add_argument("--p2", choices=sorted(POLICIES), default="scripted", help="player 2 (wizard) policy")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-seconds", type=int, default=60, help="round time limit in simulated seconds")
+    parser.add_argument("--json", metavar="PATH", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = run_tournament(args.matches, args.p1, args.p2, args.processes, args.seed, args.max_seconds * TICK_RATE)
+    summary = stats.summary()
+    summary["wall_seconds"] = time.perf_counter() - start
+
+    for key, value in summary.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()